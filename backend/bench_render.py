@@ -0,0 +1,329 @@
+"""
+Render micro-benchmarks.
+
+Usage (from the backend directory):
+    python bench_render.py [--seconds 3]
+
+Reports:
+- renders per second for the marker-text (ReportLab) renderer with the
+  template style set rebuilt on every render versus the compiled, shared
+  style cache;
+- throughput of the single-pass marker tokenizer on growing documents
+  (time per KB should stay flat);
+- FPDF render time of a long CV with FPDF's per-character text measurement
+  versus the memoized sanitize / word-width path;
+- FPDF render time of a non-Latin CV with the Unicode font parsed and subset
+  on every render versus the process-wide font and subset caches;
+- cost of fitting a two-page CV onto one page, with a full build per
+  candidate layout versus the layout meter plus one final build;
+- DOCX, HTML and plain-text export throughput next to an FPDF render of
+  the same resume;
+- render time of each PDF backend on the shared document model (the
+  numbers the automatic backend selector uses);
+- render throughput of the process-pool render service as workers are added.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import time
+
+from services.pdf_formatter import PDFFormatter
+from services.templates import get_template
+
+SAMPLE_MARKER_TEXT = """[TITLE: JOHN SMITH]
+[CONTACT: Boston, MA • (555) 123-4567 • john.smith@email.com • linkedin.com/in/johnsmith]
+[SPACING]
+[SECTION: EDUCATION]
+[EDUCATION_ITEM: Massachusetts Institute of Technology | Cambridge, MA | Bachelor of Science in Computer Science | September 2016 - May 2020]
+[BULLET: Relevant coursework: Data Structures, Algorithms, Machine Learning, Artificial Intelligence]
+[EDUCATION_ITEM: Boston Latin School | Boston, MA | High School Diploma | September 2012 - June 2016]
+[SPACING]
+[SECTION: EXPERIENCE]
+""" + "".join(
+    f"""[EXPERIENCE_ITEM: Tech Company {i} | Boston, MA | Software Engineer | June 20{10 + i} - May 20{11 + i}]
+[BULLET: Developed and deployed 5 full-stack web applications using React and Node.js, serving 10,000+ users]
+[BULLET: Optimized database queries reducing load time by 40% and improving user experience]
+[BULLET: Led cross-functional team of 8 developers to deliver project 2 months ahead of schedule]
+"""
+    for i in range(8)
+) + """[SPACING]
+[SECTION: SKILLS]
+[PARAGRAPH]
+[BOLD: Technical:] JavaScript, Python, React, Node.js, PostgreSQL, Docker, AWS
+"""
+
+
+def run_for(seconds: float, fn) -> float:
+    """Call fn repeatedly for roughly `seconds` and return calls per second."""
+    fn()  # warm-up
+    count = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def bench_styles(seconds: float):
+    template = get_template("professional")
+
+    def render(styles):
+        formatter = PDFFormatter(styles)
+        elements = formatter.parse_formatted_text(SAMPLE_MARKER_TEXT)
+        formatter.generate_pdf(io.BytesIO(), elements)
+
+    setup_uncached = run_for(seconds / 3, template.build_styles)
+    setup_cached = run_for(seconds / 3, template.get_styles)
+    print("Template style set")
+    print(f"  build_styles()            : {setup_uncached:10.0f} calls/s")
+    print(f"  get_styles() (cached)     : {setup_cached:10.0f} calls/s")
+
+    uncached = run_for(seconds, lambda: render(template.build_styles()))
+    cached = run_for(seconds, lambda: render(template.get_styles()))
+    print("Marker renderer (ReportLab)")
+    print(f"  styles rebuilt per render : {uncached:8.1f} renders/s")
+    print(f"  compiled style cache      : {cached:8.1f} renders/s  ({cached / uncached:.2f}x)")
+
+
+SAMPLE_RESUME = {
+    "header": {"name": "John Smith", "email": "john.smith@email.com", "phone": "(555) 123-4567",
+               "linkedin": "linkedin.com/in/johnsmith"},
+    "education": [{"school": "Massachusetts Institute of Technology", "degree": "BSc Computer Science",
+                   "location": "Cambridge, MA", "date": "2016 - 2020"}],
+    "experience": [
+        {"company": f"Tech Company {i}", "role": "Software Engineer", "location": "Boston, MA",
+         "date": f"20{10 + i} - 20{11 + i}",
+         "bullets": [f"Optimized database queries reducing load time by {10 + j}% and improving user experience"
+                     for j in range(6)]}
+        for i in range(8)
+    ],
+    "skills": "JavaScript, Python, React, Node.js, PostgreSQL, Docker, AWS",
+}
+
+
+def bench_parser():
+    from services.pdf_formatter import iter_formatted_elements
+
+    print("Marker tokenizer (iter_formatted_elements)")
+    for copies in (10, 100, 1000):
+        text = SAMPLE_MARKER_TEXT * copies
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_formatted_elements(text))
+        elapsed = time.perf_counter() - start
+        size_kb = len(text.encode("utf-8")) / 1024
+        print(f"  {size_kb:9.0f} KB: {count:7d} elements in {elapsed * 1000:7.1f} ms"
+              f"  ({elapsed * 1e6 / size_kb:5.1f} us/KB)")
+
+
+LONG_RESUME = {
+    **SAMPLE_RESUME,
+    "experience": [
+        {**job, "bullets": [f"Delivered {j + 1} releases of the \u201ccore\u201d billing platform \u2014 cutting "
+                            f"p99 latency by {10 + j}% across {3 + j} services and on-call pages by half"
+                            for j in range(12)]}
+        for job in SAMPLE_RESUME["experience"] * 2
+    ],
+}
+
+
+def bench_fpdf_text(seconds: float):
+    from fpdf import FPDF
+
+    from services.pdf_renderer import HarvardPDF, sanitize_text
+    from services.render_model import document_from_data
+
+    class UncachedPDF(HarvardPDF):
+        multi_cell = FPDF.multi_cell
+        get_string_width = FPDF.get_string_width
+
+        def sanitize(self, text):
+            return sanitize_text.__wrapped__(str(text)) if text else ""
+
+    document = document_from_data(LONG_RESUME)
+    bullets = sum(len(job["bullets"]) for job in LONG_RESUME["experience"])
+
+    def render(pdf_class):
+        pdf = pdf_class()
+        pdf.render_document(document)
+        pdf.output(dest="S")
+
+    uncached = run_for(seconds, lambda: render(UncachedPDF))
+    cached = run_for(seconds, lambda: render(HarvardPDF))
+    print(f"FPDF long CV ({bullets} bullets)")
+    print(f"  per-character measurement : {uncached:8.1f} renders/s")
+    print(f"  memoized text + widths    : {cached:8.1f} renders/s  ({cached / uncached:.2f}x)")
+
+
+INTERNATIONAL_RESUME = {
+    "header": {"name": "Łukasz Müller-Ødegård", "email": "lukasz@example.pl", "phone": "+48 555 0100",
+               "linkedin": "linkedin.com/in/lukasz"},
+    "education": [{"school": "Московский государственный университет", "degree": "Магистр информатики",
+                   "location": "Москва", "date": "2014 - 2016"}],
+    "experience": [
+        {"company": f"Εταιρεία {i}", "role": "Inżynier oprogramowania", "location": "Αθήνα",
+         "date": f"20{16 + i} - 20{17 + i}",
+         "bullets": [f"Zwiększyłem przepustowość usług o {10 + j}% dzięki nowej warstwie pamięci podręcznej"
+                     for j in range(6)]}
+        for i in range(4)
+    ],
+    "skills": "Python, Go, PostgreSQL, Русский, Ελληνικά, Polski",
+}
+
+
+def bench_unicode_fonts(seconds: float):
+    from services import fonts
+    from services.pdf_renderer import render_fpdf
+    from services.render_model import document_from_data
+
+    if fonts.unicode_family() is None:
+        print("Unicode fonts: no TTF family installed, skipped")
+        return
+
+    document = document_from_data(INTERNATIONAL_RESUME)
+
+    def cold():
+        fonts.load_font.cache_clear()
+        fonts._subsets.clear()
+        render_fpdf(document)
+
+    uncached = run_for(seconds, cold)
+    cached = run_for(seconds, lambda: render_fpdf(document))
+    print(f"FPDF Unicode CV ({fonts.unicode_family().name})")
+    print(f"  font parsed + subset per render : {uncached:8.1f} renders/s")
+    print(f"  process-wide font/subset cache  : {cached:8.1f} renders/s  ({cached / uncached:.2f}x)")
+
+
+def bench_fit(seconds: float):
+    from services.pdf_renderer import (DEFAULT_LAYOUT, FIT_SEARCH_STEPS, HarvardPDF, Layout,
+                                       fit_layout, render_fpdf)
+    from services.render_model import document_from_data
+    from services.templates import get_template
+
+    template = get_template("professional")
+    min_font, max_font = template.fit_font_scale
+    min_spacing, max_spacing = template.fit_spacing_scale
+
+    def build(document, layout):
+        pdf = HarvardPDF(None, layout)
+        pdf.render_document(document)
+        return pdf.output(dest="S"), pdf.page
+
+    def trial_fit(document):
+        """Same search as fit_layout, but every candidate is a full PDF build."""
+        def fits(font_scale, spacing_scale):
+            return build(document, Layout(font_scale, spacing_scale))[1] <= 1
+
+        if fits(max_font, max_spacing):
+            return build(document, DEFAULT_LAYOUT)[0]
+        font_scale = max_font
+        if not fits(max_font, min_spacing):
+            low, high = min_font, max_font
+            for _ in range(FIT_SEARCH_STEPS):
+                middle = (low + high) / 2
+                low, high = (middle, high) if fits(middle, min_spacing) else (low, middle)
+            font_scale = low
+        low, high = min_spacing, max_spacing
+        for _ in range(FIT_SEARCH_STEPS):
+            middle = (low + high) / 2
+            low, high = (middle, high) if fits(font_scale, middle) else (low, middle)
+        return build(document, Layout(font_scale, low))[0]
+
+    print("Fit to one page (FPDF)")
+    for jobs, bullets in ((5, 6), (6, 5)):
+        data = {**SAMPLE_RESUME, "experience": [
+            {**job, "bullets": job["bullets"][:bullets]} for job in SAMPLE_RESUME["experience"][:jobs]
+        ]}
+        document = document_from_data(data)
+        layout = fit_layout(document, "professional", None, 1)
+        plain = run_for(seconds / 3, lambda: render_fpdf(document))
+        trials = run_for(seconds / 3, lambda: trial_fit(document))
+        fitted = run_for(seconds / 3, lambda: render_fpdf(document, max_pages=1))
+        print(f"  {jobs} jobs x {bullets} bullets -> font x{layout.font_scale:.3f}, spacing x{layout.spacing_scale:.3f}")
+        print(f"    plain render (2 pages)  : {plain:8.1f} renders/s")
+        print(f"    full build per candidate: {trials:8.1f} renders/s  ({plain / trials:.1f} renders each)")
+        print(f"    layout meter + one build: {fitted:8.1f} renders/s  ({plain / fitted:.1f} renders each)")
+
+
+def bench_exports(seconds: float):
+    from services.exporters import EXPORT_FORMATS, export_document
+    from services.pdf_renderer import render_fpdf
+    from services.render_backends import BENCHMARK_RESUME
+    from services.render_model import document_from_data
+
+    print("Exports vs PDF (benchmark resume, professional template)")
+    share = seconds / (len(EXPORT_FORMATS) + 1)
+    pdf = run_for(share, lambda: render_fpdf(document_from_data(BENCHMARK_RESUME)))
+    print(f"  pdf (fpdf): {pdf:8.1f} renders/s")
+    for fmt in EXPORT_FORMATS:
+        size = len(b"".join(export_document(fmt, BENCHMARK_RESUME)))
+        rate = run_for(share, lambda: b"".join(export_document(fmt, BENCHMARK_RESUME)))
+        print(f"  {fmt:<10}: {rate:8.1f} exports/s  ({rate / pdf:.1f}x pdf, {size} bytes)")
+
+
+def bench_backends():
+    from services.render_backends import benchmark_backends
+    from services.templates import TEMPLATES
+
+    print("PDF backends on the shared document model")
+    for template_id in TEMPLATES:
+        timings = benchmark_backends(template_id, rounds=20)
+        fastest = min(timings, key=timings.get)
+        for name, secs in timings.items():
+            marker = "  <- selected" if name == fastest else ""
+            print(f"  {template_id}/{name:<16}: {1 / secs:8.1f} renders/s{marker}")
+
+
+def bench_pool(seconds: float, max_workers: int):
+    from services.render_pool import RenderPool
+
+    async def throughput(workers: int) -> float:
+        pool = RenderPool(workers=workers)
+        await pool.start()
+        try:
+            count = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < seconds:
+                batch = max(workers, 1) * 4
+                await asyncio.gather(*(pool.render(SAMPLE_RESUME) for _ in range(batch)))
+                count += batch
+            return count / (time.perf_counter() - start)
+        finally:
+            pool.shutdown()
+
+    print("Process-pool render service")
+    baseline = None
+    workers = 0
+    while workers <= max_workers:
+        rate = asyncio.run(throughput(workers))
+        baseline = baseline or rate
+        label = "in-process thread" if workers == 0 else f"{workers} worker(s)"
+        print(f"  {label:<26}: {rate:8.1f} renders/s  ({rate / baseline:.2f}x)")
+        workers = 1 if workers == 0 else workers * 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0, help="time budget per measurement")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 2,
+                        help="largest render pool size to measure")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    bench_styles(args.seconds)
+    bench_parser()
+    bench_fpdf_text(args.seconds)
+    bench_unicode_fonts(args.seconds)
+    bench_fit(args.seconds)
+    bench_exports(args.seconds)
+    bench_backends()
+    bench_pool(args.seconds, args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Multi-worker serving benchmark.
+
+Usage (from the backend directory, Linux only):
+    python bench_serve.py [--workers 1,2,4] [--seconds 10] [--concurrency 32] [--path /api/templates]
+
+For each worker count it starts `serve.py`, waits for /health, then reports:
+- memory of the master and each worker from /proc/<pid>/smaps_rollup:
+  RSS, PSS (shared pages split between the processes sharing them) and USS
+  (pages private to the process). USS is what each additional worker
+  really costs; RSS counts the shared, copy-on-write model pages every time;
+- requests per second and p50/p99 latency for --path at --concurrency.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def memory(pid: int) -> Dict[str, int]:
+    """RSS, PSS and USS of a process in KB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def children(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+async def load(url: str, seconds: float, concurrency: int):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def client(http: httpx.AsyncClient):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await http.get(url)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as http:
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+    latencies.sort()
+    return (
+        len(latencies) / seconds,
+        latencies[len(latencies) // 2],
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    )
+
+
+def wait_ready(base: str, workers: int, timeout: float = 300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base}/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"serve.py with {workers} workers did not become ready")
+
+
+def bench(workers: int, port: int, args):
+    base = f"http://127.0.0.1:{port}"
+    master = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(base, workers)
+        time.sleep(2)  # let every worker finish its startup hooks
+        rps, p50, p99 = asyncio.run(load(base + args.path, args.seconds, args.concurrency))
+
+        pids = children(master.pid)
+        master_mem = memory(master.pid)
+        worker_mem = [memory(pid) for pid in pids]
+        mean = {key: sum(m[key] for m in worker_mem) // max(1, len(worker_mem)) for key in ("rss", "pss", "uss")}
+        total_pss = master_mem["pss"] + sum(m["pss"] for m in worker_mem)
+
+        print(f"  {workers} workers: {rps:8.1f} req/s  p50 {p50 * 1000:6.1f} ms  p99 {p99 * 1000:6.1f} ms")
+        print(f"    master    : rss {master_mem['rss'] / 1024:7.1f} MB  pss {master_mem['pss'] / 1024:7.1f} MB  "
+              f"uss {master_mem['uss'] / 1024:7.1f} MB")
+        print(f"    per worker: rss {mean['rss'] / 1024:7.1f} MB  pss {mean['pss'] / 1024:7.1f} MB  "
+              f"uss {mean['uss'] / 1024:7.1f} MB  (after load)")
+        print(f"    total pss : {total_pss / 1024:7.1f} MB (excludes render pool processes)")
+    finally:
+        master.send_signal(signal.SIGTERM)
+        try:
+            master.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            master.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--path", default="/api/templates")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"serve.py on {os.cpu_count()} CPUs, GET {args.path} at concurrency {args.concurrency}")
+    for i, workers in enumerate(int(w) for w in args.workers.split(",")):
+        bench(workers, args.port + i, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse, Response
 import os
 import tempfile
 from datetime import datetime
@@ -9,18 +9,28 @@ import logging
 from typing import Optional
 from dotenv import load_dotenv
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-
-# Thread pool for running blocking operations without freezing the event loop
-# This allows multiple requests to be processed concurrently
-executor = ThreadPoolExecutor(max_workers=4)
 
 # Load environment variables from .env file
 load_dotenv()
 
-from services.pdf_service import extract_text_from_pdf, generate_improved_pdf
-from services.ai_service import improve_resume_text
-from services.templates import list_templates, get_template
+from services.templates import list_templates, get_template, TEMPLATES
+from services.pdf_service import inspect_pdf
+from services.batch_service import MAX_BATCH_ITEMS, BatchProcessor, BatchUpload
+from services.job_service import FINAL_STAGES, JobPipeline, JobQueueFull
+from services.job_store import create_job_store
+from services.scheduler import StageSaturated, scheduler
+from services.storage import storage
+from services.artifacts import artifacts
+from services.uploads import ReceivedFile, UploadRejected, receive_multipart, too_large_message
+from services.responses import FastJSONResponse, JSONCompressionMiddleware, dumps, parse_fields, select_fields
+from services.http_cache import CACHE_CONTROL, CachedStaticFiles, cached_file_response, cached_response, is_compressible, matching_etag, not_modified
+from services.render_cache import RenderCache, make_cache_key
+from services.render_pool import RenderPool
+from services.render_backends import backend_for, render_version, select_backend
+from services.exporters import EXPORT_FORMATS, EXPORT_VERSION, export_document
+from services.previews import (
+    PREVIEW_FORMAT, PREVIEW_FORMATS, PREVIEW_VERSION, PREVIEW_WIDTHS, preview_width, render_previews
+)
 
 # Configure logging with explicit stream handler to ensure console output
 logging.basicConfig(
@@ -50,8 +60,34 @@ else:
     logger.warning("⚠️ LLM_MODEL not set, will use default")
 logger.info("=" * 80)
 
-app = FastAPI(title="Resumax API")
+app = FastAPI(title="Resumax API", default_response_class=FastJSONResponse)
+
+# Upload limits, enforced while the upload streams to disk, before any work is queued
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_MAX_PAGES = int(os.getenv("UPLOAD_MAX_PAGES", "20"))
+# Room for the multipart framing and form fields around the file
+UPLOAD_FORM_OVERHEAD = 64 * 1024
 
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """
+    Turn away uploads that declare too large a body before the body is read.
+    Bodies without a Content-Length (chunked) are cut off by the parser instead.
+    """
+    if request.method == "POST" and request.url.path == "/api/upload-resume":
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD:
+            logger.warning(f"Rejected upload: Content-Length {length} over the {UPLOAD_MAX_BYTES} byte limit")
+            return FastJSONResponse(status_code=413, content={"detail": upload_too_large_message()})
+    return await call_next(request)
+
+def upload_too_large_message() -> str:
+    return too_large_message(UPLOAD_MAX_BYTES)
+
+# gzip/br for JSON bodies (results carry the whole resume)
+app.add_middleware(JSONCompressionMiddleware)
+
+# Added last so it wraps the middleware above and its responses get CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -60,16 +96,101 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = "backend/uploads"
-OUTPUT_DIR = "backend/outputs"
+@app.exception_handler(StageSaturated)
+async def stage_saturated_handler(request: Request, exc: StageSaturated):
+    """Admission control: tell clients when to come back instead of queueing them."""
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry shortly", "stage": exc.stage},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(JobQueueFull)
+async def job_queue_full_handler(request: Request, exc: JobQueueFull):
+    """The job pipeline's queues are full: same answer as a saturated stage."""
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# Under STORAGE_DIR (default: this directory), whatever the working directory
+UPLOAD_DIR = storage.upload_dir
+OUTPUT_DIR = storage.output_dir
+
+# Rendered PDFs are produced in memory; writing them to OUTPUT_DIR is an optional
+# background step. Disable for ephemeral/read-only deployments: downloads then
+# re-render from the saved resume data.
+PERSIST_RENDERED_PDFS = os.getenv("PERSIST_RENDERED_PDFS", "true").lower() in ("1", "true", "yes")
+
+# Rendered PDFs keyed by (resume data, template, renderer version)
+render_cache = RenderCache(
+    cache_dir=os.path.join(OUTPUT_DIR, "render_cache") if PERSIST_RENDERED_PDFS else None
+)
+
+# DOCX/HTML/text exports are cheap to rebuild, so they are only cached in memory
+export_cache = RenderCache()
+
+# Preview thumbnails, stored next to the cached PDFs
+preview_cache = RenderCache(
+    cache_dir=os.path.join(OUTPUT_DIR, "preview_cache") if PERSIST_RENDERED_PDFS else None,
+    extension=".img"
+)
+
+# Dedicated worker processes for PDF rendering (RENDER_WORKERS, 0 = in-process)
+render_pool = RenderPool()
+
+# Default page limit for rendered PDFs (0 = no fit-to-page); requests may override it
+PDF_FIT_PAGES = int(os.getenv("PDF_FIT_PAGES", "0")) or None
+
+async def render_pdf_cached(data: dict, template_id: str, max_pages: Optional[int] = PDF_FIT_PAGES,
+                            admit: bool = False) -> bytes:
+    """
+    Render a resume PDF, serving identical data/template pairs from the cache.
+    With admit, a cache miss is turned away (StageSaturated) while the render
+    stage is saturated; pass it for renders a client is waiting on.
+    """
+    key = make_cache_key(data, template_id, render_version(max_pages))
+
+    async def render() -> bytes:
+        # Only the request that actually renders needs a render slot
+        if admit:
+            scheduler.admit("render")
+        logger.info(f"Render cache miss: {key[:12]}")
+        # Routing builds the render model, so it is left to misses and kept off the event loop
+        backend = await asyncio.to_thread(backend_for, template_id, max_pages, data)
+        return await scheduler["render"].call(render_pool.render, data, template_id, backend, max_pages)
+
+    # Concurrent misses on the key, here or in other workers, render it once
+    return await render_cache.get_or_create(key, render)
+
+def improved_pdf_path(file_id: str, template_id: str, max_pages: Optional[int] = PDF_FIT_PAGES) -> str:
+    """
+    Where a persisted PDF of a resume is kept. Each template and page limit has
+    its own file, so a download never gets another rendering's PDF.
+    template_id must be a known template (get_template), as it is part of the path.
+    """
+    pages = f"_p{max_pages}" if max_pages else ""
+    return os.path.join(OUTPUT_DIR, f"{file_id}_{template_id}{pages}_improved.pdf")
 
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+def preview_key(data: dict, template_id: str, page: int, width: int, fmt: str) -> str:
+    return make_cache_key(data, template_id, f"{render_version(PDF_FIT_PAGES)}/{PREVIEW_VERSION}/p{page}/w{width}.{fmt}")
 
-# Progress tracking
-progress_store = {}
+async def render_preview_cached(data: dict, template_id: str, page: int = 1, width: int = PREVIEW_WIDTHS[0],
+                                fmt: str = PREVIEW_FORMAT, admit: bool = False) -> bytes:
+    """Preview image of one page of the default PDF; a miss renders every configured width at once."""
+    key = preview_key(data, template_id, page, width, fmt)
+    image = await asyncio.to_thread(preview_cache.get, key)
+    if image is not None:
+        return image
+    pdf_bytes = await render_pdf_cached(data, template_id, admit=admit)
+    images = await asyncio.to_thread(render_previews, pdf_bytes, page, PREVIEW_WIDTHS, fmt)
+    for size, encoded in images.items():
+        await asyncio.to_thread(preview_cache.put, preview_key(data, template_id, page, size, fmt), encoded)
+    return images[width]
 
-from fastapi.staticfiles import StaticFiles
+# Background batch processing (shares the scheduler's stages with single uploads)
+batch_processor = BatchProcessor(UPLOAD_DIR, OUTPUT_DIR, render_pdf_cached, improved_pdf_path, PERSIST_RENDERED_PDFS)
 
 # Get absolute path to the backend directory
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -78,7 +199,117 @@ STATIC_DIR = os.path.join(BACKEND_DIR, "static")
 # Ensure static directory exists
 os.makedirs(STATIC_DIR, exist_ok=True)
 
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+# Content ETags, Cache-Control (STATIC_MAX_AGE) and gzip/br for text assets
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR), name="static")
+
+# When upload_resume renders the PDF:
+#   eager      - before responding (PDF is ready when the upload returns)
+#   background - speculatively after responding, at low priority
+#   lazy       - only on the first download / generate-pdf request
+PDF_RENDER_MODE = os.getenv("PDF_RENDER_MODE", "background").lower()
+if PDF_RENDER_MODE not in ("eager", "background", "lazy"):
+    logger.warning(f"Unknown PDF_RENDER_MODE '{PDF_RENDER_MODE}', using 'background'")
+    PDF_RENDER_MODE = "background"
+
+# Speculative renders run one at a time so they never crowd out requested renders
+SPECULATIVE_RENDER_CONCURRENCY = int(os.getenv("SPECULATIVE_RENDER_CONCURRENCY", "1"))
+speculative_render_slots = asyncio.Semaphore(SPECULATIVE_RENDER_CONCURRENCY)
+speculative_render_tasks = set()
+
+async def speculative_render(file_id: str, improved_data: dict, template_id: str):
+    """Render (and optionally persist) a PDF nobody has asked for yet."""
+    async with speculative_render_slots:
+        try:
+            pdf_bytes = await render_pdf_cached(improved_data, template_id)
+            if PERSIST_RENDERED_PDFS:
+                await asyncio.to_thread(persist_pdf, pdf_bytes, improved_pdf_path(file_id, template_id))
+            # The result screen asks for the first-page preview next
+            await render_preview_cached(improved_data, template_id)
+            logger.info(f"Speculative render complete for {file_id}")
+        except Exception as e:
+            # The PDF will be rendered on demand instead
+            logger.warning(f"Speculative render failed for {file_id}: {str(e)}")
+
+def schedule_speculative_render(file_id: str, improved_data: dict, template_id: str):
+    task = asyncio.create_task(speculative_render(file_id, improved_data, template_id))
+    speculative_render_tasks.add(task)
+    task.add_done_callback(speculative_render_tasks.discard)
+
+async def finish_job(file_id: str, improved_data: dict, template_id: str):
+    """Render stage of the upload pipeline, as configured by PDF_RENDER_MODE."""
+    if PDF_RENDER_MODE == "eager":
+        pdf_bytes = await render_pdf_cached(improved_data, template_id)
+        if PERSIST_RENDERED_PDFS:
+            await asyncio.to_thread(persist_pdf, pdf_bytes, improved_pdf_path(file_id, template_id))
+        logger.info(f"✓ PDF generated successfully ({len(pdf_bytes)} bytes)")
+    elif PDF_RENDER_MODE == "background":
+        # Finish the job now; warm the render cache afterwards
+        schedule_speculative_render(file_id, improved_data, template_id)
+
+# Uploads are processed as background jobs (shares the scheduler's stages with batches)
+job_pipeline = JobPipeline(
+    UPLOAD_DIR, OUTPUT_DIR, finish_job,
+    create_job_store(os.path.join(OUTPUT_DIR, "jobs.sqlite3")), PDF_FIT_PAGES
+)
+
+# async: uploads return 202 with a job id; sync: uploads wait for the job's result
+UPLOAD_MODE = os.getenv("UPLOAD_MODE", "async").lower()
+
+def check_upload_profile(profile: dict):
+    """Reject uploads that extraction cannot handle, from their inspect_pdf profile."""
+    if profile["pages"] is None:
+        if profile["encrypted"]:
+            raise HTTPException(status_code=400, detail="Password-protected PDFs are not supported")
+        raise HTTPException(status_code=400, detail="Could not read the PDF")
+    if profile["pages"] == 0:
+        raise HTTPException(status_code=400, detail="PDF has no pages")
+    if profile["pages"] > UPLOAD_MAX_PAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"PDF has {profile['pages']} pages; at most {UPLOAD_MAX_PAGES} are allowed"
+        )
+
+def persist_pdf(pdf_bytes: bytes, output_path: str):
+    """Write a rendered PDF to durable storage. Runs as a background task."""
+    try:
+        storage.put_bytes(pdf_bytes, output_path)
+        logger.info(f"PDF persisted to: {output_path}")
+    except OSError as e:
+        logger.warning(f"Could not persist PDF to {output_path}: {str(e)}")
+
+def pdf_response(pdf_bytes: bytes, filename: str = "CV.pdf") -> Response:
+    """Send an in-memory PDF as the HTTP response body."""
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def load_resume_data(file_id: str) -> Optional[dict]:
+    """Load the improved resume data saved by upload_resume, or None if missing."""
+    # Served from the artifact writer while the file is still being written
+    return artifacts.read_json(os.path.join(OUTPUT_DIR, f"{file_id}_debug.json"))
+
+# Background storage garbage collection (services.storage)
+storage_tasks = set()
+
+@app.on_event("startup")
+async def start_render_pool():
+    # Pick the fastest backend per template before the first request needs it
+    for template_id in TEMPLATES:
+        await asyncio.to_thread(select_backend, template_id)
+    await render_pool.start()
+    job_pipeline.start()
+    storage_tasks.add(asyncio.create_task(storage.run_gc()))
+
+@app.on_event("shutdown")
+async def stop_render_pool():
+    for task in storage_tasks:
+        task.cancel()
+    await job_pipeline.stop()
+    render_pool.shutdown()
+    await asyncio.to_thread(job_pipeline.store.close)
+    await asyncio.to_thread(artifacts.close)
 
 @app.get("/")
 async def root():
@@ -94,180 +325,384 @@ async def get_templates():
 @app.get("/api/progress/{file_id}")
 async def get_progress(file_id: str):
     """Get processing progress for a file."""
-    progress = progress_store.get(file_id, {
-        "stage": "initializing",
-        "message": "Starting...",
-        "progress": 0
-    })
-    return progress
-
-@app.post("/api/upload-resume")
+    job = await job_pipeline.get(file_id)
+    if job is None:
+        return {
+            "stage": "initializing",
+            "message": "Starting...",
+            "progress": 0
+        }
+    return {key: job[key] for key in ("stage", "message", "progress")}
+
+@app.get("/api/progress/{file_id}/stream")
+async def stream_progress(file_id: str):
+    """
+    Server-Sent Events stream of a job's progress.
+    Sends a "progress" event with the job state on every change (stage
+    transitions, OCR pages, LLM output received) and a final "complete" or
+    "error" event carrying the finished job, then closes.
+    """
+    if await job_pipeline.get(file_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for state in job_pipeline.events(file_id):
+            if state is None:
+                # Comment line; keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            event = state["stage"] if state["stage"] in FINAL_STAGES else "progress"
+            yield f"event: {event}\ndata: {dumps(state).decode()}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# The form is parsed by the endpoint as it streams in (services.uploads), so describe it here
+UPLOAD_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "file": {"type": "string", "format": "binary"},
+                "template_id": {"type": "string", "default": "professional"},
+            },
+        }}},
+    }
+}
+
+@app.post("/api/upload-resume", status_code=202, openapi_extra=UPLOAD_FORM_SCHEMA)
 async def upload_resume(
-    file: UploadFile = File(...),
-    template_id: str = Form(default="professional")
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(default=None)
 ):
-    logger.info(f"Upload resume request received. Filename: {file.filename}, Template: {template_id}")
-    
-    if not file.filename or not file.filename.lower().endswith('.pdf'):
-        logger.warning(f"Invalid file format: {file.filename}")
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    """
+    Save the upload and queue it for processing.
+    Returns 202 with the job id; poll /api/jobs/{id} (or /api/progress/{id})
+    for progress and the result. With UPLOAD_MODE=sync the request waits for
+    the job and returns the result directly, for clients that predate jobs.
+    ?fields=id,summary returns only those fields of the response.
+    """
+    # Turn the upload away before reading it if the pipeline is backed up
+    job_pipeline.admit()
     
     file_id = str(uuid.uuid4())
-    timestamp = datetime.now().isoformat()
-    
-    # Initialize progress
-    progress_store[file_id] = {
-        "stage": "uploading",
-        "message": "Uploading your resume...",
-        "progress": 10
-    }
-    
     original_path = os.path.join(UPLOAD_DIR, f"{file_id}_original.pdf")
-    logger.info(f"Processing file {file_id}. Saving to {original_path}")
+
+    def accept_file(field: str, filename: str) -> ReceivedFile:
+        logger.info(f"Upload resume request received. Filename: {filename}")
+        if field != "file" or not filename.lower().endswith(".pdf"):
+            logger.warning(f"Invalid file format: {filename}")
+            raise UploadRejected(400, "Only PDF files are allowed")
+        logger.info(f"Saving upload {file_id} to {original_path}")
+        return ReceivedFile(filename, original_path, UPLOAD_MAX_BYTES)
     
     try:
-        contents = await file.read()
-        with open(original_path, "wb") as f:
-            f.write(contents)
-        logger.info(f"File saved successfully. Size: {len(contents)} bytes")
-        
-        progress_store[file_id] = {
-            "stage": "uploaded",
-            "message": "Upload complete! Extracting text...",
-            "progress": 25
-        }
-        
-        logger.info("=" * 80)
-        logger.info("STEP 1: TEXT EXTRACTION")
-        logger.info("=" * 80)
-        
-        progress_store[file_id] = {
-            "stage": "extracting",
-            "message": "Reading your resume with OCR...",
-            "progress": 40
-        }
-        
-        # Run blocking PDF extraction in thread pool to avoid blocking event loop
-        loop = asyncio.get_event_loop()
-        original_text = await loop.run_in_executor(
-            executor, extract_text_from_pdf, original_path
-        )
-        logger.info(f"✓ Text extraction complete")
-        logger.info(f"   Extracted length: {len(original_text)} characters")
-        logger.info(f"   Preview (first 200 chars): {original_text[:200]}")
-        
-        if not original_text.strip():
-            logger.error("✗ Extracted text is empty!")
-            progress_store[file_id] = {
-                "stage": "error",
-                "message": "Could not extract text from PDF",
-                "progress": 0
-            }
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-        
-        logger.info("=" * 80)
-        logger.info("STEP 2: AI IMPROVEMENT (JSON MODE)")
-        logger.info(f"   Template: {template_id}")
-        logger.info("=" * 80)
-        
-        progress_store[file_id] = {
-            "stage": "improving",
-            "message": "AI is enhancing your resume...",
-            "progress": 60
-        }
-        
-        # improved_data is now a dict (JSON)
-        improved_data = await improve_resume_text(original_text, file_id, template_id)
-        
-        logger.info("=" * 80)
-        logger.info("✓ AI improvement complete")
-        logger.info(f"   Data keys: {list(improved_data.keys())}")
-        
-        # Save debug output (Persist data for later generation)
-        debug_path = os.path.join(OUTPUT_DIR, f"{file_id}_debug.json")
-        import json
-        with open(debug_path, "w", encoding="utf-8") as f:
-            json.dump(improved_data, f, indent=2)
-        logger.info(f"Debug JSON saved to: {debug_path}")
-        logger.info("=" * 80)
-        
-        progress_store[file_id] = {
-            "stage": "formatting",
-            "message": "Formatting your professional resume...",
-            "progress": 80
-        }
-        
-        logger.info("=" * 80)
-        logger.info("STEP 3: PDF GENERATION")
-        logger.info("=" * 80)
-        
-        # Generate the PDF immediately
-        improved_path = os.path.join(OUTPUT_DIR, f"{file_id}_improved.pdf")
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            executor, generate_improved_pdf, improved_data, improved_path, template_id
-        )
-        
-        logger.info(f"✓ PDF generated successfully: {improved_path}")
-        logger.info("=" * 80)
-        
-        progress_store[file_id] = {
-            "stage": "complete",
-            "message": "Your resume is ready!",
-            "progress": 100
-        }
-        
-        return {
-            "id": file_id,
-            "original_filename": file.filename,
-            "timestamp": timestamp,
-            "original_text": original_text,
-            "improved_data": improved_data,
-            "download_url": f"/api/download/{file_id}"
-        }
-    
-    except Exception as e:
-        logger.error(f"Error processing resume: {str(e)}", exc_info=True)
-        progress_store[file_id] = {
-            "stage": "error",
-            "message": f"Error: {str(e)}",
-            "progress": 0
-        }
+        try:
+            form, files = await receive_multipart(request, accept_file)
+        except UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        if not files:
+            raise HTTPException(status_code=400, detail="No PDF file in the upload")
+        upload = files[0]
+        digest = upload.digest
+        template_id = form.get("template_id") or "professional"
+        logger.info(f"File saved successfully. Size: {upload.size} bytes, Template: {template_id}")
+        # An unknown template would only fail at render time, after OCR and the LLM
+        try:
+            get_template(template_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Check and classify it (text layer, pages, size) before anything is queued
+        profile = await asyncio.to_thread(inspect_pdf, original_path)
+        check_upload_profile(profile)
+        # The same PDF and template already in flight (a retry or double tap): share its job
+        dedup_key = f"{digest}:{template_id}"
+        job_id = await job_pipeline.join(dedup_key)
+        if job_id is None:
+            job_id = await job_pipeline.submit(file_id, upload.filename, template_id, profile, dedup_key)
+    except (HTTPException, JobQueueFull) as e:
         if os.path.exists(original_path):
             os.remove(original_path)
-        raise HTTPException(status_code=500, detail=f"Error processing resume: {str(e)}")
+        logger.warning(f"Rejected upload {file_id}: {getattr(e, 'detail', str(e))}")
+        raise
+    if job_id != file_id:
+        os.remove(original_path)
+    else:
+        # Share the stored copy if this PDF was uploaded before
+        storage.adopt(original_path, digest)
+    
+    if UPLOAD_MODE == "sync":
+        job = await job_pipeline.wait(job_id)
+        if job is None:
+            raise HTTPException(status_code=500, detail="Error processing resume: job state expired")
+        if job["stage"] == "error":
+            raise HTTPException(status_code=500, detail=f"Error processing resume: {job['error']}")
+        response.status_code = 200
+        return select_fields(job["result"], parse_fields(fields))
+    
+    return select_fields({
+        "id": job_id,
+        "coalesced": job_id != file_id,
+        "status_url": f"/api/jobs/{job_id}",
+        "progress_url": f"/api/progress/{job_id}",
+        "events_url": f"/api/progress/{job_id}/stream"
+    }, parse_fields(fields))
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, fields: Optional[str] = None):
+    """
+    Job state; once the stage is "complete", "result" holds the processed resume.
+    ?fields=stage,progress,result.summary returns only those fields.
+    """
+    job = await job_pipeline.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return select_fields(job, parse_fields(fields))
+
+# Large result fields, also served on their own so job polls can leave them out
+RESULT_FIELDS = {"original_text": "text/plain; charset=utf-8", "improved_data": "application/json"}
+
+@app.get("/api/jobs/{job_id}/result/{field}")
+async def get_job_result_field(request: Request, job_id: str, field: str):
+    """One field of a completed job's result: the OCR text as plain text, the resume data as JSON."""
+    if field not in RESULT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown field '{field}' (use {', '.join(RESULT_FIELDS)})")
+    job = await job_pipeline.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["result"] is None:
+        raise HTTPException(status_code=409, detail=f"Job is not complete (stage: {job['stage']})")
+    value = job["result"][field]
+    body = value.encode("utf-8") if field == "original_text" else dumps(value)
+    return cached_response(request.headers, body, RESULT_FIELDS[field], "result")
 
 @app.get("/api/download/{file_id}")
-async def download_resume(file_id: str):
+async def download_resume(
+    request: Request,
+    file_id: str,
+    background_tasks: BackgroundTasks,
+    template_id: str = "professional",
+    max_pages: Optional[int] = Query(default=None, ge=1)
+):
     logger.info(f"Download request for file_id: {file_id}")
-    file_path = os.path.join(OUTPUT_DIR, f"{file_id}_improved.pdf")
+    try:
+        get_template(template_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    max_pages = max_pages or PDF_FIT_PAGES
+    file_path = improved_pdf_path(file_id, template_id, max_pages)
     
-    if not os.path.exists(file_path):
+    if os.path.exists(file_path):
+        logger.info(f"Serving file: {file_path}")
+        # Hashed once per file for the ETag; Range requests are answered from disk
+        return await asyncio.to_thread(
+            cached_file_response, request.headers, file_path, "application/pdf", "pdf", "CV.pdf"
+        )
+    
+    # No persisted PDF (not written yet, or persistence disabled): render from data
+    improved_data = load_resume_data(file_id)
+    if improved_data is None:
         logger.warning(f"File not found: {file_path}")
         raise HTTPException(status_code=404, detail="File not found")
     
-    logger.info(f"Serving file: {file_path}")
-    return FileResponse(
-        file_path,
-        media_type="application/pdf",
-        filename="CV.pdf"
+    logger.info(f"Rendering {file_id} in memory for download")
+    pdf_bytes = await render_pdf_cached(improved_data, template_id, max_pages, admit=True)
+    if PERSIST_RENDERED_PDFS:
+        background_tasks.add_task(persist_pdf, pdf_bytes, file_path)
+    return cached_response(
+        request.headers, pdf_bytes, "application/pdf", "pdf",
+        headers={"Content-Disposition": 'attachment; filename="CV.pdf"'}
     )
 
-from pydantic import BaseModel
+@app.get("/api/preview/{file_id}")
+async def preview_resume(
+    request: Request,
+    file_id: str,
+    template_id: str = "professional",
+    page: int = Query(default=1, ge=1),
+    width: int = Query(default=PREVIEW_WIDTHS[0], ge=1),
+    format: str = PREVIEW_FORMAT
+):
+    """Small preview image of one page of the improved resume PDF."""
+    if format not in PREVIEW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}' (use {', '.join(PREVIEW_FORMATS)})")
+    try:
+        get_template(template_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    improved_data = load_resume_data(file_id)
+    if improved_data is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    width = preview_width(width)
+    # The key covers data, template, renderer and size, so a URL's image never changes
+    etag = f'"{preview_key(improved_data, template_id, page, width, format)}"'
+    if not_modified(request.headers, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL["preview"]})
+
+    try:
+        image = await render_preview_cached(improved_data, template_id, page, width, format, admit=True)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return cached_response(request.headers, image, PREVIEW_FORMATS[format][0], "preview", etag)
+
+def iter_cached_export(key: str, chunks):
+    """Pass export chunks through, caching the complete output once it is done."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    export_cache.put(key, b"".join(parts))
+
+@app.get("/api/export/{file_id}")
+async def export_resume(
+    request: Request,
+    file_id: str,
+    format: str = "docx",
+    template_id: str = "professional"
+):
+    """Export the improved resume as DOCX, HTML or ATS plain text."""
+    logger.info(f"Export request for file_id: {file_id}, format: {format}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}' (use {', '.join(EXPORT_FORMATS)})")
+    try:
+        get_template(template_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    improved_data = load_resume_data(file_id)
+    if improved_data is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="CV.{extension}"'}
+    key = make_cache_key(improved_data, template_id, f"{EXPORT_VERSION}/{format}")
+    # The cache key identifies the content, so a revalidation is answered
+    # before anything is generated. HTML and text are byte-for-byte
+    # deterministic; a DOCX package carries save timestamps, so its ETag is weak
+    etag = f'W/"{key}"' if format == "docx" else f'"{key}"'
+    cached = export_cache.get(key)
+    if cached is not None:
+        logger.info(f"Export cache hit: {key[:12]} ({len(cached)} bytes)")
+        return cached_response(request.headers, cached, media_type, "export", etag, headers)
+    # Either this identity ETag or an encoded variant from a cache hit
+    matched = matching_etag(request.headers, etag)
+    if matched is not None:
+        return Response(status_code=304, headers={"ETag": matched, "Cache-Control": CACHE_CONTROL["export"]})
+
+    headers.update({"ETag": etag, "Cache-Control": CACHE_CONTROL["export"]})
+    if is_compressible(media_type):
+        # Cache hits may be encoded
+        headers["Vary"] = "Accept-Encoding"
+    chunks = export_document(format, improved_data, template_id)
+    return StreamingResponse(iter_cached_export(key, chunks), media_type=media_type, headers=headers)
+
+BATCH_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["files"],
+            "properties": {
+                "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                "template_id": {"type": "string", "default": "professional"},
+            },
+        }}},
+    }
+}
+
+@app.post("/api/batch", status_code=202, openapi_extra=BATCH_FORM_SCHEMA)
+async def create_batch(request: Request):
+    """
+    Accept many PDFs (or ZIP archives of PDFs) and process them in the background.
+    Returns the batch id immediately; poll /api/batch/{batch_id} for progress.
+    """
+    scheduler.admit("ocr", "llm")
+
+    upload = BatchUpload(UPLOAD_DIR, UPLOAD_MAX_BYTES)
+    try:
+        try:
+            form, _ = await receive_multipart(request, upload.accept_file, max_files=MAX_BATCH_ITEMS)
+        except UploadRejected as e:
+            detail = f"Invalid batch file {e.filename}: {e.detail}" if e.filename else e.detail
+            raise HTTPException(status_code=e.status_code, detail=detail)
+        template_id = form.get("template_id") or "professional"
+        logger.info(f"Batch upload received with {len(upload.received)} files, Template: {template_id}")
+        try:
+            get_template(template_id)
+            pdfs = await asyncio.to_thread(upload.expand)
+            batch_id = batch_processor.submit(pdfs, template_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException as e:
+        await asyncio.to_thread(upload.discard)
+        logger.warning(f"Rejected batch upload: {e.detail}")
+        raise
+
+    return {
+        "batch_id": batch_id,
+        "total": len(pdfs),
+        "status_url": f"/api/batch/{batch_id}",
+        "archive_url": f"/api/batch/{batch_id}/archive"
+    }
+
+@app.get("/api/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Get aggregate progress and per-item status for a batch."""
+    status = batch_processor.get_status(batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return status
+
+@app.get("/api/batch/{batch_id}/archive")
+async def download_batch_archive(batch_id: str):
+    """Stream a ZIP archive with all PDFs completed so far and a manifest."""
+    if batch_processor.get_status(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    return StreamingResponse(
+        batch_processor.iter_archive(batch_id),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="batch_{batch_id}.zip"'}
+    )
+
+from pydantic import BaseModel, Field
 from services.revenue_cat_service import revenue_cat_service
 
 class GeneratePDFRequest(BaseModel):
     file_id: str
     user_id: str
     template_id: str = "professional"
+    # Return the PDF in the response body instead of a download URL
+    stream: bool = False
+    # Tighten the layout to fit on this many pages (default: PDF_FIT_PAGES)
+    max_pages: Optional[int] = Field(default=None, ge=1)
 
 @app.get("/health")
 async def health_check():
     logger.info("Health check called")
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "render_cache": render_cache.stats(),
+        "export_cache": export_cache.stats(),
+        "preview_cache": preview_cache.stats(),
+        "job_store": await asyncio.to_thread(job_pipeline.store.stats),
+        "jobs": job_pipeline.stats(),
+        "storage": storage.stats(),
+        "artifacts": artifacts.stats(),
+        "stages": scheduler.stats()
+    }
 
 @app.post("/api/generate-pdf")
-async def generate_pdf(request: GeneratePDFRequest):
+async def generate_pdf(request: GeneratePDFRequest, background_tasks: BackgroundTasks):
     """
     Generate PDF for a file. Requires Pro Access verification.
     """
@@ -279,22 +714,26 @@ async def generate_pdf(request: GeneratePDFRequest):
         raise HTTPException(status_code=403, detail="Pro access required to generate PDF")
         
     # 2. Load Data
-    debug_path = os.path.join(OUTPUT_DIR, f"{request.file_id}_debug.json")
-    if not os.path.exists(debug_path):
+    try:
+        get_template(request.template_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    improved_data = load_resume_data(request.file_id)
+    if improved_data is None:
         raise HTTPException(status_code=404, detail="Resume data not found. Please upload again.")
         
-    import json
-    with open(debug_path, "r", encoding="utf-8") as f:
-        improved_data = json.load(f)
-        
-    # 3. Generate PDF
-    improved_path = os.path.join(OUTPUT_DIR, f"{request.file_id}_improved.pdf")
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(
-        executor, generate_improved_pdf, improved_data, improved_path, request.template_id
-    )
+    # 3. Generate PDF (in memory)
+    max_pages = request.max_pages or PDF_FIT_PAGES
+    pdf_bytes = await render_pdf_cached(improved_data, request.template_id, max_pages, admit=True)
+    if PERSIST_RENDERED_PDFS:
+        improved_path = improved_pdf_path(request.file_id, request.template_id, max_pages)
+        background_tasks.add_task(persist_pdf, pdf_bytes, improved_path)
+    
+    if request.stream:
+        return pdf_response(pdf_bytes)
     
     return {
         "status": "success",
-        "download_url": f"/api/download/{request.file_id}"
+        "download_url": f"/api/download/{request.file_id}?template_id={request.template_id}"
+                        + (f"&max_pages={request.max_pages}" if request.max_pages else "")
     }
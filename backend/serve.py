@@ -0,0 +1,152 @@
+"""
+Multi-process server with fork-after-warm model sharing.
+
+Usage (from the backend directory):
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+
+Plain `uvicorn --workers N` starts every worker from scratch, so each one
+loads its own PaddleOCR models and Paddle runtime. Here the master process
+imports the app and warms the heavy read-only state once: OCR models, Unicode
+font metrics, compiled template styles and the render backend choice. It then
+freezes the garbage collector's view of those objects and forks the workers,
+which share the warmed pages copy-on-write and serve on one listening socket.
+The master restarts workers that die and forwards SIGINT/SIGTERM.
+
+State that must agree across workers is kept outside the process: job state
+defaults to the SQLite job store and rendered PDFs to the on-disk render
+cache. Batch status (/api/batch) is still per worker.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger("serve")
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1)))
+# Load PaddleOCR in the master. Disable if the Paddle build misbehaves after fork.
+SERVE_PRELOAD_OCR = os.getenv("SERVE_PRELOAD_OCR", "true").lower() in ("1", "true", "yes")
+
+
+def configure_environment(workers: int):
+    """Defaults for multi-process serving; explicit settings always win."""
+    # Progress and results must be visible to whichever worker gets the poll
+    os.environ.setdefault("JOB_STORE", "sqlite")
+    # Share the machine's render processes between the workers instead of
+    # giving every worker one per core
+    os.environ.setdefault("RENDER_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+
+def warm():
+    """Import the app and load everything workers can share read-only."""
+    import main
+    from services.fonts import preload_fonts
+    from services.render_backends import select_backend
+    from services.templates import TEMPLATES
+
+    preload_fonts()
+    for template_id, template in TEMPLATES.items():
+        template.get_styles()
+        select_backend(template_id)
+    if SERVE_PRELOAD_OCR:
+        from services.pdf_service import get_paddle_ocr
+        try:
+            get_paddle_ocr()
+        except Exception as e:
+            # Workers fall back to loading OCR lazily, each on its own
+            logger.warning(f"✗ Could not preload PaddleOCR: {str(e)}")
+    return main.app
+
+
+def bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket):
+    """Child process: serve the pre-imported app on the shared socket."""
+    import uvicorn
+
+    # The master's handlers must not run in the child; uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_config=None, timeout_graceful_shutdown=30)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock)
+        except BaseException:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork(); use uvicorn directly on this platform")
+
+    configure_environment(args.workers)
+    started = time.perf_counter()
+    app = warm()
+    sock = bind(args.host, args.port)
+    logger.info(f"✓ Master {os.getpid()} warmed in {time.perf_counter() - started:.1f}s, "
+                f"forking {args.workers} workers on {args.host}:{args.port}")
+
+    # Move everything loaded so far out of the collector's reach, so its
+    # bookkeeping does not write to (and un-share) the inherited pages
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn(app, sock) for _ in range(args.workers)}
+    running = True
+
+    def stop(signum, frame):
+        nonlocal running
+        running = False
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in workers:
+            continue  # not a worker, e.g. an orphaned render process
+        workers.discard(pid)
+        if running:
+            logger.warning(f"✗ Worker {pid} exited ({status}), starting a replacement")
+            time.sleep(1)  # don't spin if workers die on startup
+            workers.add(spawn(app, sock))
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
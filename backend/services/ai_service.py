@@ -3,12 +3,12 @@ import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import logging
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from services.scheduler import scheduler
+from services.artifacts import artifacts
+from services.storage import storage
 from services.templates import get_template
 
-# Thread pool for running blocking Gemini API calls
-_executor = ThreadPoolExecutor(max_workers=4)
-
 logger = logging.getLogger(__name__)
 
 # Configure Gemini
@@ -107,7 +107,26 @@ Return ONLY the improved resume text following the EXACT structure above with se
 
 import json
 
-async def improve_resume_text(original_text: str, file_id: str = None, template_id: str = "professional") -> dict:
+def _generate_streamed(model, prompt: str, on_chunk: Callable[[int], None]):
+    """Stream a Gemini response, reporting the characters received so far after each chunk."""
+    response = model.generate_content(prompt, stream=True)
+    received = 0
+    for chunk in response:
+        # chunk.text and chunk.parts raise on chunks without text (e.g. the final
+        # one carrying only the finish reason, usage metadata or safety ratings),
+        # so read the parts of the first candidate, if there is one
+        candidates = chunk.candidates
+        if not candidates or candidates[0].content is None:
+            continue
+        text = sum(len(part.text) for part in candidates[0].content.parts if getattr(part, "text", None))
+        if not text:
+            continue
+        received += text
+        on_chunk(received)
+    return response
+
+async def improve_resume_text(original_text: str, file_id: str = None, template_id: str = "professional",
+                              on_chunk: Optional[Callable[[int], None]] = None) -> dict:
     logger.info("=" * 80)
     logger.info("STARTING RESUME IMPROVEMENT PROCESS (JSON MODE)")
     logger.info("=" * 80)
@@ -156,11 +175,11 @@ async def improve_resume_text(original_text: str, file_id: str = None, template_
 
         logger.info(f"🚀 Sending improvement request to Gemini...")
         
-        # Run blocking API call in thread pool
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            _executor, model.generate_content, prompt
-        )
+        # Run blocking API call in the scheduler's LLM stage; stream it when someone wants progress
+        if on_chunk:
+            response = await scheduler["llm"].run(_generate_streamed, model, prompt, on_chunk)
+        else:
+            response = await scheduler["llm"].run(model.generate_content, prompt)
         
         logger.info("✓ Received response from Gemini")
         
@@ -174,13 +193,6 @@ async def improve_resume_text(original_text: str, file_id: str = None, template_
             logger.error(f"Raw response: {response.text[:500]}...") # Log first 500 chars
             raise ValueError(f"Failed to parse AI response: {str(e)}")
 
-        # Save debug output
-        if file_id:
-            output_path = f"backend/outputs/{file_id}_data.json"
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            logger.info(f"Debug JSON saved to: {output_path}")
-
         return data
 
     except Exception as e:
@@ -188,33 +200,25 @@ async def improve_resume_text(original_text: str, file_id: str = None, template_
         raise
 
 def save_improvement_analysis(original_text: str, improved_text: str, suggestions: str, file_id: str):
-    """Save improvement analysis and suggestions to a file."""
-    try:
-        output_path = f"backend/outputs/{file_id}_improvements.txt"
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write("=" * 80 + "\n")
-            f.write("RESUME IMPROVEMENT ANALYSIS\n")
-            f.write(f"File ID: {file_id}\n")
-            f.write("=" * 80 + "\n\n")
-            
-            f.write("IMPROVEMENTS MADE:\n")
-            f.write("-" * 80 + "\n")
-            f.write(suggestions + "\n\n")
-            
-            f.write("=" * 80 + "\n")
-            f.write("ORIGINAL TEXT\n")
-            f.write("=" * 80 + "\n")
-            f.write(original_text + "\n\n")
-            
-            f.write("=" * 80 + "\n")
-            f.write("IMPROVED TEXT\n")
-            f.write("=" * 80 + "\n")
-            f.write(improved_text + "\n")
-        
-        logger.info(f"Improvement analysis saved to: {output_path}")
-    except Exception as e:
-        logger.error(f"Error saving improvement analysis: {str(e)}")
+    """Save improvement analysis and suggestions to a file (ARTIFACT_LEVEL=full)."""
+    output_path = storage.path("improvements", file_id)
+    artifacts.write_text(output_path, (
+        "=" * 80 + "\n"
+        "RESUME IMPROVEMENT ANALYSIS\n"
+        f"File ID: {file_id}\n"
+        + "=" * 80 + "\n\n"
+        "IMPROVEMENTS MADE:\n"
+        + "-" * 80 + "\n"
+        + suggestions + "\n\n"
+        + "=" * 80 + "\n"
+        "ORIGINAL TEXT\n"
+        + "=" * 80 + "\n"
+        + original_text + "\n\n"
+        + "=" * 80 + "\n"
+        "IMPROVED TEXT\n"
+        + "=" * 80 + "\n"
+        + improved_text + "\n"
+    ))
 
 
 def simulate_improvement(text: str) -> str:
@@ -0,0 +1,162 @@
+"""
+Artifact writer.
+Every file the pipeline writes besides the upload and rendered PDFs goes
+through one writer thread fed by a bounded queue, so request handlers, stage
+workers and OCR threads only serialize and enqueue:
+- required artifacts ({id}_debug.json, the resume data downloads and
+  re-renders are made from) are always written;
+- debug artifacts ({id}_ocr_result.txt, ...) are written according to
+  ARTIFACT_LEVEL: off, metadata (headers and counts only) or full.
+
+JSON is serialized once, compactly, when it is enqueued. A written file is
+replaced atomically, and until then read_json() serves the pending data, so
+an artifact is readable from the moment it is submitted. flushed() waits
+until it is on disk, for callers that hand it to another process.
+When the queue is full, required artifacts are written by the caller and
+debug artifacts are dropped.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_LEVEL = os.getenv("ARTIFACT_LEVEL", "metadata").lower()
+ARTIFACT_QUEUE_SIZE = int(os.getenv("ARTIFACT_QUEUE_SIZE", "256"))
+
+LEVELS = {"off": 0, "metadata": 1, "full": 2, "required": 3}
+
+
+def _write_file(path: str, payload: bytes):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class ArtifactWriter:
+    """Writes artifacts on a background thread through a bounded queue."""
+
+    def __init__(self, level: str = ARTIFACT_LEVEL, queue_size: int = ARTIFACT_QUEUE_SIZE):
+        if level not in ("off", "metadata", "full"):
+            logger.warning(f"Unknown ARTIFACT_LEVEL '{level}', using 'metadata'")
+            level = "metadata"
+        self.level = level
+        self._queue: "queue.Queue[Optional[Tuple[str, bytes, Future]]]" = queue.Queue(maxsize=queue_size)
+        # path -> (data as submitted, completion), until the file is written
+        self._pending: Dict[str, Tuple[Any, Future]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.written_inline = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def enabled(self, level: str) -> bool:
+        """Whether artifacts of this level are written at the configured level."""
+        return LEVELS[level] <= LEVELS[self.level] or level == "required"
+
+    def write_json(self, path: str, data: Any, level: str = "required") -> Optional[Future]:
+        if not self.enabled(level):
+            return None
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return self._submit(path, payload, data, level)
+
+    def write_text(self, path: str, text: str, level: str = "full") -> Optional[Future]:
+        if not self.enabled(level):
+            return None
+        return self._submit(path, text.encode("utf-8"), text, level)
+
+    def _submit(self, path: str, payload: bytes, data: Any, level: str) -> Optional[Future]:
+        self._ensure_thread()
+        done: Future = Future()
+        with self._lock:
+            self._pending[path] = (data, done)
+        try:
+            self._queue.put_nowait((path, payload, done))
+        except queue.Full:
+            if level != "required":
+                self._settle(path, done)
+                self.dropped += 1
+                logger.warning(f"✗ Artifact queue full, dropped {os.path.basename(path)}")
+                return None
+            # Never lose required data: write it here instead
+            self._write(path, payload, done)
+            self.written_inline += 1
+        return done
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._write(*item)
+
+    def _write(self, path: str, payload: bytes, done: Future):
+        try:
+            _write_file(path, payload)
+            self.written += 1
+            done.set_result(path)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"✗ Could not write artifact {path}: {str(e)}")
+            done.set_exception(e)
+        finally:
+            self._settle(path, done)
+
+    def _settle(self, path: str, done: Future):
+        with self._lock:
+            # A newer write to the same path stays pending
+            if path in self._pending and self._pending[path][1] is done:
+                del self._pending[path]
+
+    def read_json(self, path: str) -> Optional[Any]:
+        """The artifact's data, pending or on disk; None if there is none."""
+        with self._lock:
+            pending = self._pending.get(path)
+        if pending is not None:
+            return pending[0]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    async def flushed(self, path: str):
+        """Wait until a pending write of path is on disk; raises if the write failed."""
+        with self._lock:
+            pending = self._pending.get(path)
+        if pending is not None:
+            await asyncio.wrap_future(pending[1])
+
+    def close(self, timeout: float = 10.0):
+        """Write everything queued, then stop the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        return {
+            "level": self.level,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "written_inline": self.written_inline,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+artifacts = ArtifactWriter()
@@ -0,0 +1,357 @@
+"""
+Batch processing service.
+Runs many resumes through the extract -> improve -> render pipeline in the
+background, with a bounded number of items in flight per stage.
+
+Batch uploads stream to disk like single uploads (services.uploads): PDFs go
+straight to their item's original.pdf, ZIP archives to a temporary file that
+is expanded off the event loop. Every PDF, in the request or in an archive,
+must start with %PDF- and stay under the single-upload size cap; archives
+are also capped on member count, total expanded size and compression ratio.
+Finished batches are kept for BATCH_TTL_SECONDS, and at most
+BATCH_MAX_BATCHES are held. Rendered PDFs are persisted only when the
+processor is built with persist (PERSIST_RENDERED_PDFS); otherwise the archive
+takes them from the render callback, which serves them from the render cache.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.pdf_service import extract_text_from_pdf
+from services.ai_service import improve_resume_text
+from services.artifacts import artifacts
+from services.scheduler import SLOW_LANE, scheduler
+from services.storage import storage
+from services.uploads import MAGIC_WINDOW, ReceivedFile, UploadRejected
+from services.zip_stream import ZipStream
+
+logger = logging.getLogger(__name__)
+
+# Per-batch concurrency limits, so one large batch cannot take every slot of
+# the shared stages in services.scheduler.
+EXTRACT_CONCURRENCY = int(os.getenv("BATCH_EXTRACT_CONCURRENCY", "4"))
+IMPROVE_CONCURRENCY = int(os.getenv("BATCH_IMPROVE_CONCURRENCY", "8"))
+RENDER_CONCURRENCY = int(os.getenv("BATCH_RENDER_CONCURRENCY", "4"))
+MAX_BATCH_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+# Largest ZIP archive accepted, and most PDF bytes one batch may add up to (expanded)
+MAX_ARCHIVE_BYTES = int(os.getenv("BATCH_MAX_ARCHIVE_BYTES", str(100 * 1024 * 1024)))
+MAX_BATCH_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(500 * 1024 * 1024)))
+# PDFs rarely compress better than a few to one; far higher ratios are zip bombs
+MAX_ZIP_RATIO = int(os.getenv("BATCH_MAX_ZIP_RATIO", "100"))
+# How long finished batches stay queryable, and how many are kept
+BATCH_TTL_SECONDS = int(os.getenv("BATCH_TTL_SECONDS", str(6 * 3600)))
+MAX_BATCHES = int(os.getenv("BATCH_MAX_BATCHES", "200"))
+COPY_CHUNK_SIZE = 64 * 1024
+
+ITEM_STAGES = ["queued", "extracting", "improving", "rendering", "complete", "error"]
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class BatchUpload:
+    """
+    The files of one batch request: accept_file() places each file part as it
+    streams in, expand() turns them into PDFs on disk, discard() removes
+    everything written so far.
+    """
+
+    def __init__(self, upload_dir: str, max_pdf_bytes: int):
+        self.upload_dir = upload_dir
+        self.max_pdf_bytes = max_pdf_bytes
+        self.received: List[ReceivedFile] = []
+        self._pdfs: List[Tuple[str, str]] = []
+        self._bytes = 0
+
+    def accept_file(self, field: str, filename: str) -> ReceivedFile:
+        """services.uploads callback: where a file part goes and its limits."""
+        # Parts before this one are complete, so their sizes are final
+        if sum(received.size for received in self.received) > MAX_BATCH_BYTES:
+            raise UploadRejected(413, f"Batch exceeds the limit of {MAX_BATCH_BYTES} bytes", filename)
+        name = filename.lower()
+        if name.endswith(".pdf"):
+            file_id = str(uuid.uuid4())
+            received = ReceivedFile(filename, storage.path("original", file_id), self.max_pdf_bytes)
+            self._pdfs.append((filename, file_id))
+        elif name.endswith(".zip"):
+            path = os.path.join(self.upload_dir, f"{uuid.uuid4()}_batch.zip.part")
+            received = ReceivedFile(filename, path, MAX_ARCHIVE_BYTES, magic=b"PK\x03\x04", kind="ZIP archive")
+        else:
+            raise UploadRejected(400, "Unsupported file in batch (PDF or ZIP only)", filename)
+        self.received.append(received)
+        return received
+
+    def expand(self) -> List[Tuple[str, str]]:
+        """
+        (filename, item id) of every PDF in the batch, each saved as the item's
+        original.pdf. Blocking; run it in a thread. Raises ValueError (after
+        removing everything) if an archive breaks a limit.
+        """
+        try:
+            for received in self.received:
+                if received.kind == "PDF":
+                    self._bytes += received.size
+                    storage.adopt(received.path, received.digest)
+                else:
+                    self._expand_zip(received)
+                    os.remove(received.path)
+            if len(self._pdfs) > MAX_BATCH_ITEMS:
+                raise ValueError(f"Batch exceeds the limit of {MAX_BATCH_ITEMS} files")
+            return list(self._pdfs)
+        except BaseException:
+            self.discard()
+            raise
+
+    def _expand_zip(self, received: ReceivedFile):
+        try:
+            with zipfile.ZipFile(received.path) as archive:
+                for info in archive.infolist():
+                    member = os.path.basename(info.filename)
+                    if info.is_dir() or not member.lower().endswith(".pdf"):
+                        continue
+                    if len(self._pdfs) >= MAX_BATCH_ITEMS:
+                        raise ValueError(f"Batch exceeds the limit of {MAX_BATCH_ITEMS} files")
+                    # The header sizes are only a first check; the copy counts real bytes
+                    if info.file_size > self.max_pdf_bytes:
+                        raise ValueError(f"{member} is larger than {self.max_pdf_bytes} bytes")
+                    if info.file_size > MAX_ZIP_RATIO * max(info.compress_size, 1):
+                        raise ValueError(f"{member} expands more than {MAX_ZIP_RATIO}x")
+                    file_id = str(uuid.uuid4())
+                    self._pdfs.append((member, file_id))
+                    self._copy_member(archive, info, member, storage.path("original", file_id))
+        except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+            # RuntimeError: encrypted member; NotImplementedError: unsupported compression
+            raise ValueError(f"Could not read {received.filename}: {str(e)}")
+
+    def _copy_member(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo, member: str, path: str):
+        size = 0
+        digest = hashlib.sha256()
+        with archive.open(info) as source, open(path, "wb") as target:
+            while chunk := source.read(COPY_CHUNK_SIZE):
+                if size == 0 and b"%PDF-" not in chunk[:MAGIC_WINDOW]:
+                    raise ValueError(f"{member} is not a PDF")
+                size += len(chunk)
+                self._bytes += len(chunk)
+                if size > self.max_pdf_bytes:
+                    raise ValueError(f"{member} is larger than {self.max_pdf_bytes} bytes")
+                if self._bytes > MAX_BATCH_BYTES:
+                    raise ValueError(f"Batch expands to more than {MAX_BATCH_BYTES} bytes")
+                digest.update(chunk)
+                target.write(chunk)
+        if size == 0:
+            raise ValueError(f"{member} is empty")
+        storage.adopt(path, digest.hexdigest())
+
+    def discard(self):
+        for path in [received.path for received in self.received] + [
+            storage.path("original", file_id) for _, file_id in self._pdfs
+        ]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class BatchProcessor:
+    """Accepts batches of resumes and processes them with bounded concurrency."""
+
+    def __init__(
+        self,
+        upload_dir: str,
+        output_dir: str,
+        render: Callable[[dict, str], Awaitable[bytes]],
+        pdf_path: Callable[[str, str], str],
+        persist: bool = True,
+    ):
+        self.render = render
+        # (item id, template_id) -> where the rendered PDF is persisted
+        self.pdf_path = pdf_path
+        # Write rendered PDFs to pdf_path; without, archives render them again (from the cache)
+        self.persist = persist
+        self.upload_dir = upload_dir
+        self.output_dir = output_dir
+        self.batches: Dict[str, Dict] = {}
+        # Finished batches in finishing order -> when they expire
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.evicted = 0
+        self._extract_slots: Optional[asyncio.Semaphore] = None
+        self._improve_slots: Optional[asyncio.Semaphore] = None
+        self._render_slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_slots(self):
+        # Semaphores are created lazily so they bind to the running event loop
+        if self._extract_slots is None:
+            self._extract_slots = asyncio.Semaphore(EXTRACT_CONCURRENCY)
+            self._improve_slots = asyncio.Semaphore(IMPROVE_CONCURRENCY)
+            self._render_slots = asyncio.Semaphore(RENDER_CONCURRENCY)
+
+    def submit(self, files: List[Tuple[str, str]], template_id: str = "professional") -> str:
+        """
+        Schedule processing of PDFs already saved as UPLOAD_DIR/{id}_original.pdf
+        (BatchUpload.expand) and return the batch id.
+        """
+        if not files:
+            raise ValueError("Batch contains no PDF files")
+        if len(files) > MAX_BATCH_ITEMS:
+            raise ValueError(f"Batch exceeds the limit of {MAX_BATCH_ITEMS} files")
+
+        self._ensure_slots()
+        self._prune()
+        batch_id = str(uuid.uuid4())
+        items = []
+        for filename, file_id in files:
+            items.append({
+                "id": file_id,
+                "filename": filename,
+                "status": "queued",
+                "error": None,
+            })
+
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "template_id": template_id,
+            "created": datetime.now().isoformat(),
+            "finished": None,
+            "items": items,
+        }
+        logger.info(f"Batch {batch_id} accepted with {len(items)} files (template: {template_id})")
+
+        self._tasks[batch_id] = asyncio.create_task(self._run_batch(batch_id))
+        return batch_id
+
+    async def _run_batch(self, batch_id: str):
+        batch = self.batches[batch_id]
+        await asyncio.gather(
+            *(self._process_item(item, batch["template_id"]) for item in batch["items"])
+        )
+        batch["finished"] = datetime.now().isoformat()
+        self._expires[batch_id] = time.monotonic() + BATCH_TTL_SECONDS
+        self._tasks.pop(batch_id, None)
+        summary = self.get_status(batch_id)
+        logger.info(
+            f"Batch {batch_id} finished: {summary['completed']} complete, {summary['failed']} failed"
+        )
+
+    async def _process_item(self, item: Dict, template_id: str):
+        file_id = item["id"]
+        original_path = os.path.join(self.upload_dir, f"{file_id}_original.pdf")
+
+        try:
+            async with self._extract_slots:
+                item["status"] = "extracting"
+                # Bulk work stays in the slow lane, clear of interactive uploads
+                original_text = await scheduler["ocr"].run(extract_text_from_pdf, original_path, lane=SLOW_LANE)
+            if not original_text.strip():
+                raise ValueError("Could not extract text from PDF")
+
+            async with self._improve_slots:
+                item["status"] = "improving"
+                improved_data = await improve_resume_text(original_text, file_id, template_id)
+
+            debug_path = os.path.join(self.output_dir, f"{file_id}_debug.json")
+            artifacts.write_json(debug_path, improved_data)
+
+            async with self._render_slots:
+                item["status"] = "rendering"
+                pdf_bytes = await self.render(improved_data, template_id)
+
+            if self.persist:
+                await asyncio.to_thread(storage.put_bytes, pdf_bytes, self.pdf_path(file_id, template_id))
+            await artifacts.flushed(debug_path)
+
+            item["status"] = "complete"
+        except Exception as e:
+            logger.error(f"Batch item {file_id} ({item['filename']}) failed: {str(e)}")
+            item["status"] = "error"
+            item["error"] = str(e)
+
+    def get_status(self, batch_id: str) -> Optional[Dict]:
+        """Aggregate progress for a batch, or None if the batch is unknown or has expired."""
+        self._prune()
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+
+        counts = {stage: 0 for stage in ITEM_STAGES}
+        for item in batch["items"]:
+            counts[item["status"]] += 1
+
+        total = len(batch["items"])
+        done = counts["complete"] + counts["error"]
+        return {
+            "id": batch_id,
+            "template_id": batch["template_id"],
+            "created": batch["created"],
+            "finished": batch["finished"],
+            "total": total,
+            "completed": counts["complete"],
+            "failed": counts["error"],
+            "stages": counts,
+            "progress": round(100 * done / total) if total else 100,
+            "items": [dict(item) for item in batch["items"]],
+        }
+
+    def _prune(self):
+        # Finished batches only; a running batch is never dropped
+        now = time.monotonic()
+        excess = len(self.batches) - MAX_BATCHES
+        while self._expires:
+            batch_id, expires = next(iter(self._expires.items()))
+            if expires > now and excess <= 0:
+                break
+            del self._expires[batch_id]
+            self.batches.pop(batch_id, None)
+            self.evicted += 1
+            excess -= 1
+
+    async def _item_pdf(self, item_id: str, template_id: str) -> Optional[bytes]:
+        """A completed item's PDF: the persisted file, or rendered again from its resume data."""
+        if self.persist:
+            pdf_path = self.pdf_path(item_id, template_id)
+            try:
+                return await asyncio.to_thread(_read_file, pdf_path)
+            except OSError:
+                return None
+        improved_data = artifacts.read_json(os.path.join(self.output_dir, f"{item_id}_debug.json"))
+        if improved_data is None:
+            return None
+        return await self.render(improved_data, template_id)
+
+    async def iter_archive(self, batch_id: str) -> AsyncIterator[bytes]:
+        """Stream a ZIP with every completed PDF plus a manifest of the batch."""
+        batch = self.batches[batch_id]
+        sink = ZipStream()
+        used_names = set()
+
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for item in batch["items"]:
+                if item["status"] != "complete":
+                    continue
+                pdf_bytes = await self._item_pdf(item["id"], batch["template_id"])
+                if pdf_bytes is None:
+                    continue
+
+                stem = os.path.splitext(item["filename"])[0] or item["id"]
+                arcname = f"{stem}_improved.pdf"
+                if arcname in used_names:
+                    arcname = f"{stem}_{item['id'][:8]}_improved.pdf"
+                used_names.add(arcname)
+
+                # Deflating runs off the event loop
+                await asyncio.to_thread(archive.writestr, arcname, pdf_bytes)
+                yield sink.drain()
+
+            manifest = self.get_status(batch_id)
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+        yield sink.drain()
@@ -0,0 +1,343 @@
+"""
+Document exporters.
+Render the intermediate document model (services.render_model) to DOCX, HTML
+and ATS plain text, styled from the template's paragraph styles. HTML and text
+are plain string building and DOCX is built with python-docx; none of them
+runs a layout engine, so they cost a small fraction of a PDF render. Each
+exporter yields its output in chunks, so responses can start streaming before
+the whole document is produced.
+"""
+
+import html
+import io
+import re
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING, WD_TAB_ALIGNMENT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt, Twips
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle
+
+from services.render_model import Entry, ResumeDocument, Spacing, Text, document_from_data, plain_text
+from services.templates import get_template
+
+# Bump whenever a change alters exported output, so cached exports are not reused
+EXPORT_VERSION = "export-2"
+
+# format -> (media type, file extension)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx"),
+    "html": ("text/html; charset=utf-8", "html"),
+    "txt": ("text/plain; charset=utf-8", "txt"),
+}
+
+# ReportLab base fonts -> the fonts word processors and browsers know
+_FONT_FAMILIES = {
+    "Times": ("Times New Roman", "'Times New Roman', Times, serif"),
+    "Helvetica": ("Arial", "Arial, Helvetica, sans-serif"),
+    "Courier": ("Courier New", "'Courier New', Courier, monospace"),
+}
+
+_TAG_RE = re.compile(r"<(/?)(\w+)[^>]*>")
+
+# Entry fields and the template item style used for each
+_ENTRY_STYLES = {
+    "experience": ("exp_company", "exp_location", "exp_role", "exp_date"),
+    "education": ("edu_institution", "edu_location", "edu_degree", "edu_date"),
+}
+
+# Text block style -> (paragraph style, bold, italic)
+_TEXT_STYLES = {
+    "paragraph": ("body", False, False),
+    "line": ("body", False, False),
+    "bold": ("body", True, False),
+    "italic": ("body", False, True),
+    "bullet": ("bullet", False, False),
+}
+
+
+def _font(style: ParagraphStyle) -> Tuple[str, bool, bool]:
+    """(base family, bold, italic) of a ReportLab style's font."""
+    name = style.fontName
+    base = name.split("-")[0]
+    return base, "Bold" in name, "Italic" in name or "Oblique" in name
+
+
+def _runs(markup: str) -> List[Tuple[str, bool, bool]]:
+    """Split paragraph markup into (text, bold, italic) runs."""
+    runs = []
+    bold = italic = False
+    position = 0
+    for match in _TAG_RE.finditer(markup):
+        if match.start() > position:
+            runs.append((html.unescape(markup[position:match.start()]), bold, italic))
+        closing, tag = match.group(1) == "/", match.group(2).lower()
+        if tag in ("b", "strong"):
+            bold = not closing
+        elif tag in ("i", "em"):
+            italic = not closing
+        position = match.end()
+    if position < len(markup):
+        runs.append((html.unescape(markup[position:]), bold, italic))
+    return runs
+
+
+def _entry_fields(entry: Entry) -> Tuple[str, str, str, str]:
+    return entry.title, entry.location, entry.subtitle, entry.date
+
+
+# --- Plain text ---------------------------------------------------------------
+
+def iter_text(document: ResumeDocument) -> Iterator[str]:
+    """ATS plain text: no columns or tables, upper-case headings, '-' bullets."""
+    header = document.header
+    lines = [plain_text(header.name).upper()]
+    lines.extend(plain_text(line) for line in header.contact)
+    yield "\n".join(lines) + "\n"
+
+    for section in document.sections:
+        lines = [""]
+        if section.title:
+            title = plain_text(section.title).upper()
+            lines += [title, "-" * len(title)]
+        for block in section.blocks:
+            if isinstance(block, Entry):
+                title, location, subtitle, date = (plain_text(f) for f in _entry_fields(block))
+                lines.append(" | ".join(f for f in (title, location) if f))
+                lines.append(" | ".join(f for f in (subtitle, date) if f))
+                lines.extend(f"- {plain_text(b)}" for b in block.bullets)
+                lines.append("")
+            elif isinstance(block, Text):
+                prefix = "- " if block.style == "bullet" else ""
+                lines.append(prefix + plain_text(block.text))
+            else:
+                lines.append("")
+        yield "\n".join(lines).rstrip("\n") + "\n"
+
+
+# --- HTML ---------------------------------------------------------------------
+
+def _css(selector: str, style: ParagraphStyle) -> str:
+    base, bold, italic = _font(style)
+    family = _FONT_FAMILIES.get(base, (base, "serif"))[1]
+    align = {TA_CENTER: "center", TA_RIGHT: "right", TA_JUSTIFY: "justify"}.get(style.alignment, "left")
+    return (
+        f"{selector}{{font-family:{family};font-size:{style.fontSize}pt;"
+        f"font-weight:{'bold' if bold else 'normal'};font-style:{'italic' if italic else 'normal'};"
+        f"text-align:{align};line-height:{style.leading}pt;"
+        f"margin:{style.spaceBefore}pt 0 {style.spaceAfter}pt}}"
+    )
+
+
+def _html_runs(markup: str) -> str:
+    parts = []
+    for text, bold, italic in _runs(markup):
+        text = html.escape(text, quote=False)
+        if italic:
+            text = f"<i>{text}</i>"
+        if bold:
+            text = f"<b>{text}</b>"
+        parts.append(text)
+    return "".join(parts)
+
+
+def iter_html(document: ResumeDocument, styles: Mapping[str, ParagraphStyle]) -> Iterator[str]:
+    """Standalone HTML page with the template's styles inlined as CSS."""
+    rules = [
+        _css(".name", styles["name"]),
+        _css(".contact", styles["contact"]),
+        _css("h2", styles["section_heading"]),
+        _css("p", styles["body"]),
+        _css("li", styles["bullet"]),
+    ]
+    for kind, keys in _ENTRY_STYLES.items():
+        rules += [_css(f".{kind} .f{i}", styles[key]) for i, key in enumerate(keys)]
+    rules += [
+        "body{max-width:7in;margin:0.83in auto;color:#000}",
+        "h2{text-transform:uppercase;border-bottom:1px solid #000}",
+        ".row{display:flex;justify-content:space-between}",
+        ".row span{margin:0}",
+        "ul{margin:0;padding-left:15pt}",
+    ]
+    header = document.header
+    yield (
+        "<!DOCTYPE html>\n<html lang=\"en\"><head><meta charset=\"utf-8\">"
+        f"<title>{_html_runs(header.name)}</title><style>{''.join(rules)}</style></head><body>\n"
+        f"<header><div class=\"name\">{html.escape(plain_text(header.name).upper(), quote=False)}</div>"
+        + "".join(f"<div class=\"contact\">{_html_runs(line)}</div>" for line in header.contact)
+        + "</header>\n"
+    )
+
+    for section in document.sections:
+        parts = ["<section>"]
+        if section.title:
+            parts.append(f"<h2>{_html_runs(section.title)}</h2>")
+        for block in section.blocks:
+            if isinstance(block, Entry):
+                f0, f1, f2, f3 = (_html_runs(f) for f in _entry_fields(block))
+                parts.append(
+                    f"<div class=\"{block.kind}\">"
+                    f"<div class=\"row\"><span class=\"f0\">{f0}</span><span class=\"f1\">{f1}</span></div>"
+                    f"<div class=\"row\"><span class=\"f2\">{f2}</span><span class=\"f3\">{f3}</span></div>"
+                )
+                if block.bullets:
+                    parts.append("<ul>" + "".join(f"<li>{_html_runs(b)}</li>" for b in block.bullets) + "</ul>")
+                parts.append("</div>")
+            elif isinstance(block, Text):
+                _, bold, italic = _TEXT_STYLES[block.style]
+                text = _html_runs(block.text)
+                text = f"<b>{text}</b>" if bold else f"<i>{text}</i>" if italic else text
+                parts.append(f"<ul><li>{text}</li></ul>" if block.style == "bullet" else f"<p>{text}</p>")
+            elif isinstance(block, Spacing):
+                parts.append("<br>")
+        parts.append("</section>\n")
+        yield "".join(parts)
+
+    yield "</body></html>\n"
+
+
+# --- DOCX ---------------------------------------------------------------------
+
+# US Letter with the PDF template's 0.83in margins, in twentieths of a point
+_PAGE_WIDTH, _PAGE_HEIGHT, _MARGIN = 12240, 15840, 1195
+_TEXT_WIDTH = _PAGE_WIDTH - 2 * _MARGIN
+
+DOCX_CHUNK_SIZE = 64 * 1024
+
+
+def _docx_style(document, style_id: str, style: ParagraphStyle):
+    """Add a paragraph style with the template style's font, spacing and alignment."""
+    base, bold, italic = _font(style)
+    family = _FONT_FAMILIES.get(base, (base, ""))[0]
+    docx_style = document.styles.add_style(style_id, WD_STYLE_TYPE.PARAGRAPH)
+    docx_style.base_style = document.styles["Normal"]
+    font = docx_style.font
+    font.name = family
+    font.size = Pt(style.fontSize)
+    font.bold = bold
+    font.italic = italic
+    # font.name leaves the East Asian font to the theme
+    docx_style.element.get_or_add_rPr().get_or_add_rFonts().set(qn("w:eastAsia"), family)
+    paragraph = docx_style.paragraph_format
+    paragraph.alignment = {
+        TA_CENTER: WD_ALIGN_PARAGRAPH.CENTER,
+        TA_RIGHT: WD_ALIGN_PARAGRAPH.RIGHT,
+        TA_JUSTIFY: WD_ALIGN_PARAGRAPH.JUSTIFY,
+    }.get(style.alignment, WD_ALIGN_PARAGRAPH.LEFT)
+    paragraph.space_before = Pt(style.spaceBefore)
+    paragraph.space_after = Pt(style.spaceAfter)
+    paragraph.line_spacing = Pt(style.leading)
+    paragraph.line_spacing_rule = WD_LINE_SPACING.AT_LEAST
+    return docx_style
+
+
+def _docx_styles(document, styles: Mapping[str, ParagraphStyle]):
+    _docx_style(document, "Name", styles["name"])
+    _docx_style(document, "Contact", styles["contact"])
+
+    heading = _docx_style(document, "SectionHeading", styles["section_heading"])
+    heading.font.all_caps = True
+    border = OxmlElement("w:pBdr")
+    bottom = OxmlElement("w:bottom")
+    for attribute, value in (("val", "single"), ("sz", "4"), ("space", "1"), ("color", "000000")):
+        bottom.set(qn(f"w:{attribute}"), value)
+    border.append(bottom)
+    heading.element.get_or_add_pPr().append(border)
+
+    _docx_style(document, "Body", styles["body"])
+
+    bullet = styles["bullet"]
+    bullet_style = _docx_style(document, "Bullet", bullet)
+    bullet_style.paragraph_format.left_indent = Pt(bullet.leftIndent)
+    bullet_style.paragraph_format.first_line_indent = Pt(bullet.bulletIndent - bullet.leftIndent)
+    bullet_style.paragraph_format.tab_stops.add_tab_stop(Pt(bullet.leftIndent))
+
+    entry_line = _docx_style(document, "EntryLine", styles["body"])
+    entry_line.paragraph_format.tab_stops.add_tab_stop(Twips(_TEXT_WIDTH), WD_TAB_ALIGNMENT.RIGHT)
+
+
+def _docx_runs(paragraph, markup: str, style: Optional[ParagraphStyle] = None,
+               bold: bool = False, italic: bool = False):
+    """Add runs for markup; style (an item style) and the flags add bold/italic on top."""
+    size = None
+    if style is not None:
+        _, style_bold, style_italic = _font(style)
+        bold, italic = bold or style_bold, italic or style_italic
+        size = Pt(style.fontSize)
+    for text, run_bold, run_italic in _runs(markup):
+        run = paragraph.add_run(text)
+        # None inherits the paragraph style, as the PDF does
+        run.bold = True if bold or run_bold else None
+        run.italic = True if italic or run_italic else None
+        if size is not None:
+            run.font.size = size
+
+
+def _docx_body(document, document_model: ResumeDocument, styles: Mapping[str, ParagraphStyle]):
+    header = document_model.header
+    _docx_runs(document.add_paragraph(style="Name"), escape(plain_text(header.name).upper()))
+    for line in header.contact:
+        _docx_runs(document.add_paragraph(style="Contact"), line)
+
+    for section in document_model.sections:
+        if section.title:
+            _docx_runs(document.add_paragraph(style="SectionHeading"), section.title)
+        for block in section.blocks:
+            if isinstance(block, Entry):
+                keys = _ENTRY_STYLES[block.kind]
+                fields = _entry_fields(block)
+                for left, right in ((0, 1), (2, 3)):
+                    paragraph = document.add_paragraph(style="EntryLine")
+                    _docx_runs(paragraph, fields[left], styles[keys[left]])
+                    paragraph.add_run("\t")
+                    _docx_runs(paragraph, fields[right], styles[keys[right]])
+                for bullet in block.bullets:
+                    paragraph = document.add_paragraph("•\t", style="Bullet")
+                    _docx_runs(paragraph, bullet)
+            elif isinstance(block, Text):
+                style_key, bold, italic = _TEXT_STYLES[block.style]
+                paragraph = document.add_paragraph("•\t" if style_key == "bullet" else "", style=style_key.capitalize())
+                _docx_runs(paragraph, block.text, bold=bold, italic=italic)
+            else:
+                document.add_paragraph(style="Body")
+
+
+def iter_docx(document_model: ResumeDocument, styles: Mapping[str, ParagraphStyle]) -> Iterator[bytes]:
+    """WordprocessingML package built with python-docx, sent in DOCX_CHUNK_SIZE chunks."""
+    document = Document()
+    section = document.sections[0]
+    section.page_width, section.page_height = Twips(_PAGE_WIDTH), Twips(_PAGE_HEIGHT)
+    section.top_margin = section.bottom_margin = Twips(_MARGIN)
+    section.left_margin = section.right_margin = Twips(_MARGIN)
+    document.core_properties.title = plain_text(document_model.header.name)
+    _docx_styles(document, styles)
+    _docx_body(document, document_model, styles)
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+    data = buffer.getvalue()
+    for start in range(0, len(data), DOCX_CHUNK_SIZE):
+        yield data[start:start + DOCX_CHUNK_SIZE]
+
+
+def export_document(fmt: str, data: dict, template_id: str = "professional") -> Iterator[bytes]:
+    """Export structured resume data in the given format as a stream of byte chunks."""
+    document = document_from_data(data)
+    if fmt == "txt":
+        for chunk in iter_text(document):
+            yield chunk.encode("utf-8")
+        return
+
+    styles = get_template(template_id).get_styles()
+    if fmt == "docx":
+        yield from iter_docx(document, styles)
+    elif fmt == "html":
+        for chunk in iter_html(document, styles):
+            yield chunk.encode("utf-8")
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
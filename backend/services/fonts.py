@@ -0,0 +1,196 @@
+"""
+Unicode TTF fonts for the FPDF renderer.
+FPDF's core fonts only cover cp1252, so resumes with other scripts are
+rendered with an embedded TrueType family. Parsing a TTF and subsetting it are
+the expensive parts of embedding, so both are done once per process: font
+metrics are loaded on first use and subsets are cached by the set of glyphs a
+document uses.
+"""
+
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from fpdf import FPDF
+from fpdf.ttfonts import TTFontFile
+
+logger = logging.getLogger(__name__)
+
+# "auto" embeds a Unicode font only for documents cp1252 cannot encode,
+# "always" uses it for every document and "off" keeps the core Times fonts
+PDF_UNICODE_FONT = os.getenv("PDF_UNICODE_FONT", "auto").lower()
+PDF_FONT_DIR = os.getenv("PDF_FONT_DIR", "")
+FONT_SUBSET_CACHE_SIZE = int(os.getenv("FONT_SUBSET_CACHE_SIZE", "256"))
+
+FONT_SEARCH_DIRS = [
+    PDF_FONT_DIR,
+    "/usr/share/fonts/truetype",
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    "/Library/Fonts",
+    "C:\\Windows\\Fonts",
+]
+
+# Serif families in order of preference, as style -> file name
+FONT_FAMILIES: List[Tuple[str, Dict[str, str]]] = [
+    ("DejaVuSerif", {"": "DejaVuSerif.ttf", "B": "DejaVuSerif-Bold.ttf",
+                     "I": "DejaVuSerif-Italic.ttf", "BI": "DejaVuSerif-BoldItalic.ttf"}),
+    ("LiberationSerif", {"": "LiberationSerif-Regular.ttf", "B": "LiberationSerif-Bold.ttf",
+                         "I": "LiberationSerif-Italic.ttf", "BI": "LiberationSerif-BoldItalic.ttf"}),
+    ("NotoSerif", {"": "NotoSerif-Regular.ttf", "B": "NotoSerif-Bold.ttf",
+                   "I": "NotoSerif-Italic.ttf", "BI": "NotoSerif-BoldItalic.ttf"}),
+]
+
+# Styles a family may lack, and what to use instead
+STYLE_FALLBACKS = {"B": ("",), "I": ("",), "BI": ("B", "I", "")}
+
+
+@dataclass(frozen=True)
+class UnicodeFamily:
+    name: str
+    files: Dict[str, str]  # style -> TTF path, every style present
+
+
+@dataclass(frozen=True)
+class FontSubset:
+    """Everything FPDF writes for one embedded font, minus object numbers."""
+    fontstream: bytes  # compressed subset TTF
+    length1: int  # uncompressed size
+    widths: str  # the /W array
+    cidtogidmap: bytes  # compressed CIDToGIDMap stream
+
+
+def _find_files() -> Dict[str, str]:
+    wanted = {name for _, files in FONT_FAMILIES for name in files.values()}
+    found: Dict[str, str] = {}
+    for directory in FONT_SEARCH_DIRS:
+        if not directory or not os.path.isdir(directory):
+            continue
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name in wanted and name not in found:
+                    found[name] = os.path.join(root, name)
+    return found
+
+
+@lru_cache(maxsize=None)
+def unicode_family() -> Optional[UnicodeFamily]:
+    """The first installed Unicode serif family, or None."""
+    if PDF_UNICODE_FONT == "off":
+        return None
+
+    found = _find_files()
+    for family, files in FONT_FAMILIES:
+        paths = {style: found[name] for style, name in files.items() if name in found}
+        if "" not in paths:
+            continue
+        for style, fallbacks in STYLE_FALLBACKS.items():
+            if style not in paths:
+                paths[style] = next(paths[f] for f in fallbacks if f in paths)
+        logger.info(f"✓ Unicode font family: {family} ({len(set(paths.values()))} files)")
+        return UnicodeFamily(family, paths)
+
+    logger.warning("✗ No Unicode TTF font found; non-cp1252 text will render as '?'")
+    return None
+
+
+@lru_cache(maxsize=None)
+def load_font(path: str) -> dict:
+    """Parse a TTF's metrics once per process (what FPDF.add_font computes)."""
+    ttf = TTFontFile()
+    ttf.getMetrics(path)
+    return {
+        "name": "".join(c for c in ttf.fullName if c not in " ()"),
+        "type": "TTF",
+        "desc": {
+            "Ascent": int(round(ttf.ascent, 0)),
+            "Descent": int(round(ttf.descent, 0)),
+            "CapHeight": int(round(ttf.capHeight, 0)),
+            "Flags": ttf.flags,
+            "FontBBox": "[%s %s %s %s]" % tuple(int(round(v, 0)) for v in ttf.bbox),
+            "ItalicAngle": int(ttf.italicAngle),
+            "StemV": int(round(ttf.stemV, 0)),
+            "MissingWidth": int(round(ttf.defaultWidth, 0)),
+        },
+        "up": round(ttf.underlinePosition),
+        "ut": round(ttf.underlineThickness),
+        "ttffile": path,
+        "cw": ttf.charWidths,
+        "originalsize": os.stat(path).st_size,
+    }
+
+
+def ttf_text_units(font: dict, text: str) -> int:
+    """Width of text in 1/1000 of the font size, as FPDF measures TTF fonts."""
+    cw = font["cw"]
+    size = len(cw)
+    missing = font["desc"]["MissingWidth"] or 500
+    return sum(cw[o] if o < size else missing for o in map(ord, text))
+
+
+class _WidthCollector:
+    """Stands in for an FPDF instance to capture the /W array it writes."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def _out(self, line: str):
+        self.lines.append(line)
+
+
+def _build_subset(path: str, glyphs: FrozenSet[int]) -> FontSubset:
+    ttf = TTFontFile()
+    subset = sorted(glyphs)
+    stream = ttf.makeSubset(path, subset)
+    code_to_glyph = ttf.codeToGlyph
+
+    # FPDF scans the subset once per code point; a set keeps that linear
+    font = dict(load_font(path), subset=set(subset), unifilename=None)
+    collector = _WidthCollector()
+    FPDF._putTTfontwidths(collector, font, ttf.maxUni)
+
+    cidtogidmap = bytearray(256 * 256 * 2)
+    for cc, glyph in code_to_glyph.items():
+        cidtogidmap[cc * 2] = glyph >> 8
+        cidtogidmap[cc * 2 + 1] = glyph & 0xFF
+
+    return FontSubset(
+        fontstream=zlib.compress(stream),
+        length1=len(stream),
+        widths="".join(collector.lines),
+        cidtogidmap=zlib.compress(bytes(cidtogidmap)),
+    )
+
+
+_subsets: "OrderedDict[Tuple[str, FrozenSet[int]], FontSubset]" = OrderedDict()
+_subsets_lock = threading.Lock()
+
+
+def font_subset(path: str, glyphs: FrozenSet[int]) -> FontSubset:
+    """Subset a font to the given code points, cached by glyph set."""
+    key = (path, glyphs)
+    with _subsets_lock:
+        subset = _subsets.get(key)
+        if subset is not None:
+            _subsets.move_to_end(key)
+            return subset
+
+    subset = _build_subset(path, glyphs)
+    with _subsets_lock:
+        _subsets[key] = subset
+        while len(_subsets) > FONT_SUBSET_CACHE_SIZE:
+            _subsets.popitem(last=False)
+    return subset
+
+
+def preload_fonts():
+    """Parse the Unicode family up front so the first international resume pays no loading cost."""
+    family = unicode_family()
+    if family:
+        for path in set(family.files.values()):
+            load_font(path)
@@ -0,0 +1,263 @@
+"""
+HTTP caching for downloads, previews, exports and static files.
+- Strong ETags from the content's SHA-256. Files are hashed once per
+  (path, size, mtime) and the digest is memoized.
+- If-None-Match -> 304 with no body, so a repeat view costs one round trip.
+- Cache-Control per artifact type (CACHE_CONTROL).
+- Byte ranges: files go through Starlette's FileResponse, which handles
+  Range and If-Range; in-memory bodies support a single range.
+- Compressible bodies (HTML, text, JSON, SVG, CSS, JS) are sent gzip- or
+  Brotli-encoded when the client accepts it. Each variant is encoded once
+  per ETag and kept in a small LRU, and has its own ETag. If-None-Match
+  with the ETag of any encoding revalidates, whichever one is chosen now.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "86400"))
+
+CACHE_CONTROL = {
+    # Per-id URLs whose content changes when the resume is re-rendered: always
+    # revalidate, which costs a 304 when nothing changed
+    "pdf": "private, no-cache",
+    "export": "private, no-cache",
+    # The URL pins data, template, renderer and size, so the image never changes
+    "preview": "private, max-age=31536000, immutable",
+    "static": f"public, max-age={STATIC_MAX_AGE}",
+    # A job's result fields, fetched separately from the job state
+    "result": "private, no-cache",
+}
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml", "image/svg+xml",
+)
+# Smaller bodies fit in a packet either way
+MIN_COMPRESS_BYTES = 1024
+# Static files larger than this are streamed from disk rather than encoded in memory
+MAX_COMPRESS_BYTES = 4 * 1024 * 1024
+ENCODED_CACHE_ENTRIES = 128
+
+_encoded: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+_encoded_lock = threading.Lock()
+
+
+def content_etag(data: bytes) -> str:
+    return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+
+@lru_cache(maxsize=1024)
+def _hash_file(path: str, size: int, mtime_ns: int, inode: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def file_etag(path: str, stat_result: Optional[os.stat_result] = None) -> str:
+    """Content ETag of a file, hashed again only when the file changes."""
+    st = stat_result or os.stat(path)
+    return _hash_file(path, st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def not_modified(request_headers: Headers, etag: str) -> bool:
+    """Whether If-None-Match matches etag (weak comparison, as RFC 9110 asks)."""
+    header = request_headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in header.split(","))
+
+
+def matching_etag(request_headers: Headers, etag: str) -> Optional[str]:
+    """
+    Which representation of etag's content If-None-Match names, if any: the
+    identity one (etag) or an encoded variant. Any of them is still valid,
+    whichever encoding this request would get.
+    """
+    for candidate in (etag,) + tuple(_variant_etag(etag, coding) for coding in ("br", "gzip")):
+        if not_modified(request_headers, candidate):
+            return candidate
+    return None
+
+
+def is_compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def accepted_encoding(request_headers: Headers) -> Optional[str]:
+    """Best content coding the client accepts: br (if available), then gzip."""
+    accepted = {}
+    for part in request_headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for coding in (("br",) if brotli is not None else ()) + ("gzip",):
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    """Encode body with a coding returned by accepted_encoding()."""
+    if coding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def _encode(body: bytes, etag: str, coding: str) -> bytes:
+    key = (etag, coding)
+    with _encoded_lock:
+        cached = _encoded.get(key)
+        if cached is not None:
+            _encoded.move_to_end(key)
+            return cached
+    encoded = compress(body, coding)
+    with _encoded_lock:
+        _encoded[key] = encoded
+        while len(_encoded) > ENCODED_CACHE_ENTRIES:
+            _encoded.popitem(last=False)
+    return encoded
+
+
+def _variant_etag(etag: str, coding: str) -> str:
+    return f'{etag[:-1]}-{coding}"'
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end inclusive) of a single "bytes=" range; None to send the whole body."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # other units and multiple ranges: the full body is a valid answer
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def cached_response(
+    request_headers: Headers,
+    body: bytes,
+    media_type: str,
+    kind: str,
+    etag: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Response for an in-memory body with ETag, Cache-Control, conditional
+    requests, a single byte range and content coding. etag defaults to the
+    content hash; pass one derived from the inputs when it is known up front.
+    """
+    base_etag = etag or content_etag(body)
+    headers = dict(headers or {})
+    headers["Cache-Control"] = CACHE_CONTROL[kind]
+
+    coding = None
+    if is_compressible(media_type) and len(body) >= MIN_COMPRESS_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+        coding = accepted_encoding(request_headers)
+    # Revalidate against every encoding: a client holding the identity copy
+    # (e.g. from a streamed first response) must get a 304 here too
+    matched = matching_etag(request_headers, base_etag)
+    if matched is not None:
+        headers["ETag"] = matched
+        return Response(status_code=304, headers=headers)
+    etag = _variant_etag(base_etag, coding) if coding is not None else base_etag
+    headers["ETag"] = etag
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+        return Response(content=_encode(body, etag, coding), media_type=media_type, headers=headers)
+
+    headers["Accept-Ranges"] = "bytes"
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    # If-Range needs a strong match; a weak ETag never satisfies it
+    if range_header and (if_range is None or (if_range == etag and not etag.startswith("W/"))):
+        try:
+            byte_range = _parse_range(range_header, len(body))
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{len(body)}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            return Response(content=body[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def cached_file_response(
+    request_headers: Headers,
+    path: str,
+    media_type: str,
+    kind: str,
+    filename: Optional[str] = None,
+    stat_result: Optional[os.stat_result] = None,
+) -> Response:
+    """
+    Response for a file on disk with a content ETag, Cache-Control and
+    conditional requests. Compressible files are encoded in memory;
+    everything else streams from disk with Range support.
+    """
+    st = stat_result or os.stat(path)
+    if is_compressible(media_type) and MIN_COMPRESS_BYTES <= st.st_size <= MAX_COMPRESS_BYTES:
+        if accepted_encoding(request_headers) is not None:
+            with open(path, "rb") as f:
+                body = f.read()
+            headers = {"Content-Disposition": f'attachment; filename="{filename}"'} if filename else None
+            return cached_response(request_headers, body, media_type, kind, file_etag(path, st), headers)
+
+    etag = file_etag(path, st)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL[kind]}
+    if is_compressible(media_type) and st.st_size >= MIN_COMPRESS_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+    matched = matching_etag(request_headers, etag)
+    if matched is not None:
+        headers["ETag"] = matched
+        return Response(status_code=304, headers=headers)
+    # FileResponse keeps these headers (it only fills in missing ones) and
+    # answers Range / If-Range requests against this ETag
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers, stat_result=st)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with content ETags, Cache-Control and precompressed text assets."""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        if status_code != 200:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+        return cached_file_response(Headers(scope=scope), str(full_path), media_type, "static", stat_result=stat_result)
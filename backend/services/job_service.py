@@ -0,0 +1,433 @@
+"""
+Asynchronous resume job pipeline.
+Uploads are saved and enqueued, and the request returns straight away; stage
+workers then move each job through extract -> improve -> render over bounded
+queues. A full intake queue rejects new uploads instead of piling them up,
+and a full downstream queue makes the upstream workers wait, so a slow LLM
+or renderer applies backpressure rather than growing memory.
+
+Each job is classified at intake (classify_job) into the scheduler's fast or
+slow OCR lane, and the extract stage has a queue and workers per lane, so
+digital PDFs never wait behind scans for an extract worker either.
+
+Every state change (stage transitions, OCR pages done, LLM output received)
+is written to the job store (services.job_store), which serves status reads
+from any worker process, and pushed to the job's local subscribers, which
+back the streaming progress endpoint.
+"""
+
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from services.pdf_service import extract_text_from_pdf
+from services.ai_service import improve_resume_text
+from services.artifacts import artifacts
+from services.scheduler import DEFAULT_RETRY_AFTER, FAST_LANE, MAX_RETRY_AFTER, SLOW_LANE, scheduler
+
+logger = logging.getLogger(__name__)
+
+# Workers per stage (extract: per lane). These only move jobs along; the CPU and LLM capacity
+# they draw on is sized by the stage scheduler (services.scheduler).
+EXTRACT_WORKERS = int(os.getenv("JOB_EXTRACT_WORKERS", "4"))
+IMPROVE_WORKERS = int(os.getenv("JOB_IMPROVE_WORKERS", "8"))
+RENDER_WORKERS = int(os.getenv("JOB_RENDER_WORKERS", "4"))
+# Jobs waiting in front of each stage; a full intake queue rejects uploads
+QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "64"))
+
+# Uploads with a text layer and at most this many pages and bytes take the fast lane
+FAST_LANE_MAX_PAGES = int(os.getenv("FAST_LANE_MAX_PAGES", "5"))
+FAST_LANE_MAX_BYTES = int(os.getenv("FAST_LANE_MAX_BYTES", str(5 * 1024 * 1024)))
+LANES = (FAST_LANE, SLOW_LANE)
+
+JOB_STAGES = ["queued", "extracting", "improving", "formatting", "complete", "error"]
+FINAL_STAGES = ("complete", "error")
+
+# How often a progress stream polls the store for a job running in another process
+EVENTS_POLL_INTERVAL = 0.5
+
+# LLM output is usually about as long as the extracted text; used to estimate
+# progress through the improve stage from the characters received so far
+IMPROVE_OUTPUT_RATIO = 1.2
+
+
+class JobQueueFull(Exception):
+    """Raised when the pipeline cannot accept another job; retry_after is when it should."""
+
+    def __init__(self, message: str, retry_after: int = DEFAULT_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def classify_job(profile: Optional[Dict]) -> str:
+    """OCR lane for an upload, from its services.pdf_service.inspect_pdf profile."""
+    if (
+        profile
+        and profile["text_layer"]
+        and profile["pages"]
+        and profile["pages"] <= FAST_LANE_MAX_PAGES
+        and profile["bytes"] <= FAST_LANE_MAX_BYTES
+    ):
+        return FAST_LANE
+    return SLOW_LANE
+
+
+def summarize_result(original_text: str, improved_data: Any) -> Dict:
+    """A few hundred bytes describing a result, for clients that skip the full text and data."""
+    data = improved_data if isinstance(improved_data, dict) else {}
+    header = data.get("header") if isinstance(data.get("header"), dict) else {}
+    sections = {
+        key: len(value) if isinstance(value, (list, dict)) else 1
+        for key, value in data.items()
+        if key != "header" and value
+    }
+    return {"name": header.get("name"), "sections": sections, "original_chars": len(original_text)}
+
+
+class JobPipeline:
+    """Runs uploaded resumes through the pipeline with bounded stage queues."""
+
+    def __init__(
+        self,
+        upload_dir: str,
+        output_dir: str,
+        finish: Callable[[str, dict, str], Awaitable[None]],
+        store,
+        max_pages: Optional[int] = None,
+    ):
+        self.upload_dir = upload_dir
+        self.output_dir = output_dir
+        # Called in the render stage with (job_id, improved_data, template_id)
+        self.finish = finish
+        # Page limit finish() renders with, so result URLs point at that rendering
+        self.max_pages = max_pages
+        # Public job state, readable from every worker process
+        self.store = store
+        # Jobs in flight in this process, including intermediate stage outputs
+        self.jobs: Dict[str, Dict] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Pipeline runs saved by attaching duplicate uploads to in-flight jobs
+        self.coalesced = 0
+        self.rejected = 0
+
+    def start(self):
+        """Create the stage queues and workers on the running event loop."""
+        if self._workers:
+            return
+        stages = [(f"extract-{lane}", self._extract, EXTRACT_WORKERS) for lane in LANES] + [
+            ("improve", self._improve, IMPROVE_WORKERS),
+            ("render", self._render, RENDER_WORKERS),
+        ]
+        for name, _, _ in stages:
+            self._queues[name] = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for name, handler, workers in stages:
+            for _ in range(max(1, workers)):
+                self._workers.append(asyncio.create_task(self._work(name, handler)))
+        self._workers.append(asyncio.create_task(self._renew_claims()))
+        logger.info(
+            f"Job pipeline ready: extract={EXTRACT_WORKERS} per lane, improve={IMPROVE_WORKERS}, "
+            f"render={RENDER_WORKERS} workers, queue size {QUEUE_SIZE}"
+        )
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self,
+        job_id: str,
+        filename: str,
+        template_id: str = "professional",
+        profile: Optional[Dict] = None,
+        dedup_key: Optional[str] = None,
+    ) -> str:
+        """
+        Enqueue a saved upload (UPLOAD_DIR/{job_id}_original.pdf) for processing.
+        profile is the upload's inspect_pdf result; it picks the OCR lane.
+        Returns the id of the job that will produce the result: job_id, or the
+        in-flight job already holding dedup_key, in which case nothing is queued.
+        """
+        if not self._workers:
+            self.start()
+        lane = classify_job(profile)
+        self.admit(lane)
+        job = {
+            "id": job_id,
+            "filename": filename,
+            "template_id": template_id,
+            "lane": lane,
+            "pages": profile["pages"] if profile else None,
+            "created": datetime.now().isoformat(),
+            "finished": None,
+            "stage": "queued",
+            "message": "Waiting for a free worker...",
+            "progress": 25,
+            "detail": None,
+            "error": None,
+            "result": None,
+        }
+        if dedup_key is not None:
+            owner = await asyncio.to_thread(self.store.claim, dedup_key, job_id, self._public(job))
+            if owner != job_id:
+                self._coalesce(owner)
+                return owner
+            try:
+                # Other uploads may have filled the queue while the claim was written
+                self.admit(lane)
+            except JobQueueFull as e:
+                # Give the claim up, so duplicates do not wait on a job that never runs
+                job.update(stage="error", error=str(e), finished=datetime.now().isoformat())
+                self.store.put(job_id, self._public(job))
+                raise
+        # No await since admit(), so this cannot fail
+        self._queues[f"extract-{lane}"].put_nowait(job)
+        self.jobs[job_id] = job
+        self._done[job_id] = asyncio.Event()
+        self._publish(job)
+        logger.info(f"Job {job_id} queued ({filename}, template: {template_id}, lane: {lane})")
+        return job_id
+
+    def admit(self, lane: Optional[str] = None):
+        """
+        Raise JobQueueFull if a job could not be queued now: the improve queue
+        is full (every improve worker is waiting on the LLM and jobs pile up
+        behind them), or so is the lane's extract queue (every lane's, when the
+        upload is not classified yet). Callers check before reading an upload;
+        submit() checks again.
+        """
+        if not self._queues:
+            return
+        improve = self._queues["improve"]
+        if improve.full():
+            self._reject(f"Improve queue is full ({QUEUE_SIZE} waiting)",
+                         self._retry_after("improve", IMPROVE_WORKERS, "llm"))
+        lanes = [lane] if lane else list(LANES)
+        if all(self._queues[f"extract-{name}"].full() for name in lanes):
+            self._reject(f"Extract queue for the {'/'.join(lanes)} lane is full ({QUEUE_SIZE} waiting)",
+                         min(self._retry_after(f"extract-{name}", EXTRACT_WORKERS, "ocr", name) for name in lanes))
+
+    def _reject(self, message: str, retry_after: int):
+        self.rejected += 1
+        logger.warning(f"✗ Rejecting upload: {message}, retry in {retry_after}s")
+        raise JobQueueFull(message, retry_after)
+
+    def _retry_after(self, queue_name: str, workers: int, stage: str, lane: Optional[str] = None) -> int:
+        """Seconds until the jobs waiting in a queue should have been taken by its workers."""
+        meter = scheduler[stage]
+        service_avg = meter.lane(lane).service_avg
+        if service_avg is None:
+            service_avg = meter.service_avg
+        if service_avg is None:
+            return DEFAULT_RETRY_AFTER
+        seconds = self._queues[queue_name].qsize() * service_avg / max(1, workers)
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(seconds)))
+
+    async def join(self, dedup_key: str) -> Optional[str]:
+        """Id of the in-flight job holding dedup_key, if any; the caller attaches to it."""
+        owner = await asyncio.to_thread(self.store.owner, dedup_key)
+        if owner is not None:
+            self._coalesce(owner)
+        return owner
+
+    def _coalesce(self, owner: str):
+        self.coalesced += 1
+        logger.info(f"✓ Duplicate upload attached to in-flight job {owner} ({self.coalesced} runs saved)")
+
+    def stats(self) -> Dict:
+        return {"in_flight": len(self.jobs), "coalesced": self.coalesced, "rejected": self.rejected}
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """Current state of a job, or None if the job is unknown or has expired."""
+        # The SQLite store may wait on another process's write lock: not on the event loop
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def wait(self, job_id: str) -> Optional[Dict]:
+        """Wait for a job to complete or fail; return its final state (None if unknown)."""
+        done = self._done.get(job_id)
+        if done is not None:
+            await done.wait()
+            return await self.get(job_id)
+        # Running in another process: follow it through the store
+        state = None
+        async for update in self.events(job_id):
+            if update is not None:
+                state = update
+        return state
+
+    async def events(self, job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Optional[Dict]]:
+        """
+        Yield the job's current state, then every change until it completes or fails.
+        Yields None after `heartbeat` seconds without a change, so callers can
+        keep idle connections alive. Changes to jobs running in this process
+        are pushed; jobs running in another worker are followed by polling
+        the store.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        local = job_id in self.jobs
+        timeout = heartbeat if local else min(heartbeat, EVENTS_POLL_INTERVAL)
+        idle = 0.0
+        try:
+            state = await self.get(job_id)
+            yield state
+            while state is not None and state["stage"] not in FINAL_STAGES:
+                try:
+                    state = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    idle += timeout
+                    if not local:
+                        polled = await self.get(job_id)
+                        if polled != state:
+                            state, idle = polled, 0.0
+                            if state is not None:
+                                yield state
+                            continue
+                    if idle >= heartbeat:
+                        idle = 0.0
+                        yield None
+                    continue
+                idle = 0.0
+                yield state
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    async def _renew_claims(self):
+        """Keep the single-flight claims of this process's jobs alive, also while they wait in a queue."""
+        while True:
+            await asyncio.sleep(self.store.lease / 3)
+            if self.jobs:
+                self.store.renew(list(self.jobs))
+
+    def _public(self, job: Dict) -> Dict:
+        # Intermediate stage outputs stay internal until the result is assembled
+        return {key: value for key, value in job.items() if key not in ("original_text", "improved_data")}
+
+    def _publish(self, job: Dict):
+        state = self._public(job)
+        self.store.put(job["id"], state)
+        for queue in self._subscribers.get(job["id"], ()):
+            queue.put_nowait(state)
+
+    def _close(self, job_id: str):
+        """Release a finished job's in-process state; the store keeps its final state."""
+        self.jobs.pop(job_id, None)
+        done = self._done.pop(job_id, None)
+        if done is not None:
+            done.set()
+
+    def _update(self, job: Dict, stage: str, message: str, progress: int, detail: Optional[Dict] = None):
+        job.update(stage=stage, message=message, progress=progress, detail=detail)
+        self._publish(job)
+
+    def _reporter(self, job: Dict, stage: str, describe: Callable[..., tuple]) -> Callable:
+        """
+        Thread-safe progress callback for work running on a stage's threads.
+        describe maps the callback's arguments to (message, progress, detail).
+        """
+        loop = asyncio.get_running_loop()
+
+        def report(*args):
+            message, progress, detail = describe(*args)
+            loop.call_soon_threadsafe(self._report, job, stage, message, progress, detail)
+
+        return report
+
+    def _report(self, job: Dict, stage: str, message: str, progress: int, detail: Dict):
+        # A late report from a finished stage must not move the job backwards,
+        # nor a stage that starts over (text layer pages, then OCR pages)
+        if job["stage"] == stage:
+            self._update(job, stage, message, max(progress, job["progress"]), detail)
+
+    async def _work(self, stage: str, handler: Callable[[Dict], Awaitable[Optional[str]]]):
+        queue = self._queues[stage]
+        while True:
+            job = await queue.get()
+            try:
+                next_stage = await handler(job)
+                if next_stage:
+                    # Blocks while the next stage is saturated
+                    await self._queues[next_stage].put(job)
+            except Exception as e:
+                self._fail(job, e)
+            finally:
+                queue.task_done()
+
+    def _fail(self, job: Dict, error: Exception):
+        job_id = job["id"]
+        logger.error(f"Job {job_id} failed in stage {job['stage']}: {str(error)}")
+        job.update(error=str(error), finished=datetime.now().isoformat())
+        self._update(job, "error", f"Error: {str(error)}", 0)
+        original_path = os.path.join(self.upload_dir, f"{job_id}_original.pdf")
+        if os.path.exists(original_path):
+            os.remove(original_path)
+        self._close(job_id)
+
+    async def _extract(self, job: Dict) -> str:
+        self._update(job, "extracting", "Reading your resume with OCR...", 40)
+        original_path = os.path.join(self.upload_dir, f"{job['id']}_original.pdf")
+        on_page = self._reporter(job, "extracting", lambda done, total: (
+            f"Reading your resume... page {done} of {total}",
+            40 + 20 * done // max(total, 1),
+            {"pages_done": done, "pages_total": total},
+        ))
+        original_text = await scheduler["ocr"].run(extract_text_from_pdf, original_path, on_page, lane=job["lane"])
+        logger.info(f"✓ Job {job['id']}: extracted {len(original_text)} characters")
+        if not original_text.strip():
+            raise ValueError("Could not extract text from PDF")
+        job["original_text"] = original_text
+        return "improve"
+
+    async def _improve(self, job: Dict) -> str:
+        self._update(job, "improving", "AI is enhancing your resume...", 60)
+        expected = max(1, int(len(job["original_text"]) * IMPROVE_OUTPUT_RATIO))
+        on_chunk = self._reporter(job, "improving", lambda received: (
+            "AI is enhancing your resume...",
+            60 + min(19, 20 * received // expected),
+            {"chars_received": received},
+        ))
+        improved_data = await improve_resume_text(job["original_text"], job["id"], job["template_id"], on_chunk)
+
+        # Persist data for later generation; written in the background while the job renders
+        artifacts.write_json(os.path.join(self.output_dir, f"{job['id']}_debug.json"), improved_data)
+        job["improved_data"] = improved_data
+        return "render"
+
+    async def _render(self, job: Dict) -> None:
+        self._update(job, "formatting", "Formatting your professional resume...", 80)
+        job_id = job["id"]
+        template_id = job["template_id"]
+        await self.finish(job_id, job["improved_data"], template_id)
+        # Other workers serve downloads from the file, so it must be on disk before "complete"
+        await artifacts.flushed(os.path.join(self.output_dir, f"{job_id}_debug.json"))
+
+        job["result"] = {
+            "id": job_id,
+            "original_filename": job["filename"],
+            "timestamp": job["created"],
+            "summary": summarize_result(job["original_text"], job["improved_data"]),
+            "original_text": job.pop("original_text"),
+            "improved_data": job.pop("improved_data"),
+            # Downloads and previews default to another template; name the one rendered
+            "download_url": f"/api/download/{job_id}?template_id={template_id}"
+                            + (f"&max_pages={self.max_pages}" if self.max_pages else ""),
+            "preview_url": f"/api/preview/{job_id}?template_id={template_id}",
+            "original_text_url": f"/api/jobs/{job_id}/result/original_text",
+            "improved_data_url": f"/api/jobs/{job_id}/result/improved_data",
+        }
+        job["finished"] = datetime.now().isoformat()
+        self._update(job, "complete", "Your resume is ready!", 100)
+        self._close(job_id)
+        logger.info(f"✓ Job {job_id} complete")
+        return None
@@ -0,0 +1,405 @@
+"""
+Job state store.
+Holds the public state of upload jobs (stage, progress, result, error) for
+the progress and job endpoints. Entries expire JOB_TTL_SECONDS after their
+last update, and the store never holds more than JOB_STORE_MAX_JOBS; the
+least recently updated jobs are evicted first.
+
+The store also holds single-flight claims: claim(key, job_id, state) stores a
+new job's state and maps a key (e.g. upload content hash + template) to it,
+unless the key already belongs to a job still in flight. Check and update
+are atomic, across processes for the SQLite backend. A claim is a lease of
+JOB_CLAIM_LEASE_SECONDS, renewed by every in-flight state put and by
+renew(), which the owning pipeline calls periodically; if the owning worker
+dies, the lease lapses and the next duplicate starts a new job instead of
+waiting on one that will never finish.
+
+Two backends:
+- memory: an in-process LRU, for a single server process;
+- sqlite: a SQLite database in WAL mode on local disk, shared by every
+  worker process on the host, so a poll that lands on another worker sees
+  the same state. put() only records the state; a writer thread writes
+  what is pending in one transaction, keeping just the latest state per
+  job, so bursts of progress updates cost one row write and the event loop
+  never waits on the database. get() serves pending states in this process.
+  Connections are opened on first use in each process and thread; a
+  forked child (serve.py) drops what it inherited and opens its own.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOB_STORE = os.getenv("JOB_STORE", "memory").lower()
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "")
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(6 * 3600)))
+JOB_STORE_MAX_JOBS = int(os.getenv("JOB_STORE_MAX_JOBS", "2000"))
+JOB_CLAIM_LEASE_SECONDS = int(os.getenv("JOB_CLAIM_LEASE_SECONDS", "60"))
+
+# The SQLite backend prunes expired and excess rows once every this many writes
+PRUNE_INTERVAL = 100
+# Pause before the SQLite writer retries a failed write
+WRITE_RETRY_SECONDS = 1.0
+
+# Stages after which a job no longer owns its single-flight claim
+FINAL_STAGES = ("complete", "error")
+
+
+def _in_flight(state: Optional[Dict]) -> bool:
+    return state is not None and state.get("stage") not in FINAL_STAGES
+
+
+class MemoryJobStore:
+    """In-process job store with TTL and max-size eviction."""
+
+    def __init__(
+        self, ttl: int = JOB_TTL_SECONDS, max_jobs: int = JOB_STORE_MAX_JOBS, lease: int = JOB_CLAIM_LEASE_SECONDS
+    ):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.lease = lease
+        self._jobs: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        # key -> (lease expiry, job id), in expiry order; job id -> key
+        self._claims: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._claimed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def put(self, job_id: str, state: Dict):
+        with self._lock:
+            now = time.monotonic()
+            self._jobs.pop(job_id, None)
+            self._jobs[job_id] = (now + self.ttl, state)
+            if _in_flight(state):
+                self._renew(job_id, now)
+            self._prune()
+
+    def renew(self, job_ids: Iterable[str]):
+        """Extend the claim leases held by these (in-flight) jobs."""
+        with self._lock:
+            now = time.monotonic()
+            for job_id in job_ids:
+                self._renew(job_id, now)
+
+    def _renew(self, job_id: str, now: float):
+        key = self._claimed.get(job_id)
+        if key is not None and self._claims.get(key, (0, None))[1] == job_id:
+            self._claims[key] = (now + self.lease, job_id)
+            self._claims.move_to_end(key)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return None
+            expires, state = entry
+            if expires <= time.monotonic():
+                del self._jobs[job_id]
+                self.evicted += 1
+                return None
+            return state
+
+    def claim(self, key: str, job_id: str, state: Dict) -> str:
+        """
+        Put job_id's state and give it key, unless the key's owner is still in
+        flight. Returns the owner; the state is only stored if that is job_id.
+        """
+        with self._lock:
+            now = time.monotonic()
+            entry = self._claims.get(key)
+            if entry is not None:
+                lease, owner = entry
+                job = self._jobs.get(owner)
+                if lease > now and job is not None and job[0] > now and _in_flight(job[1]):
+                    return owner
+                del self._claims[key]
+                self._claimed.pop(owner, None)
+            self._jobs.pop(job_id, None)
+            self._jobs[job_id] = (now + self.ttl, state)
+            self._claims[key] = (now + self.lease, job_id)
+            self._claimed[job_id] = key
+            self._prune()
+            return job_id
+
+    def owner(self, key: str) -> Optional[str]:
+        """The in-flight job holding key, if any."""
+        with self._lock:
+            entry = self._claims.get(key)
+        if entry is None or entry[0] <= time.monotonic() or not _in_flight(self.get(entry[1])):
+            return None
+        return entry[1]
+
+    def _prune(self):
+        # Caller holds the lock. Entries are in update order, so the oldest
+        # (and therefore first to expire) are at the front.
+        now = time.monotonic()
+        while self._jobs:
+            job_id, (expires, _) = next(iter(self._jobs.items()))
+            if expires > now and len(self._jobs) <= self.max_jobs:
+                break
+            del self._jobs[job_id]
+            self.evicted += 1
+        while self._claims:
+            key, (expires, job_id) = next(iter(self._claims.items()))
+            if expires > now and len(self._claims) <= self.max_jobs:
+                break
+            del self._claims[key]
+            self._claimed.pop(job_id, None)
+
+    def close(self):
+        """Nothing to write; for symmetry with SqliteJobStore."""
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"backend": "memory", "jobs": len(self._jobs), "evicted": self.evicted}
+
+
+class SqliteJobStore:
+    """Job store in a SQLite database (WAL mode), shared across processes."""
+
+    def __init__(
+        self,
+        path: str,
+        ttl: int = JOB_TTL_SECONDS,
+        max_jobs: int = JOB_STORE_MAX_JOBS,
+        lease: int = JOB_CLAIM_LEASE_SECONDS,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.lease = lease
+        self._reset()
+        self.written = 0
+        self.failed = 0
+        self.evicted = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Connections are opened on first use, so one made in a serve.py master
+        # is never inherited; a child forked anyway starts with none
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+        logger.info(f"Job store: SQLite at {path}")
+
+    def _reset(self):
+        """Start without connections, writer thread or pending states (at init and in a forked child)."""
+        # Keep the parent's connections referenced so they are never closed in
+        # the child: closing would release SQLite locks the parent still holds
+        inherited = getattr(self, "_inherited", [])
+        local = getattr(self, "_local", None)
+        if local is not None and getattr(local, "conn", None) is not None:
+            inherited.append(local.conn)
+        self._inherited = inherited
+        self._local = threading.local()
+        self._schema_ready = False
+        # job id -> latest state not yet written; jobs whose claim leases to renew
+        self._pending: Dict[str, Dict] = {}
+        self._renewals: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            # WAL keeps readers off the writer's lock; NORMAL skips the fsync per commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            if not self._schema_ready:
+                self._create_schema(conn)
+        return conn
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, job_id TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        conn.commit()
+        self._schema_ready = True
+
+    def put(self, job_id: str, state: Dict):
+        """Queue job_id's state for the writer thread; a newer put replaces an unwritten one."""
+        with self._lock:
+            self._pending[job_id] = state
+            if _in_flight(state):
+                self._renewals.add(job_id)
+            self._start_writer()
+        self._wake.set()
+
+    def renew(self, job_ids: Iterable[str]):
+        """Extend the claim leases held by these (in-flight) jobs, from the writer thread."""
+        with self._lock:
+            self._renewals.update(job_ids)
+            self._start_writer()
+        self._wake.set()
+
+    def _start_writer(self):
+        # Caller holds the lock
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="job-store-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                batch = dict(self._pending)
+                renewals, self._renewals = self._renewals, set()
+                stopping = self._stopping
+            if (batch or renewals) and not self._write(batch, renewals):
+                with self._lock:
+                    self._renewals |= renewals
+                if stopping:
+                    return
+                time.sleep(WRITE_RETRY_SECONDS)
+                self._wake.set()
+                continue
+            if stopping:
+                return
+
+    def _write(self, batch: Dict[str, Dict], renewals: Set[str]) -> bool:
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO jobs (id, state, updated, expires) VALUES (?, ?, ?, ?)",
+                [(job_id, json.dumps(state), now, now + self.ttl) for job_id, state in batch.items()],
+            )
+            conn.executemany(
+                "UPDATE claims SET expires = ? WHERE job_id = ?",
+                [(now + self.lease, job_id) for job_id in renewals],
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.failed += 1
+            logger.error(f"✗ Could not write {len(batch)} job states: {str(e)}")
+            return False
+        with self._lock:
+            for job_id, state in batch.items():
+                # A newer state put during the write stays pending
+                if self._pending.get(job_id) is state:
+                    del self._pending[job_id]
+        self.written += len(batch)
+        self._writes += len(batch)
+        if self._writes >= PRUNE_INTERVAL:
+            self._writes = 0
+            self.prune()
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Write every pending state, then stop the writer thread."""
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._wake.set()
+            thread.join(timeout)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            state = self._pending.get(job_id)
+        if state is not None:
+            return state
+        row = self._conn().execute(
+            "SELECT state FROM jobs WHERE id = ? AND expires > ?", (job_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim(self, key: str, job_id: str, state: Dict) -> str:
+        """
+        Put job_id's state and give it key, unless the key's owner is still in
+        flight. Returns the owner; the state is only stored if that is job_id.
+        """
+        conn = self._conn()
+        now = time.time()
+        # Take the write lock up front so the check and the update are atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            owner = self._owner(conn, key, now)
+            if owner is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (id, state, updated, expires) VALUES (?, ?, ?, ?)",
+                    (job_id, json.dumps(state), now, now + self.ttl),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO claims (key, job_id, expires) VALUES (?, ?, ?)",
+                    (key, job_id, now + self.lease),
+                )
+                owner = job_id
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return owner
+
+    def owner(self, key: str) -> Optional[str]:
+        """The in-flight job holding key, if any."""
+        return self._owner(self._conn(), key, time.time())
+
+    def _owner(self, conn: sqlite3.Connection, key: str, now: float) -> Optional[str]:
+        # A lapsed lease means the owner stopped renewing it: not in flight
+        row = conn.execute(
+            "SELECT claims.job_id, jobs.state FROM claims JOIN jobs ON jobs.id = claims.job_id "
+            "WHERE claims.key = ? AND claims.expires > ? AND jobs.expires > ?",
+            (key, now, now),
+        ).fetchone()
+        if row is None or not _in_flight(json.loads(row[1])):
+            return None
+        return row[0]
+
+    def prune(self):
+        """Delete expired jobs, then the least recently updated beyond max_jobs."""
+        conn = self._conn()
+        try:
+            removed = conn.execute("DELETE FROM jobs WHERE expires <= ?", (time.time(),)).rowcount
+            removed += conn.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (self.max_jobs,),
+            ).rowcount
+            conn.execute("DELETE FROM claims WHERE expires <= ?", (time.time(),))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"✗ Could not prune the job store: {str(e)}")
+            return
+        self.evicted += removed
+
+    def stats(self) -> Dict:
+        count = self._conn().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "backend": "sqlite",
+            "jobs": count,
+            "pending": pending,
+            "written": self.written,
+            "failed": self.failed,
+            "evicted": self.evicted,
+        }
+
+
+def create_job_store(default_path: str):
+    """Build the store selected by JOB_STORE ("memory" or "sqlite")."""
+    if JOB_STORE == "sqlite":
+        return SqliteJobStore(JOB_STORE_PATH or default_path)
+    if JOB_STORE != "memory":
+        logger.warning(f"Unknown JOB_STORE '{JOB_STORE}', using 'memory'")
+    return MemoryJobStore()
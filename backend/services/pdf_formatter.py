@@ -3,9 +3,10 @@ PDF Formatter - Parses formatting markers and generates professional PDFs.
 Handles structured text with markers like [TITLE: ...], [SECTION: ...], etc.
 """
 
+import io
 import re
 import logging
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterator, List, Mapping, Optional
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import inch
@@ -15,14 +16,130 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak,
 from reportlab.platypus.flowables import HRFlowable
 from reportlab.pdfgen import canvas
 
+from services.render_model import Entry, ResumeDocument, Text, document_from_elements
+from services.templates import derive_item_styles, get_template
+
 logger = logging.getLogger(__name__)
 
+# Two-row experience/education item layout, shared by every item table
+ITEM_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0,0), (0,1), 'LEFT'),
+    ('ALIGN', (1,0), (1,1), 'RIGHT'),
+    ('VALIGN', (0,0), (-1,-1), 'TOP'),
+    ('LEFTPADDING', (0,0), (-1,-1), 0),
+    ('RIGHTPADDING', (0,0), (-1,-1), 0),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 0),
+    ('TOPPADDING', (0,0), (-1,-1), 0),
+])
+
+# Line-leading markers. Block markers carry a body ([KIND: body]); [PARAGRAPH]
+# and [SPACING] do not. Matched once per line by a single compiled pattern.
+_LINE_MARKER_RE = re.compile(
+    r'\[(?:(TITLE|CONTACT|SECTION|EXPERIENCE_ITEM|EDUCATION_ITEM|SUBSECTION|DATE|BULLET|BOLD):\s*'
+    r'|(PARAGRAPH|SPACING)\])'
+)
+_ANY_MARKER_RE = re.compile(
+    r'\[(?:(?:TITLE|CONTACT|SECTION|EXPERIENCE_ITEM|EDUCATION_ITEM|SUBSECTION|DATE|BULLET|BOLD):|PARAGRAPH\]|SPACING\])'
+)
+_INLINE_BOLD_RE = re.compile(r'\[BOLD:\s*(.*?)\]')
+
+_SIMPLE_ELEMENTS = {
+    'TITLE': 'title',
+    'CONTACT': 'contact',
+    'SECTION': 'section',
+    'SUBSECTION': 'subsection',
+    'DATE': 'date',
+}
+_ITEM_FIELDS = {
+    'EXPERIENCE_ITEM': ('experience_item', ('company', 'location', 'role', 'date')),
+    'EDUCATION_ITEM': ('education_item', ('institution', 'location', 'degree', 'date')),
+}
+
+
+def process_inline_bold(text: str) -> str:
+    """Replace inline [BOLD: text] markers with <b>text</b>."""
+    if '[BOLD:' not in text:
+        return text
+    return _INLINE_BOLD_RE.sub(r'<b>\1</b>', text)
+
+
+def _marker_body(rest: str) -> str:
+    # A marker runs to the last ']' on its line, so inline markers inside a
+    # bullet ("[BULLET: Led [BOLD: 8] engineers]") stay in the body
+    if rest.endswith(']'):
+        return rest[:-1].strip()
+    return rest.partition(']')[0].strip()
+
+
+def iter_formatted_elements(text: str) -> Iterator[Dict[str, Any]]:
+    """
+    Tokenize marker text in a single pass, yielding typed element dicts.
+    
+    Each line is classified by one compiled regex; [PARAGRAPH] collects the
+    following lines (inline [BOLD:] included) until a blank line or the next
+    line-leading marker. Work is linear in the size of the input.
+    """
+    paragraph = None  # lines of the [PARAGRAPH] being collected
+    
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        match = _LINE_MARKER_RE.match(line) if line.startswith('[') else None
+        kind = match and (match.group(1) or match.group(2))
+        
+        if paragraph is not None:
+            if line and (kind is None or kind == 'BOLD'):
+                paragraph.append(line)
+                continue
+            if paragraph:
+                yield {'type': 'paragraph', 'content': process_inline_bold(' '.join(paragraph))}
+            paragraph = None
+        
+        if not line:
+            continue
+        
+        if kind is None:
+            # Regular text without markers - treat as paragraph
+            if not line.startswith('['):
+                yield {'type': 'text', 'content': process_inline_bold(line)}
+            continue
+        
+        if kind == 'PARAGRAPH':
+            rest = line[match.end():].strip()
+            paragraph = [rest] if rest else []
+        elif kind == 'SPACING':
+            yield {'type': 'spacing'}
+        elif kind == 'BOLD':
+            # A line that starts with inline bold ("[BOLD: Technical:] Python")
+            yield {'type': 'text', 'content': process_inline_bold(line)}
+        else:
+            body = _marker_body(line[match.end():])
+            if kind in _SIMPLE_ELEMENTS:
+                yield {'type': _SIMPLE_ELEMENTS[kind], 'content': body}
+            elif kind == 'BULLET':
+                yield {'type': 'bullet', 'content': process_inline_bold(body)}
+            else:
+                elem_type, fields = _ITEM_FIELDS[kind]
+                parts = [p.strip() for p in body.split('|')]
+                if len(parts) >= 4:
+                    element = {'type': elem_type}
+                    element.update(zip(fields, parts))
+                    yield element
+                else:
+                    # Fallback if parsing fails
+                    yield {'type': 'subsection', 'content': body}
+    
+    if paragraph:
+        yield {'type': 'paragraph', 'content': process_inline_bold(' '.join(paragraph))}
+
 
 class PDFFormatter:
     """Parses formatted text and generates professional PDFs."""
     
-    def __init__(self, template_styles: Dict[str, ParagraphStyle]):
-        """Initialize with template styles."""
+    def __init__(self, template_styles: Mapping[str, ParagraphStyle]):
+        """Initialize with template styles (as returned by CVTemplate.get_styles())."""
+        if 'exp_company' not in template_styles:
+            # Hand-built style dicts: derive the item styles once, not per item
+            template_styles = {**template_styles, **derive_item_styles(template_styles)}
         self.template_styles = template_styles
         self.parsed_elements = []
         
@@ -44,292 +161,111 @@ class PDFFormatter:
         - [SPACING]
         """
         logger.info("Parsing formatted text with markers...")
-        elements = []
-        lines = text.split('\n')
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            if not line:
-                i += 1
-                continue
-            
-            # Check for markers
-            if line.startswith('[TITLE:'):
-                match = re.match(r'\[TITLE:\s*(.*?)\]', line)
-                if match:
-                    elements.append({'type': 'title', 'content': match.group(1).strip()})
-                    logger.debug(f"Found TITLE: {match.group(1).strip()}")
-                    
-            elif line.startswith('[CONTACT:'):
-                match = re.match(r'\[CONTACT:\s*(.*?)\]', line)
-                if match:
-                    elements.append({'type': 'contact', 'content': match.group(1).strip()})
-                    logger.debug(f"Found CONTACT: {match.group(1).strip()}")
-                    
-            elif line.startswith('[SECTION:'):
-                match = re.match(r'\[SECTION:\s*(.*?)\]', line)
-                if match:
-                    elements.append({'type': 'section', 'content': match.group(1).strip()})
-                    logger.debug(f"Found SECTION: {match.group(1).strip()}")
-                    
-            elif line.startswith('[EXPERIENCE_ITEM:'):
-                match = re.match(r'\[EXPERIENCE_ITEM:\s*(.*?)\]', line)
-                if match:
-                    content = match.group(1).strip()
-                    parts = [p.strip() for p in content.split('|')]
-                    if len(parts) >= 4:
-                        elements.append({
-                            'type': 'experience_item', 
-                            'company': parts[0],
-                            'location': parts[1],
-                            'role': parts[2],
-                            'date': parts[3]
-                        })
-                    else:
-                        # Fallback if parsing fails
-                        elements.append({'type': 'subsection', 'content': content})
-                    logger.debug(f"Found EXPERIENCE_ITEM: {content[:50]}...")
-
-            elif line.startswith('[EDUCATION_ITEM:'):
-                match = re.match(r'\[EDUCATION_ITEM:\s*(.*?)\]', line)
-                if match:
-                    content = match.group(1).strip()
-                    parts = [p.strip() for p in content.split('|')]
-                    if len(parts) >= 4:
-                        elements.append({
-                            'type': 'education_item', 
-                            'institution': parts[0],
-                            'location': parts[1],
-                            'degree': parts[2],
-                            'date': parts[3]
-                        })
-                    else:
-                        # Fallback if parsing fails
-                        elements.append({'type': 'subsection', 'content': content})
-                    logger.debug(f"Found EDUCATION_ITEM: {content[:50]}...")
-
-            elif line.startswith('[SUBSECTION:'):
-                match = re.match(r'\[SUBSECTION:\s*(.*?)\]', line)
-                if match:
-                    elements.append({'type': 'subsection', 'content': match.group(1).strip()})
-                    logger.debug(f"Found SUBSECTION: {match.group(1).strip()}")
-                    
-            elif line.startswith('[DATE:'):
-                match = re.match(r'\[DATE:\s*(.*?)\]', line)
-                if match:
-                    elements.append({'type': 'date', 'content': match.group(1).strip()})
-                    logger.debug(f"Found DATE: {match.group(1).strip()}")
-                    
-            elif line.startswith('[BULLET:'):
-                match = re.match(r'\[BULLET:\s*(.*?)\]', line)
-                if match:
-                    content = match.group(1).strip()
-                    # Handle inline [BOLD: ] markers
-                    content = self._process_inline_bold(content)
-                    elements.append({'type': 'bullet', 'content': content})
-                    logger.debug(f"Found BULLET: {content[:50]}...")
-                    
-            elif line.startswith('[PARAGRAPH]'):
-                # Collect paragraph lines until next structural marker
-                # Structural markers: [TITLE:, [CONTACT:, [SECTION:, [SUBSECTION:, [DATE:, [BULLET:, [SPACING]
-                # Inline markers like [BOLD:] should NOT stop paragraph collection
-                structural_markers = ['[TITLE:', '[CONTACT:', '[SECTION:', '[SUBSECTION:', 
-                                     '[DATE:', '[BULLET:', '[SPACING]']
-                para_lines = []
-                i += 1
-                while i < len(lines):
-                    next_line = lines[i].strip()
-                    # Stop if empty line or structural marker (but NOT [PARAGRAPH] or inline [BOLD:])
-                    if not next_line:
-                        break
-                    if any(next_line.startswith(marker) for marker in structural_markers):
-                        i -= 1  # Back up to process marker
-                        break
-                    # Include lines with [BOLD:] markers
-                    para_lines.append(next_line)
-                    i += 1
-                
-                if para_lines:
-                    content = ' '.join(para_lines)
-                    content = self._process_inline_bold(content)
-                    elements.append({'type': 'paragraph', 'content': content})
-                    logger.debug(f"Found PARAGRAPH: {content[:100]}...")
-                    
-            elif line.startswith('[SPACING]'):
-                elements.append({'type': 'spacing'})
-                logger.debug("Found SPACING")
-                
-            else:
-                # Regular text without markers - treat as paragraph
-                if line and not line.startswith('['):
-                    content = self._process_inline_bold(line)
-                    elements.append({'type': 'text', 'content': content})
-            
-            i += 1
-        
+        elements = list(iter_formatted_elements(text))
         logger.info(f"Parsed {len(elements)} elements from formatted text")
         self.parsed_elements = elements
         return elements
     
     def _process_inline_bold(self, text: str) -> str:
         """Process inline [BOLD: text] markers and convert to HTML bold tags."""
-        # Replace [BOLD: text] with <b>text</b>
-        text = re.sub(r'\[BOLD:\s*(.*?)\]', r'<b>\1</b>', text)
-        return text
+        return process_inline_bold(text)
     
-    def generate_pdf(self, output_path: str, elements: List[Dict[str, Any]] = None):
-        """Generate PDF from parsed elements."""
-        if elements is None:
-            elements = self.parsed_elements
+    def build_story(self, document: ResumeDocument) -> list:
+        """Lay out the intermediate document model as ReportLab flowables."""
+        styles = self.template_styles
+        story = []
         
-        if not elements:
-            raise ValueError("No elements to render. Call parse_formatted_text() first.")
+        header = document.header
+        if header.name:
+            # Title: Large, bold, centered (NO underline)
+            story.append(Paragraph(header.name, styles['name']))
+            story.append(Spacer(1, 0.05*inch))
+        for line in header.contact:
+            # Contact: Smaller, centered
+            story.append(Paragraph(line, styles['contact']))
         
-        logger.info(f"Generating PDF with {len(elements)} elements...")
-        logger.info(f"Output path: {output_path}")
+        for section in document.sections:
+            if section.title:
+                # Section header: Bold (via style) and horizontal line
+                story.append(Spacer(1, 0.12*inch))
+                story.append(Paragraph(f"<b><u>{section.title.upper()}</u></b>", styles['section_heading']))
+                story.append(Spacer(1, 0.03*inch))
+                story.append(HRFlowable(width="100%", thickness=1.5, color=colors.black, spaceBefore=0, spaceAfter=0))
+                story.append(Spacer(1, 0.1*inch))
+            
+            for block in section.blocks:
+                if isinstance(block, Entry):
+                    story.extend(self._entry_flowables(block))
+                elif isinstance(block, Text):
+                    story.extend(self._text_flowables(block))
+                else:
+                    # Add vertical space
+                    story.append(Spacer(1, 0.15*inch))
         
+        return story
+    
+    def _entry_flowables(self, entry: Entry) -> list:
+        # Table with 2 rows
+        # Row 1: Company/Institution (Bold, Left) | Location (Regular, Right)
+        # Row 2: Role (Bold Italic) / Degree (Bold), Left | Date (Regular, Right)
+        if entry.kind == 'experience':
+            keys = ('exp_company', 'exp_location', 'exp_role', 'exp_date')
+        else:
+            keys = ('edu_institution', 'edu_location', 'edu_degree', 'edu_date')
+        title_style, location_style, subtitle_style, date_style = (self.template_styles[k] for k in keys)
+        data = [
+            [Paragraph(entry.title, title_style), Paragraph(entry.location, location_style)],
+            [Paragraph(entry.subtitle, subtitle_style), Paragraph(entry.date, date_style)]
+        ]
+        
+        t = Table(data, colWidths=[4.0*inch, 2.5*inch])
+        t.setStyle(ITEM_TABLE_STYLE)
+        flowables = [t, Spacer(1, 0.05*inch)]
+        for bullet in entry.bullets:
+            flowables.append(Paragraph(f'• {bullet}', self.template_styles['bullet']))
+        return flowables
+    
+    def _text_flowables(self, block: Text) -> list:
+        styles = self.template_styles
+        if block.style == 'bullet':
+            # Bullet point: Indented with bullet character
+            return [Paragraph(f'• {block.text}', styles['bullet'])]
+        if block.style == 'bold':
+            return [Paragraph(f'<b>{block.text}</b>', styles['body']), Spacer(1, 0.03*inch)]
+        if block.style == 'italic':
+            return [Paragraph(f'<i>{block.text}</i>', styles['body']), Spacer(1, 0.05*inch)]
+        if block.style == 'paragraph':
+            return [Paragraph(block.text, styles['body']), Spacer(1, 0.05*inch)]
+        # Plain text line
+        return [Paragraph(block.text, styles['body'])]
+    
+    def build_pdf(self, output, document: ResumeDocument):
+        """Build the PDF for a document model into a path or binary file object."""
         # Create PDF document with Harvard CV spec margins (20-25mm = 0.83 inch = 21mm)
         doc = SimpleDocTemplate(
-            output_path,
+            output,
             pagesize=letter,  # US Letter (8.5 × 11 in)
             rightMargin=0.83*inch,  # 21mm
             leftMargin=0.83*inch,
             topMargin=0.83*inch,
             bottomMargin=0.83*inch
         )
+        doc.build(self.build_story(document))
+    
+    def generate_pdf(self, output_path, elements: List[Dict[str, Any]] = None):
+        """Generate PDF from parsed elements."""
+        if elements is None:
+            elements = self.parsed_elements
         
-        story = []
+        if not elements:
+            raise ValueError("No elements to render. Call parse_formatted_text() first.")
         
-        # Process each element
-        for i, element in enumerate(elements):
-            elem_type = element['type']
-            content = element.get('content', '')
-            
-            logger.debug(f"Rendering element {i+1}/{len(elements)}: {elem_type}")
-            
-            if elem_type == 'title':
-                # Title: Large, bold, centered (NO underline)
-                para = Paragraph(content, self.template_styles['name'])
-                story.append(para)
-                story.append(Spacer(1, 0.05*inch))
-                
-            elif elem_type == 'contact':
-                # Contact: Smaller, centered
-                para = Paragraph(content, self.template_styles['contact'])
-                story.append(para)
-                
-            elif elem_type == 'section':
-                # Section header: Bold (via style) and horizontal line
-                story.append(Spacer(1, 0.12*inch))
-                # Style is already Times-Bold, so no need for <b> tags
-                # Use HRFlowable for the line, so no need for <u> tags
-                para = Paragraph(f"<b><u>{content.upper()}</u></b>", self.template_styles['section_heading'])
-                story.append(para)
-                # Add horizontal line below
-                story.append(Spacer(1, 0.03*inch))
-                hr = HRFlowable(width="100%", thickness=1.5, color=colors.black, spaceBefore=0, spaceAfter=0)
-                story.append(hr)
-                story.append(Spacer(1, 0.1*inch))
-                
-            elif elem_type == 'experience_item':
-                # Experience Item: Table with 2 rows
-                # Row 1: Company (Bold, Left) | Location (Regular, Right)
-                # Row 2: Role (Bold Italic, Left) | Date (Regular, Right)
-                
-                # Styles
-                company_style = ParagraphStyle('ExpCompany', parent=self.template_styles['body'], fontName='Times-Bold', fontSize=11)
-                location_style = ParagraphStyle('ExpLocation', parent=self.template_styles['body'], alignment=TA_RIGHT, fontSize=11)
-                role_style = ParagraphStyle('ExpRole', parent=self.template_styles['body'], fontName='Times-BoldItalic', fontSize=10.5)
-                date_style = ParagraphStyle('ExpDate', parent=self.template_styles['body'], alignment=TA_RIGHT, fontSize=10.5)
-                
-                # Data
-                data = [
-                    [Paragraph(element['company'], company_style), Paragraph(element['location'], location_style)],
-                    [Paragraph(element['role'], role_style), Paragraph(element['date'], date_style)]
-                ]
-                
-                # Table
-                t = Table(data, colWidths=[4.0*inch, 2.5*inch])
-                t.setStyle(TableStyle([
-                    ('ALIGN', (0,0), (0,1), 'LEFT'),
-                    ('ALIGN', (1,0), (1,1), 'RIGHT'),
-                    ('VALIGN', (0,0), (-1,-1), 'TOP'),
-                    ('LEFTPADDING', (0,0), (-1,-1), 0),
-                    ('RIGHTPADDING', (0,0), (-1,-1), 0),
-                    ('BOTTOMPADDING', (0,0), (-1,-1), 0),
-                    ('TOPPADDING', (0,0), (-1,-1), 0),
-                ]))
-                story.append(t)
-                story.append(Spacer(1, 0.05*inch))
-
-            elif elem_type == 'education_item':
-                # Education Item: Table with 2 rows
-                # Row 1: Institution (Bold, Left) | Location (Regular, Right)
-                # Row 2: Degree (Bold, Left) | Date (Regular, Right)
-                
-                # Styles
-                inst_style = ParagraphStyle('EduInst', parent=self.template_styles['body'], fontName='Times-Bold', fontSize=11)
-                location_style = ParagraphStyle('EduLocation', parent=self.template_styles['body'], alignment=TA_RIGHT, fontSize=11)
-                degree_style = ParagraphStyle('EduDegree', parent=self.template_styles['body'], fontName='Times-Bold', fontSize=10.5)
-                date_style = ParagraphStyle('EduDate', parent=self.template_styles['body'], alignment=TA_RIGHT, fontSize=10.5)
-                
-                # Data
-                data = [
-                    [Paragraph(element['institution'], inst_style), Paragraph(element['location'], location_style)],
-                    [Paragraph(element['degree'], degree_style), Paragraph(element['date'], date_style)]
-                ]
-                
-                # Table
-                t = Table(data, colWidths=[4.0*inch, 2.5*inch])
-                t.setStyle(TableStyle([
-                    ('ALIGN', (0,0), (0,1), 'LEFT'),
-                    ('ALIGN', (1,0), (1,1), 'RIGHT'),
-                    ('VALIGN', (0,0), (-1,-1), 'TOP'),
-                    ('LEFTPADDING', (0,0), (-1,-1), 0),
-                    ('RIGHTPADDING', (0,0), (-1,-1), 0),
-                    ('BOTTOMPADDING', (0,0), (-1,-1), 0),
-                    ('TOPPADDING', (0,0), (-1,-1), 0),
-                ]))
-                story.append(t)
-                story.append(Spacer(1, 0.05*inch))
-
-            elif elem_type == 'subsection':
-                # Subsection: Bold, medium size
-                para = Paragraph(f'<b>{content}</b>', self.template_styles['body'])
-                story.append(para)
-                story.append(Spacer(1, 0.03*inch))
-                
-            elif elem_type == 'date':
-                # Date: Regular, slightly smaller
-                para = Paragraph(f'<i>{content}</i>', self.template_styles['body'])
-                story.append(para)
-                story.append(Spacer(1, 0.05*inch))
-                
-            elif elem_type == 'bullet':
-                # Bullet point: Indented with bullet character
-                para = Paragraph(f'• {content}', self.template_styles['bullet'])
-                story.append(para)
-                
-            elif elem_type == 'paragraph':
-                # Paragraph: Regular text
-                para = Paragraph(content, self.template_styles['body'])
-                story.append(para)
-                story.append(Spacer(1, 0.05*inch))
-                
-            elif elem_type == 'text':
-                # Plain text
-                para = Paragraph(content, self.template_styles['body'])
-                story.append(para)
-                
-            elif elem_type == 'spacing':
-                # Add vertical space
-                story.append(Spacer(1, 0.15*inch))
+        logger.info(f"Generating PDF with {len(elements)} elements...")
+        logger.info(f"Output path: {output_path}")
         
         # Build PDF
         try:
-            doc.build(story)
+            self.build_pdf(output_path, document_from_elements(elements))
             logger.info("✓ PDF generated successfully with formatting markers")
             logger.info(f"   Total elements rendered: {len(elements)}")
             logger.info(f"   Output file: {output_path}")
@@ -339,12 +275,10 @@ class PDFFormatter:
     
     def has_formatting_markers(self, text: str) -> bool:
         """Check if text contains formatting markers."""
-        markers = ['[TITLE:', '[CONTACT:', '[SECTION:', '[SUBSECTION:', 
-                   '[DATE:', '[BULLET:', '[PARAGRAPH]', '[SPACING]', '[BOLD:']
-        return any(marker in text for marker in markers)
+        return _ANY_MARKER_RE.search(text) is not None
 
 
-def generate_pdf_from_formatted_text(text: str, output_path: str, template_styles: Dict[str, ParagraphStyle]):
+def generate_pdf_from_formatted_text(text: str, output_path: str, template_styles: Mapping[str, ParagraphStyle]):
     """
     Main function to generate PDF from formatted text.
     
@@ -362,12 +296,23 @@ def generate_pdf_from_formatted_text(text: str, output_path: str, template_style
     # Check if text has markers
     if formatter.has_formatting_markers(text):
         logger.info("✓ Text contains formatting markers - using structured rendering")
-        elements = formatter.parse_formatted_text(text)
-        formatter.generate_pdf(output_path, elements)
     else:
-        logger.warning("⚠️ No formatting markers found - falling back to simple rendering")
-        # Fall back to simple rendering (existing method)
-        from services.pdf_service import generate_improved_pdf
-        generate_improved_pdf(text, output_path, "professional")
+        # Unmarked lines parse as plain text blocks of the same document model
+        logger.warning("⚠️ No formatting markers found - rendering as plain text")
+    elements = formatter.parse_formatted_text(text)
+    formatter.generate_pdf(output_path, elements)
     
     logger.info("=" * 80)
+
+
+def render_reportlab(document: ResumeDocument, template_id: str = "professional",
+                     max_pages: Optional[int] = None) -> bytes:
+    """
+    ReportLab backend: render the intermediate document model to PDF bytes.
+    Fit-to-page is not implemented here and text is limited to the cp1252 core
+    fonts; max_pages is accepted for the common backend signature, and
+    render_backends.backend_for routes such requests and documents to FPDF.
+    """
+    buffer = io.BytesIO()
+    PDFFormatter(get_template(template_id).get_styles()).build_pdf(buffer, document)
+    return buffer.getvalue()
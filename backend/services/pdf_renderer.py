@@ -0,0 +1,562 @@
+"""
+FPDF renderer - Harvard-style resume PDFs from the intermediate render model.
+Kept free of OCR dependencies so it can be imported cheaply by render workers.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fpdf import FPDF
+
+from services.fonts import (
+    PDF_UNICODE_FONT,
+    UnicodeFamily,
+    font_subset,
+    load_font,
+    ttf_text_units,
+    unicode_family,
+)
+from services.render_model import Entry, Header, ResumeDocument, Section, Text, plain_text
+from services.templates import get_template
+
+logger = logging.getLogger(__name__)
+
+# Bounded memos shared by every render in the process
+SANITIZE_CACHE_SIZE = int(os.getenv("FPDF_SANITIZE_CACHE_SIZE", "4096"))
+WIDTH_CACHE_SIZE = int(os.getenv("FPDF_WIDTH_CACHE_SIZE", "16384"))
+WRAP_CACHE_SIZE = int(os.getenv("FPDF_WRAP_CACHE_SIZE", "8192"))
+
+# Binary search steps per fit-to-page dimension (precision: range / 2**steps)
+FIT_SEARCH_STEPS = 5
+
+_SANITIZE_TABLE = str.maketrans({
+    '\u2013': '-',  # en-dash
+    '\u2014': '-',  # em-dash
+    '\u2018': "'",  # left single quote
+    '\u2019': "'",  # right single quote
+    '\u201c': '"',  # left double quote
+    '\u201d': '"',  # right double quote
+    # '\u2022' (bullet) is kept: cp1252 has it at 0x95
+})
+
+# Text measuring function of every font used so far, by font name (e.g. "Times-Bold")
+_FONT_WIDTHS: Dict[str, Callable[[str], int]] = {}
+
+# ToUnicode CMap FPDF writes for every embedded TTF font
+_TO_UNICODE_CMAP = (
+    "/CIDInit /ProcSet findresource begin\n"
+    "12 dict begin\n"
+    "begincmap\n"
+    "/CIDSystemInfo\n"
+    "<</Registry (Adobe)\n"
+    "/Ordering (UCS)\n"
+    "/Supplement 0\n"
+    ">> def\n"
+    "/CMapName /Adobe-Identity-UCS def\n"
+    "/CMapType 2 def\n"
+    "1 begincodespacerange\n"
+    "<0000> <FFFF>\n"
+    "endcodespacerange\n"
+    "1 beginbfrange\n"
+    "<0000> <FFFF> <0000>\n"
+    "endbfrange\n"
+    "endcmap\n"
+    "CMapName currentdict /CMap defineresource pop\n"
+    "end\n"
+    "end"
+)
+
+
+@lru_cache(maxsize=SANITIZE_CACHE_SIZE)
+def sanitize_text(text: str) -> str:
+    """Map text onto the latin-1 string FPDF core fonts expect."""
+    if text.isascii():
+        return text
+    # Final safety net: encode to cp1252 (supports bullets • at 0x95), replacing errors.
+    # FPDF standard fonts use cp1252 glyphs but write page text as latin-1, so the
+    # cp1252 bytes are mapped 1:1 onto latin-1 characters (• -> '\x95').
+    return text.translate(_SANITIZE_TABLE).encode('cp1252', 'replace').decode('latin-1')
+
+
+def is_cp1252(text: str) -> bool:
+    """True if the core fonts can render text without substitution."""
+    if text.isascii():
+        return True
+    try:
+        text.translate(_SANITIZE_TABLE).encode('cp1252')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _core_text_units(cw: Dict[str, int], text: str) -> int:
+    return sum(cw.get(c, 0) for c in text)
+
+
+@lru_cache(maxsize=WIDTH_CACHE_SIZE)
+def text_units(font_name: str, text: str) -> int:
+    """Width of text in a font, in 1/1000 of the font size."""
+    return _FONT_WIDTHS[font_name](text)
+
+
+@lru_cache(maxsize=WRAP_CACHE_SIZE)
+def wrap_text(font_name: str, text: str, wmax: float) -> Optional[Tuple[Tuple[str, int, int], ...]]:
+    """
+    Break text into lines at spaces exactly like FPDF's multi_cell, for a line
+    width of wmax font units. Returns (line, width, gaps) per line, or None if
+    a single word is wider than the line.
+    """
+    words = text.split(" ")
+    units = [text_units(font_name, word) for word in words]
+    if max(units) > wmax:
+        return None
+
+    space = text_units(font_name, " ")
+    lines = []
+    start = 0
+    width = units[0]
+    for k in range(1, len(words)):
+        candidate = width + space + units[k]
+        if candidate <= wmax:
+            width = candidate
+            continue
+        lines.append((" ".join(words[start:k]), width, k - start - 1))
+        start = k
+        width = units[k]
+    lines.append((" ".join(words[start:]), width, len(words) - start - 1))
+    return tuple(lines)
+
+
+def subset_glyphs(used) -> frozenset:
+    """
+    Round the code points a document uses up to whole 128-character blocks,
+    so documents in the same scripts share one cached font subset.
+    """
+    blocks = {code & ~0x7F for code in used if code >= 32}
+    return frozenset(code for base in blocks for code in range(max(base, 32), base + 128))
+
+@dataclass(frozen=True)
+class Layout:
+    """Scale factors the fit-to-page search applies to the Harvard layout."""
+    font_scale: float = 1.0  # font sizes and line heights
+    spacing_scale: float = 1.0  # vertical gaps between lines, entries and sections
+
+
+DEFAULT_LAYOUT = Layout()
+
+
+# --- HELPER: HARVARD PDF GENERATOR ---
+class HarvardPDF(FPDF):
+    def __init__(self, unicode_family: Optional[UnicodeFamily] = None, layout: Layout = DEFAULT_LAYOUT):
+        super().__init__()
+        self.unicode_family = unicode_family
+        self.layout = layout
+        if unicode_family:
+            self.family = unicode_family.name
+            self.bullet = "\u2022"
+        else:
+            self.family = "Times"
+            self.bullet = "\x95"  # 0x95 is bullet in cp1252
+
+    def sanitize(self, text):
+        """Sanitize text to be compatible with FPDF latin-1 encoding."""
+        if not text: return ""
+        if self.unicode_family:
+            return str(text)
+        return sanitize_text(str(text))
+
+    def set_font(self, family, style='', size=0):
+        if self.unicode_family and family == self.unicode_family.name:
+            self._add_unicode_font(style.upper())
+        super().set_font(family, style, size)
+
+    def _add_unicode_font(self, style: str):
+        """Register one style of the Unicode family from the process-wide font cache."""
+        fontkey = self.unicode_family.name.lower() + style
+        if fontkey in self.fonts:
+            return
+        font = load_font(self.unicode_family.files[style])
+        self.fonts[fontkey] = {
+            'i': len(self.fonts) + 1, 'type': 'TTF', 'name': font['name'],
+            'desc': font['desc'], 'up': font['up'], 'ut': font['ut'], 'cw': font['cw'],
+            'ttffile': font['ttffile'], 'fontkey': fontkey,
+            'subset': list(range(0, 32)), 'unifilename': None,
+        }
+        self.font_files[fontkey] = {'length1': font['originalsize'], 'type': "TTF",
+                                    'ttffile': font['ttffile']}
+
+    def _font_name(self) -> str:
+        font = self.current_font
+        name = font['name']
+        if name not in _FONT_WIDTHS:
+            if font['type'] == 'TTF':
+                _FONT_WIDTHS[name] = partial(ttf_text_units, load_font(font['ttffile']))
+            else:
+                _FONT_WIDTHS[name] = partial(_core_text_units, font['cw'])
+        return name
+
+    def get_string_width(self, s):
+        """Width of s in the current font, from the shared width memo."""
+        return text_units(self._font_name(), s) * self.font_size / 1000.0
+
+    def multi_cell(self, w, h, txt='', border=0, align='J', fill=0, split_only=False):
+        """
+        Word-at-a-time multi_cell using memoized word widths.
+        Breaks and justifies lines exactly like FPDF's character loop; text it
+        cannot wrap at spaces (explicit newlines, words wider than the line,
+        borders) goes through the original implementation.
+        """
+        if border or split_only or "\n" in txt or "\r" in txt:
+            return super().multi_cell(w, h, txt, border, align, fill, split_only)
+
+        if w == 0:
+            w = self.w - self.r_margin - self.x
+        wmax = (w - 2 * self.c_margin) * 1000.0 / self.font_size
+        lines = wrap_text(self._font_name(), txt, wmax)
+        if lines is None:
+            return super().multi_cell(w, h, txt, border, align, fill, split_only)
+
+        for line, width, gaps in lines[:-1]:
+            # Automatic line break
+            if align == 'J':
+                self.ws = (wmax - width) / 1000.0 * self.font_size / gaps if gaps else 0
+                self._out('%.3f Tw' % (self.ws * self.k))
+            self.cell(w, h, line, 0, 2, align, fill)
+
+        # Last chunk
+        if self.ws > 0:
+            self.ws = 0
+            self._out('0 Tw')
+        self.cell(w, h, lines[-1][0], 0, 2, align, fill)
+        self.x = self.l_margin
+
+    def use_font(self, style, size):
+        self.set_font(self.family, style, size * self.layout.font_scale)
+
+    def line_h(self, h):
+        return h * self.layout.font_scale
+
+    def gap(self, h):
+        self.ln(h * self.layout.spacing_scale)
+
+    def header_section(self, header: Header):
+        if header.name:
+            self.use_font("B", 24)
+            self.cell(0, self.line_h(10), self.sanitize(plain_text(header.name)).upper(), align="C", ln=True)
+        
+        self.use_font("", 10)
+        for line in header.contact:
+            self.cell(0, self.line_h(5), self.sanitize(plain_text(line)), align="C", ln=True)
+        self.gap(5)
+
+    def section_title(self, title):
+        self.use_font("B", 12)
+        self.cell(0, self.line_h(6), self.sanitize(title).upper(), ln=True)
+        self.line(self.get_x(), self.get_y(), 190, self.get_y())
+        self.gap(2)
+
+    def add_bullet(self, text):
+        # Small padding from start (reduced indentation)
+        self.cell(2) 
+        
+        # Draw bullet manually to control size/position
+        self.use_font("B", 14) # Larger bullet
+        self.cell(4, self.line_h(5), self.bullet, align="C")
+        
+        # Reset font for text
+        self.use_font("", 10)
+        self.multi_cell(0, self.line_h(5), self.sanitize(plain_text(text)))
+
+    def add_entry(self, entry: Entry):
+        self.use_font("B", 11)
+        self.cell(100, self.line_h(5), self.sanitize(plain_text(entry.title)), align="L")
+        self.use_font("", 11)
+        self.cell(0, self.line_h(5), self.sanitize(plain_text(entry.location)), align="R", ln=True)
+        self.use_font("I", 11)
+        self.cell(100, self.line_h(5), self.sanitize(plain_text(entry.subtitle)), align="L")
+        self.use_font("", 11)
+        self.cell(0, self.line_h(5), self.sanitize(plain_text(entry.date)), align="R", ln=True)
+        
+        self.use_font("", 10)
+        for bullet in entry.bullets:
+            self.add_bullet(bullet)
+        self.gap(4 if entry.kind == "experience" else 3)
+
+    def add_text(self, block: Text):
+        text = self.sanitize(plain_text(block.text))
+        if block.style == "bullet":
+            self.add_bullet(block.text)
+        elif block.style in ("bold", "italic"):
+            self.use_font("B" if block.style == "bold" else "I", 10)
+            self.multi_cell(0, self.line_h(5), text)
+        else:
+            self.use_font("", 10)
+            self.multi_cell(0, self.line_h(5), text)
+            if block.style == "paragraph":
+                self.gap(5)
+
+    def add_section(self, section: Section):
+        if section.title:
+            self.section_title(plain_text(section.title))
+        for block in section.blocks:
+            if isinstance(block, Entry):
+                self.add_entry(block)
+            elif isinstance(block, Text):
+                self.add_text(block)
+            else:
+                self.gap(4)
+
+    def _putfonts(self):
+        # Core fonts go through FPDF; embedded TTF fonts are written from the
+        # subset cache instead of being re-parsed and re-subset for every document
+        unicode_fonts = [f for f in self.fonts.values() if f['type'] == 'TTF']
+        if not unicode_fonts:
+            return super()._putfonts()
+        fonts = self.fonts
+        self.fonts = {k: f for k, f in fonts.items() if f['type'] != 'TTF'}
+        try:
+            super()._putfonts()
+        finally:
+            self.fonts = fonts
+        for font in sorted(unicode_fonts, key=lambda f: f['i']):
+            self._put_unicode_font(font)
+
+    def _put_unicode_font(self, font: dict):
+        subset = font_subset(font['ttffile'], subset_glyphs(font['subset']))
+        fontname = 'MPDFAA+' + font['name']
+        font['n'] = self.n + 1
+
+        # Type0 font
+        self._newobj()
+        self._out('<</Type /Font')
+        self._out('/Subtype /Type0')
+        self._out('/BaseFont /' + fontname)
+        self._out('/Encoding /Identity-H')
+        self._out('/DescendantFonts [' + str(self.n + 1) + ' 0 R]')
+        self._out('/ToUnicode ' + str(self.n + 2) + ' 0 R')
+        self._out('>>')
+        self._out('endobj')
+
+        # CIDFontType2
+        self._newobj()
+        self._out('<</Type /Font')
+        self._out('/Subtype /CIDFontType2')
+        self._out('/BaseFont /' + fontname)
+        self._out('/CIDSystemInfo ' + str(self.n + 2) + ' 0 R')
+        self._out('/FontDescriptor ' + str(self.n + 3) + ' 0 R')
+        if font['desc'].get('MissingWidth'):
+            self._out('/DW %d' % font['desc']['MissingWidth'])
+        self._out(subset.widths)
+        self._out('/CIDToGIDMap ' + str(self.n + 4) + ' 0 R')
+        self._out('>>')
+        self._out('endobj')
+
+        # ToUnicode
+        self._newobj()
+        self._out('<</Length ' + str(len(_TO_UNICODE_CMAP)) + '>>')
+        self._putstream(_TO_UNICODE_CMAP)
+        self._out('endobj')
+
+        # CIDSystemInfo
+        self._newobj()
+        self._out('<</Registry (Adobe)')
+        self._out('/Ordering (UCS)')
+        self._out('/Supplement 0')
+        self._out('>>')
+        self._out('endobj')
+
+        # Font descriptor
+        self._newobj()
+        self._out('<</Type /FontDescriptor')
+        self._out('/FontName /' + fontname)
+        for key in ('Ascent', 'Descent', 'CapHeight', 'Flags', 'FontBBox', 'ItalicAngle', 'StemV', 'MissingWidth'):
+            value = font['desc'][key]
+            if key == 'Flags':
+                value = (value | 4) & ~32  # non-symbolic
+            self._out(' /%s %s' % (key, value))
+        self._out('/FontFile2 ' + str(self.n + 2) + ' 0 R')
+        self._out('>>')
+        self._out('endobj')
+
+        # CIDToGIDMap
+        self._newobj()
+        self._out('<</Length ' + str(len(subset.cidtogidmap)))
+        self._out('/Filter /FlateDecode')
+        self._out('>>')
+        self._putstream(subset.cidtogidmap)
+        self._out('endobj')
+
+        # Font file
+        self._newobj()
+        self._out('<</Length ' + str(len(subset.fontstream)))
+        self._out('/Filter /FlateDecode')
+        self._out('/Length1 ' + str(subset.length1))
+        self._out('>>')
+        self._putstream(subset.fontstream)
+        self._out('endobj')
+
+    def render_document(self, document: ResumeDocument):
+        self.add_page()
+        self.set_auto_page_break(auto=True, margin=15)
+        self.header_section(document.header)
+        for section in document.sections:
+            self.add_section(section)
+
+# Rows recorded by LayoutMeter
+_ROW_CELL = 0  # may break the page, does not move down
+_ROW_LINE = 1  # may break the page, moves down by its height
+_ROW_GAP = 2  # vertical gap, scaled by the spacing factor
+
+
+class LayoutMeter(HarvardPDF):
+    """
+    Runs the Harvard layout without producing output and records the rows it
+    would place. Paragraphs reuse the memoized wrap results, so a pass costs a
+    fraction of a render, and since spacing only scales the recorded gaps, the
+    page count for any spacing is a replay of the rows.
+    """
+
+    def __init__(self, unicode_family: Optional[UnicodeFamily], font_scale: float):
+        super().__init__(unicode_family, Layout(font_scale, 1.0))
+        self.rows: List[Tuple[int, float]] = []
+
+    def _out(self, s):
+        pass
+
+    def set_font(self, family, style='', size=0):
+        # Fonts already registered only need the current-font state switched
+        fontkey = family.lower() + style
+        font = self.fonts.get(fontkey)
+        if font is None:
+            return super().set_font(family, style, size)
+        self.font_family = family.lower()
+        self.font_style = style
+        self.font_size_pt = size
+        self.font_size = size / self.k
+        self.current_font = font
+        self.unifontsubset = font['type'] == 'TTF'
+
+    def gap(self, h):
+        self.rows.append((_ROW_GAP, h))
+
+    def cell(self, w, h=0, txt='', border=0, ln=0, align='', fill=0, link=''):
+        self.rows.append((_ROW_LINE if ln > 0 else _ROW_CELL, h))
+        if w == 0:
+            w = self.w - self.r_margin - self.x
+        if ln == 1:
+            self.x = self.l_margin
+        elif ln == 0:
+            self.x += w
+
+    def page_count(self, spacing_scale: float) -> int:
+        """Pages the recorded rows fill, applying FPDF's automatic page breaks."""
+        top = self.t_margin
+        trigger = self.page_break_trigger
+        y = top
+        pages = 1
+        for kind, h in self.rows:
+            if kind == _ROW_GAP:
+                y += h * spacing_scale
+                continue
+            if y + h > trigger:
+                pages += 1
+                y = top
+            if kind == _ROW_LINE:
+                y += h
+        return pages
+
+
+def measure_layout(document: ResumeDocument, family: Optional[UnicodeFamily], font_scale: float) -> LayoutMeter:
+    meter = LayoutMeter(family, font_scale)
+    meter.render_document(document)
+    return meter
+
+
+def count_pages(document: ResumeDocument, family: Optional[UnicodeFamily], layout: Layout) -> int:
+    return measure_layout(document, family, layout.font_scale).page_count(layout.spacing_scale)
+
+
+def _search(fits: Callable[[float], bool], low: float, high: float) -> float:
+    """Largest value in [low, high] that fits, assuming smaller values fit more."""
+    for _ in range(FIT_SEARCH_STEPS):
+        middle = (low + high) / 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def fit_layout(document: ResumeDocument, template_id: str, family: Optional[UnicodeFamily],
+               max_pages: int) -> Layout:
+    """
+    Find the roomiest layout that fits the document on max_pages pages.
+    Vertical spacing is tightened first, then fonts are scaled down, each
+    within the template's allowed range.
+    """
+    template = get_template(template_id)
+    min_font, max_font = template.fit_font_scale
+    min_spacing, max_spacing = template.fit_spacing_scale
+
+    meters: Dict[float, LayoutMeter] = {}
+
+    def measure(font_scale: float) -> LayoutMeter:
+        if font_scale not in meters:
+            meters[font_scale] = measure_layout(document, family, font_scale)
+        return meters[font_scale]
+
+    if measure(max_font).page_count(max_spacing) <= max_pages:
+        return Layout(max_font, max_spacing)
+
+    font_scale = max_font
+    if measure(max_font).page_count(min_spacing) > max_pages:
+        # Spacing alone is not enough: find the largest font that fits at minimum spacing
+        def fits(scale: float) -> bool:
+            return measure(scale).page_count(min_spacing) <= max_pages
+
+        if not fits(min_font):
+            logger.info(f"Resume does not fit on {max_pages} page(s) within the template limits")
+            return Layout(min_font, min_spacing)
+        font_scale = _search(fits, min_font, max_font)
+
+    meter = measure(font_scale)
+    spacing = _search(lambda v: meter.page_count(v) <= max_pages, min_spacing, max_spacing)
+    return Layout(font_scale, spacing)
+
+
+def _document_text(document: ResumeDocument) -> Iterator[str]:
+    yield document.header.name
+    yield from document.header.contact
+    for section in document.sections:
+        yield section.title
+        for block in section.blocks:
+            if isinstance(block, Entry):
+                yield from (block.title, block.location, block.subtitle, block.date)
+                yield from block.bullets
+            elif isinstance(block, Text):
+                yield block.text
+
+
+def needs_unicode_font(document: ResumeDocument) -> bool:
+    """True if any text in the document falls outside what the core fonts can render."""
+    return not all(is_cp1252(plain_text(text)) for text in _document_text(document))
+
+
+def render_fpdf(document: ResumeDocument, template_id: str = "professional",
+                max_pages: Optional[int] = None) -> bytes:
+    """
+    FPDF backend: render the intermediate document model to PDF bytes.
+    With max_pages, spacing and font size are reduced (within the template's
+    limits) until the layout fits, then the PDF is built once.
+    """
+    family = unicode_family()
+    if family and PDF_UNICODE_FONT != "always" and not needs_unicode_font(document):
+        family = None
+    layout = fit_layout(document, template_id, family, max_pages) if max_pages else DEFAULT_LAYOUT
+    pdf = HarvardPDF(family, layout)
+    pdf.render_document(document)
+    # FPDF builds the document as a latin-1 string
+    return pdf.output(dest="S").encode("latin-1")
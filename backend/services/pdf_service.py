@@ -4,16 +4,11 @@ from paddleocr import PaddleOCR
 from pdf2image import convert_from_path
 import pytesseract
 import PyPDF2
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.platypus.flowables import HRFlowable
-from reportlab.lib.enums import TA_LEFT
-from PIL import Image
 import logging
 import os
+from typing import Callable, Dict, Optional
+
+from services.artifacts import artifacts
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +28,10 @@ def get_paddle_ocr():
             raise
     return _ocr_instance
 
-def extract_text_with_paddle_ocr(pdf_path: str) -> tuple[str, bool]:
+# Called with (pages done, total pages) as extraction works through a document
+PageCallback = Callable[[int, int], None]
+
+def extract_text_with_paddle_ocr(pdf_path: str, on_page: Optional[PageCallback] = None) -> tuple[str, bool]:
     """
     Extract text using PaddleOCR with resume-specific optimizations.
     Handles images, tables, multiple columns, and complex layouts.
@@ -136,6 +134,8 @@ def extract_text_with_paddle_ocr(pdf_path: str) -> tuple[str, bool]:
                 logger.info(f"Page {i+1}: Extracted {len(page_content)} characters ({len(page_text)} lines)")
             else:
                 logger.warning(f"Page {i+1}: No text detected")
+            if on_page:
+                on_page(i + 1, len(images))
         
         extracted = '\n\n'.join(all_text)
         logger.info(f"PaddleOCR extraction complete. Total: {len(extracted)} characters")
@@ -150,7 +150,7 @@ def extract_text_with_paddle_ocr(pdf_path: str) -> tuple[str, bool]:
         logger.warning(f"PaddleOCR failed: {str(e)}")
         return "", False
 
-def extract_text_with_tesseract(pdf_path: str) -> tuple[str, bool]:
+def extract_text_with_tesseract(pdf_path: str, on_page: Optional[PageCallback] = None) -> tuple[str, bool]:
     """
     Extract text using Tesseract OCR.
     Returns: (extracted_text, success)
@@ -167,6 +167,8 @@ def extract_text_with_tesseract(pdf_path: str) -> tuple[str, bool]:
             text = pytesseract.image_to_string(image, lang='eng')
             all_text.append(text)
             logger.info(f"Page {i+1}: Extracted {len(text)} characters")
+            if on_page:
+                on_page(i + 1, len(images))
         
         extracted = '\n\n'.join(all_text)
         logger.info(f"Tesseract extraction complete. Total: {len(extracted)} characters")
@@ -176,7 +178,7 @@ def extract_text_with_tesseract(pdf_path: str) -> tuple[str, bool]:
         logger.warning(f"Tesseract failed: {str(e)}")
         return "", False
 
-def extract_text_with_pypdf2(pdf_path: str) -> tuple[str, bool]:
+def extract_text_with_pypdf2(pdf_path: str, on_page: Optional[PageCallback] = None) -> tuple[str, bool]:
     """
     Extract text using PyPDF2 (direct text extraction, no OCR).
     Returns: (extracted_text, success)
@@ -194,6 +196,8 @@ def extract_text_with_pypdf2(pdf_path: str) -> tuple[str, bool]:
                 if extracted:
                     text += extracted + "\n"
                 logger.debug(f"Extracted {len(extracted) if extracted else 0} chars from page {i+1}")
+                if on_page:
+                    on_page(i + 1, num_pages)
         
         logger.info(f"PyPDF2 extraction complete. Total: {len(text)} characters")
         return text.strip(), True
@@ -202,10 +206,47 @@ def extract_text_with_pypdf2(pdf_path: str) -> tuple[str, bool]:
         logger.warning(f"PyPDF2 failed: {str(e)}")
         return "", False
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+# A first page with fewer text-showing operators than this is treated as a scan
+TEXT_LAYER_MIN_OPS = 10
+
+def _has_text_layer(page) -> bool:
+    """
+    Whether a page draws text, from its fonts and content stream. Much cheaper
+    than extract_text(), which decodes every glyph. Text drawn only inside form
+    XObjects is missed, which just sends the file down the slow path.
+    """
+    resources = page.get("/Resources")
+    fonts = resources.get_object().get("/Font") if resources else None
+    contents = page.get_contents()
+    if not fonts or contents is None:
+        return False
+    data = contents.get_data()
+    return data.count(b"Tj") + data.count(b"TJ") >= TEXT_LAYER_MIN_OPS
+
+def inspect_pdf(pdf_path: str) -> Dict:
+    """
+    Cheap look at an upload before it is queued: size, page count, encryption
+    and whether the first page has a text layer (digital PDF) or not (scan).
+    Never raises; an unreadable file comes back with pages=None.
+    """
+    profile = {"bytes": os.path.getsize(pdf_path), "pages": None, "encrypted": False, "text_layer": False}
+    try:
+        reader = PyPDF2.PdfReader(pdf_path)
+        profile["encrypted"] = reader.is_encrypted
+        if reader.is_encrypted and not reader.decrypt(""):
+            return profile
+        profile["pages"] = len(reader.pages)
+        if profile["pages"]:
+            profile["text_layer"] = _has_text_layer(reader.pages[0])
+    except Exception as e:
+        logger.warning(f"Could not inspect PDF {pdf_path}: {str(e)}")
+    return profile
+
+def extract_text_from_pdf(pdf_path: str, on_page: Optional[PageCallback] = None) -> str:
     """
     Extract text from PDF using multiple OCR methods with fallback.
     Priority: PaddleOCR -> Tesseract -> PyPDF2
+    on_page, if given, is called after each page of whichever method is running.
     """
     try:
         logger.info(f"Starting text extraction from PDF: {pdf_path}")
@@ -216,7 +257,7 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         
         # Try PyPDF2 FIRST (fast for digital PDFs - most common case)
         logger.info("PRIMARY METHOD: Attempting PyPDF2 (fast for digital PDFs)...")
-        text, success = extract_text_with_pypdf2(pdf_path)
+        text, success = extract_text_with_pypdf2(pdf_path, on_page)
         if success and text.strip():
             ocr_method_used = "PyPDF2 (Direct Text Extraction)"
             extracted_text = text
@@ -227,7 +268,7 @@ def extract_text_from_pdf(pdf_path: str) -> str:
             
             # Try PaddleOCR FIRST for scanned PDFs (better quality)
             logger.info("BACKUP METHOD: Attempting PaddleOCR (High Quality)...")
-            text, success = extract_text_with_paddle_ocr(pdf_path)
+            text, success = extract_text_with_paddle_ocr(pdf_path, on_page)
             if success and text.strip():
                 ocr_method_used = "PaddleOCR"
                 extracted_text = text
@@ -237,7 +278,7 @@ def extract_text_from_pdf(pdf_path: str) -> str:
                 
                 # Try Tesseract as final fallback
                 logger.info("FALLBACK METHOD: Attempting Tesseract OCR...")
-                text, success = extract_text_with_tesseract(pdf_path)
+                text, success = extract_text_with_tesseract(pdf_path, on_page)
                 if success and text.strip():
                     ocr_method_used = "Tesseract OCR"
                     extracted_text = text
@@ -248,151 +289,39 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         
         logger.info("=" * 80)
         
-        # Calculate number of pages
-        if ocr_method_used == 'PyPDF2 (Direct Text Extraction)':
-            with open(pdf_path, 'rb') as pdf_file:
-                reader = PyPDF2.PdfReader(pdf_file)
-                num_pages = len(reader.pages)
-        else:
-            # For OCR methods, we already know the page count from convert_from_path
-            num_pages = "Already processed via image conversion"
-        
-        # Save extracted text to file
-        ocr_output_path = pdf_path.replace('_original.pdf', '_ocr_result.txt')
-        with open(ocr_output_path, 'w', encoding='utf-8') as f:
-            f.write("=" * 80 + "\n")
-            f.write("OCR EXTRACTION RESULT\n")
-            f.write(f"Method: {ocr_method_used}\n")
-            f.write(f"Source: {pdf_path}\n")
-            f.write(f"Total Characters: {len(extracted_text)}\n")
-            f.write(f"Number of Pages: {num_pages}\n")
-            f.write("=" * 80 + "\n\n")
-            f.write(extracted_text)
-        logger.info(f"OCR results saved to: {ocr_output_path}")
+        # Save the extraction report (written in the background, per ARTIFACT_LEVEL)
+        if artifacts.enabled("metadata"):
+            if ocr_method_used == 'PyPDF2 (Direct Text Extraction)':
+                with open(pdf_path, 'rb') as pdf_file:
+                    reader = PyPDF2.PdfReader(pdf_file)
+                    num_pages = len(reader.pages)
+            else:
+                # For OCR methods, we already know the page count from convert_from_path
+                num_pages = "Already processed via image conversion"
+            report = (
+                "=" * 80 + "\n"
+                "OCR EXTRACTION RESULT\n"
+                f"Method: {ocr_method_used}\n"
+                f"Source: {pdf_path}\n"
+                f"Total Characters: {len(extracted_text)}\n"
+                f"Number of Pages: {num_pages}\n"
+                + "=" * 80 + "\n\n"
+            )
+            if artifacts.enabled("full"):
+                report += extracted_text
+            ocr_output_path = pdf_path.replace('_original.pdf', '_ocr_result.txt')
+            artifacts.write_text(ocr_output_path, report, level="metadata")
         
         return extracted_text.strip()
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}", exc_info=True)
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
-from fpdf import FPDF
-
-# --- HELPER: HARVARD PDF GENERATOR ---
-class HarvardPDF(FPDF):
-    def sanitize(self, text):
-        """Sanitize text to be compatible with FPDF latin-1 encoding."""
-        if not text: return ""
-        # Replace common incompatible characters
-        replacements = {
-            '\u2013': '-',  # en-dash
-            '\u2014': '-',  # em-dash
-            '\u2018': "'",  # left single quote
-            '\u2019': "'",  # right single quote
-            '\u201c': '"',  # left double quote
-            '\u201d': '"',  # right double quote
-            # '\u2022': '-',  # bullet (removed replacement)
-        }
-        for char, replacement in replacements.items():
-            text = text.replace(char, replacement)
-            
-        # Final safety net: encode to cp1252 (supports bullets • at 0x95), replacing errors
-        # FPDF standard fonts support cp1252
-        return str(text).encode('cp1252', 'replace').decode('cp1252')
-
-    def header_section(self, data):
-        self.set_font("Times", "B", 24)
-        name = data.get("name", "Name")
-        if not name: name = "Name"
-        self.cell(0, 10, self.sanitize(name).upper(), align="C", ln=True)
-        
-        self.set_font("Times", "", 10)
-        parts = [data.get("email"), data.get("phone"), data.get("linkedin")]
-        contact = " | ".join([p for p in parts if p])
-        self.cell(0, 5, self.sanitize(contact), align="C", ln=True)
-        self.ln(5)
-
-    def section_title(self, title):
-        self.set_font("Times", "B", 12)
-        self.cell(0, 6, self.sanitize(title).upper(), ln=True)
-        self.line(self.get_x(), self.get_y(), 190, self.get_y())
-        self.ln(2)
-
-    def add_education(self, edu_list):
-        if not edu_list: return
-        self.section_title("Education")
-        for item in edu_list:
-            self.set_font("Times", "B", 11)
-            self.cell(100, 5, self.sanitize(item.get("school", "")), align="L")
-            self.set_font("Times", "", 11)
-            self.cell(0, 5, self.sanitize(item.get("location", "")), align="R", ln=True)
-            self.set_font("Times", "I", 11)
-            self.cell(100, 5, self.sanitize(item.get("degree", "")), align="L")
-            self.set_font("Times", "", 11)
-            self.cell(0, 5, self.sanitize(item.get("date", "")), align="R", ln=True)
-            self.ln(3)
-
-    def add_experience(self, exp_list):
-        if not exp_list: return
-        self.section_title("Experience")
-        for item in exp_list:
-            self.set_font("Times", "B", 11)
-            self.cell(100, 5, self.sanitize(item.get("company", "")), align="L")
-            self.set_font("Times", "", 11)
-            self.cell(0, 5, self.sanitize(item.get("location", "")), align="R", ln=True)
-            self.set_font("Times", "I", 11)
-            self.cell(100, 5, self.sanitize(item.get("role", "")), align="L")
-            self.set_font("Times", "", 11)
-            self.cell(0, 5, self.sanitize(item.get("date", "")), align="R", ln=True)
-            
-            self.set_font("Times", "", 10)
-            for bullet in item.get("bullets", []):
-                # Small padding from start (reduced indentation)
-                self.cell(2) 
-                
-                # Draw bullet manually to control size/position
-                self.set_font("Times", "B", 14) # Larger bullet
-                self.cell(4, 5, "\x95", align="C") # 0x95 is bullet in cp1252
-                
-                # Reset font for text
-                self.set_font("Times", "", 10)
-                
-                # Sanitize text
-                safe_bullet = self.sanitize(bullet)
-                self.multi_cell(0, 5, safe_bullet)
-            self.ln(4)
-
-    def add_skills(self, skills_text):
-        if not skills_text: return
-        self.section_title("Skills")
-        self.set_font("Times", "", 10)
-        # Handle string vs list
-        if isinstance(skills_text, list):
-            skills_text = ", ".join(skills_text)
-        
-        safe_text = self.sanitize(skills_text)
-        self.multi_cell(0, 5, safe_text)
-        self.ln(5)
-
-def generate_improved_pdf(data: dict, output_path: str, template_id: str = "professional"):
-    """
-    Generate ATS-optimized PDF resume using FPDF and Harvard style.
-    """
-    try:
-        logger.info(f"Generating PDF at: {output_path}")
-        
-        pdf = HarvardPDF()
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-        
-        # Safely get data with defaults
-        if "header" in data: pdf.header_section(data["header"])
-        if "education" in data: pdf.add_education(data["education"])
-        if "experience" in data: pdf.add_experience(data["experience"])
-        if "skills" in data: pdf.add_skills(data["skills"])
-        
-        pdf.output(output_path)
-        logger.info("✓ PDF generated successfully")
-        
-    except Exception as e:
-        logger.error(f"Error generating PDF: {str(e)}", exc_info=True)
-        raise Exception(f"Error generating PDF: {str(e)}")
+# Rendering lives in its own modules so render workers can import it
+# without pulling in the OCR stack; re-exported here for existing callers.
+from services.pdf_renderer import HarvardPDF  # noqa: F401
+from services.render_backends import (  # noqa: F401
+    RENDERER_VERSION,
+    render_improved_pdf,
+    generate_improved_pdf,
+)
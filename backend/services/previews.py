@@ -0,0 +1,72 @@
+"""
+PDF preview thumbnails.
+The mobile result screen only needs a picture of the resume, not the PDF
+itself. A page is rasterized once with poppler at the largest configured
+width, in grayscale, then downscaled and encoded for every other width. That
+gives a handful of small WebP/PNG images, typically a few KB to a few tens
+of KB each.
+"""
+
+import io
+import logging
+import os
+from typing import Dict, Iterable
+
+from pdf2image import convert_from_bytes
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a change alters preview output, so cached images are not reused
+PREVIEW_VERSION = "preview-1"
+
+PREVIEW_WIDTHS = tuple(sorted(int(w) for w in os.getenv("PREVIEW_WIDTHS", "240,480,960").split(",") if w.strip()))
+PREVIEW_FORMAT = os.getenv("PREVIEW_FORMAT", "webp").lower()
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", "60"))
+
+# format -> (media type, Pillow format name)
+PREVIEW_FORMATS: Dict[str, tuple] = {
+    "webp": ("image/webp", "WEBP"),
+    "png": ("image/png", "PNG"),
+}
+
+
+def preview_width(requested: int) -> int:
+    """Snap a requested width to the smallest configured width that covers it."""
+    for width in PREVIEW_WIDTHS:
+        if width >= requested:
+            return width
+    return PREVIEW_WIDTHS[-1]
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "png":
+        # Text on white needs few gray levels; a 16-entry palette packs 4 bits per pixel
+        image.quantize(colors=16).save(buffer, "PNG", optimize=True, bits=4)
+    else:
+        image.save(buffer, PREVIEW_FORMATS[fmt][1], quality=PREVIEW_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def render_previews(pdf_bytes: bytes, page: int = 1, widths: Iterable[int] = PREVIEW_WIDTHS,
+                    fmt: str = PREVIEW_FORMAT) -> Dict[int, bytes]:
+    """Rasterize one page of a PDF and return encoded images keyed by width."""
+    if fmt not in PREVIEW_FORMATS:
+        raise ValueError(f"Unsupported preview format: {fmt}")
+    widths = sorted(set(widths), reverse=True)
+
+    # Let poppler scale while rasterizing instead of rendering at a fixed DPI and shrinking
+    pages = convert_from_bytes(pdf_bytes, first_page=page, last_page=page,
+                               size=(widths[0], None), grayscale=True)
+    if not pages:
+        raise ValueError(f"Page {page} is out of range")
+
+    image = pages[0]
+    previews = {}
+    for width in widths:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        previews[width] = _encode(image, fmt)
+    logger.info(f"✓ Previews for page {page}: " + ", ".join(f"{w}px={len(b)}B" for w, b in previews.items()))
+    return previews
@@ -0,0 +1,159 @@
+"""
+PDF render backends and backend selection.
+Resume data is converted once into the intermediate render model
+(services.render_model) and handed to one of the registered backends. Unless
+RENDER_BACKEND pins one, the backend for each template is chosen by timing
+every backend the template supports on a representative resume.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from services.pdf_formatter import render_reportlab
+from services.pdf_renderer import needs_unicode_font, render_fpdf
+from services.render_model import ResumeDocument, document_from_data
+from services.templates import get_template
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a change alters rendered output, so cached PDFs are not reused
+RENDERER_VERSION = "harvard-3"
+
+# "auto" benchmarks the backends; "fpdf" or "reportlab" pins one for every template
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "auto").lower()
+
+BACKENDS: Dict[str, Callable[[ResumeDocument, str, Optional[int]], bytes]] = {
+    "fpdf": render_fpdf,
+    "reportlab": render_reportlab,
+}
+
+# Backends that implement fit-to-page (max_pages)
+FIT_BACKENDS = ("fpdf",)
+# Backends that embed a Unicode TTF; the others only have the cp1252 core fonts
+UNICODE_BACKENDS = ("fpdf",)
+
+BENCHMARK_RESUME = {
+    "header": {"name": "Jane Doe", "email": "jane.doe@example.com", "phone": "+1 555 0100",
+               "linkedin": "linkedin.com/in/janedoe"},
+    "education": [
+        {"school": "State University", "degree": "BSc Computer Science", "location": "Boston, MA",
+         "date": "2014 - 2018"},
+    ],
+    "experience": [
+        {"company": f"Company {i}", "role": "Software Engineer", "location": "Boston, MA",
+         "date": f"20{18 + i} - 20{19 + i}",
+         "bullets": ["Improved service throughput by 35% by redesigning the caching layer"] * 4}
+        for i in range(4)
+    ],
+    "skills": "Python, SQL, Docker, Kubernetes, AWS",
+}
+
+_selected: Dict[str, str] = {}
+_select_lock = threading.Lock()
+
+
+def benchmark_backends(template_id: str, rounds: int = 5) -> Dict[str, float]:
+    """Return the mean render time in seconds of each backend the template supports."""
+    document = document_from_data(BENCHMARK_RESUME)
+    timings = {}
+    for name in get_template(template_id).backends:
+        render = BACKENDS[name]
+        render(document, template_id)  # warm-up
+        start = time.perf_counter()
+        for _ in range(rounds):
+            render(document, template_id)
+        timings[name] = (time.perf_counter() - start) / rounds
+    return timings
+
+
+def select_backend(template_id: str) -> str:
+    """Return the backend used for a template, benchmarking on first use."""
+    backend = _selected.get(template_id)
+    if backend is not None:
+        return backend
+
+    with _select_lock:
+        if template_id in _selected:
+            return _selected[template_id]
+
+        supported = get_template(template_id).backends
+        if RENDER_BACKEND != "auto":
+            if RENDER_BACKEND not in supported:
+                raise ValueError(f"Template '{template_id}' does not support backend '{RENDER_BACKEND}'")
+            backend = RENDER_BACKEND
+        elif len(supported) == 1:
+            backend = supported[0]
+        else:
+            timings = benchmark_backends(template_id)
+            backend = min(timings, key=timings.get)
+            summary = ", ".join(f"{name}={secs * 1000:.1f}ms" for name, secs in timings.items())
+            logger.info(f"Render backend for '{template_id}': {backend} ({summary})")
+
+        _selected[template_id] = backend
+        return backend
+
+
+def backend_for(template_id: str, max_pages: Optional[int] = None, data: Optional[dict] = None) -> str:
+    """
+    Backend to render with. Fit-to-page requests, and resume data with text
+    the core fonts cannot encode, go to a backend that supports them.
+    """
+    document = document_from_data(data) if data is not None else None
+    return _route(template_id, max_pages, document)
+
+
+def _route(template_id: str, max_pages: Optional[int], document: Optional[ResumeDocument]) -> str:
+    backend = select_backend(template_id)
+    required = []
+    if max_pages:
+        required.append(FIT_BACKENDS)
+    if document is not None and needs_unicode_font(document):
+        required.append(UNICODE_BACKENDS)
+    if all(backend in names for names in required):
+        return backend
+    for name in get_template(template_id).backends:
+        if all(name in names for names in required):
+            return name
+    return backend
+
+
+def render_version(max_pages: Optional[int] = None) -> str:
+    """
+    Renderer version string for cache keys, with the backend setting and page
+    limit. The routed backend is left out: it follows from the data, template,
+    page limit and setting, so cache hits never have to build the document.
+    """
+    version = f"{RENDERER_VERSION}/{RENDER_BACKEND}"
+    return f"{version}/fit{max_pages}" if max_pages else version
+
+
+def render_improved_pdf(data: dict, template_id: str = "professional", backend: Optional[str] = None,
+                        max_pages: Optional[int] = None) -> bytes:
+    """
+    Render ATS-optimized PDF resume from the structured resume JSON.
+    Returns the PDF as bytes without touching the filesystem. With max_pages
+    the layout is tightened to fit on that many pages where the template allows.
+    """
+    try:
+        document = document_from_data(data)
+        backend = backend or _route(template_id, max_pages, document)
+        pdf_bytes = BACKENDS[backend](document, template_id, max_pages)
+        logger.info(f"✓ PDF rendered in memory with {backend} ({len(pdf_bytes)} bytes)")
+        return pdf_bytes
+    except Exception as e:
+        logger.error(f"Error generating PDF: {str(e)}", exc_info=True)
+        raise Exception(f"Error generating PDF: {str(e)}")
+
+
+def generate_improved_pdf(data: dict, output_path: str, template_id: str = "professional"):
+    """
+    Generate ATS-optimized PDF resume and write it to output_path.
+    """
+    logger.info(f"Generating PDF at: {output_path}")
+    pdf_bytes = render_improved_pdf(data, template_id)
+    with open(output_path, "wb") as f:
+        f.write(pdf_bytes)
+    logger.info("✓ PDF generated successfully")
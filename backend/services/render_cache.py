@@ -0,0 +1,297 @@
+"""
+Rendered-PDF cache.
+PDFs are keyed by a hash of the canonicalized resume data, the template id and
+the renderer version, so any change to the data produces a new key and stale
+entries simply age out. Entries live in an in-memory LRU bounded by count and
+total bytes, with an optional disk tier that is bounded by total bytes.
+
+get_or_create() renders each key once: concurrent misses in a process wait on
+the first one's in-flight future, and with a disk tier, misses in other
+processes (serve.py workers) wait on a lock file and then read the entry the
+first one wrote. Each process indexes the disk tier itself, so a miss checks
+the disk for entries written by the others, and every disk write rescans the
+directory before evicting: the byte limit holds for the directory as a whole,
+however many processes write to it.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; single-flight is then per process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAX_MEMORY_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+MAX_MEMORY_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "512"))
+MAX_DISK_BYTES = int(os.getenv("RENDER_CACHE_MAX_DISK_BYTES", str(512 * 1024 * 1024)))
+# How long a miss waits for another process rendering the same key before rendering itself
+LOCK_WAIT_SECONDS = float(os.getenv("RENDER_CACHE_LOCK_WAIT_SECONDS", "60"))
+LOCK_POLL_SECONDS = 0.05
+# Keys share this many lock files (by key prefix), so lock files never pile up
+LOCK_STRIPES_HEX = 3
+
+
+def make_cache_key(data: dict, template_id: str, renderer_version: str) -> str:
+    """Hash the canonical JSON form of the data together with template and renderer."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.sha256()
+    digest.update(renderer_version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(template_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(canonical.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Two-tier (memory + optional disk) LRU cache of rendered PDF bytes."""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = MAX_MEMORY_BYTES,
+        max_entries: int = MAX_MEMORY_ENTRIES,
+        max_disk_bytes: int = MAX_DISK_BYTES,
+        extension: str = ".pdf",
+    ):
+        self.cache_dir = cache_dir
+        self.extension = extension
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        # key -> future of the create() call in progress in this process
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        if cache_dir:
+            os.makedirs(os.path.join(cache_dir, "locks"), exist_ok=True)
+            self._load_disk_index()
+            logger.info(f"Render cache: {len(self._disk)} entries ({self._disk_bytes} bytes) in {self.cache_dir}")
+
+    def _load_disk_index(self):
+        """Index what is in the directory now, including entries written by other processes."""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(self.extension):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # removed meanwhile
+                entries.append((stat.st_mtime, entry.name[:-len(self.extension)], stat.st_size))
+        # Oldest (least recently written or read) first, so eviction order survives restarts
+        disk: "OrderedDict[str, int]" = OrderedDict()
+        for _, key, size in sorted(entries):
+            disk[key] = size
+        with self._lock:
+            self._disk = disk
+            self._disk_bytes = sum(disk.values())
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.extension}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached PDF bytes for key, or None."""
+        with self._lock:
+            pdf_bytes = self._memory.get(key)
+            if pdf_bytes is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return pdf_bytes
+
+        if self.cache_dir is not None:
+            # Also when the key is not indexed: another process may have written it
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    pdf_bytes = f.read()
+                # The mtime is the recency every process's rescan sees
+                os.utime(self._disk_path(key))
+            except OSError:
+                pdf_bytes = None
+            if pdf_bytes is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    evicted = self._index_disk(key, len(pdf_bytes))
+                    self._remember(key, pdf_bytes)
+                self._remove_disk(evicted)
+                return pdf_bytes
+            # Evicted by another process, if it was indexed
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, pdf_bytes: bytes):
+        """Store PDF bytes under key in memory and, if configured, on disk."""
+        with self._lock:
+            self._remember(key, pdf_bytes)
+        if self.cache_dir:
+            self._write_disk(key, pdf_bytes)
+
+    async def get_or_create(self, key: str, create: Callable[[], Awaitable[bytes]]) -> bytes:
+        """
+        Cached bytes for key, or the result of create(), which is stored.
+        Concurrent misses on a key share one create() call: in this process
+        through its in-flight future, across processes through a lock file.
+        """
+        while True:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                    continue  # the creating request was cancelled; try again
+            value = await asyncio.to_thread(self.get, key)
+            if value is not None:
+                return value
+            if key not in self._in_flight:
+                break
+
+        future = asyncio.get_running_loop().create_future()
+        # Waiters see any exception; keep asyncio from reporting it as unretrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = future
+        try:
+            value = await self._create(key, create)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    async def _create(self, key: str, create: Callable[[], Awaitable[bytes]]) -> bytes:
+        lock = await self._acquire_lock(key)
+        try:
+            if lock is not None:
+                # Written by another process while this one waited for the lock
+                value = await asyncio.to_thread(self.get, key)
+                if value is not None:
+                    return value
+            value = await create()
+            # Stored before the lock is released, so waiting processes find it
+            await asyncio.to_thread(self.put, key, value)
+            return value
+        finally:
+            if lock is not None:
+                os.close(lock)  # releases the flock
+
+    async def _acquire_lock(self, key: str) -> Optional[int]:
+        """
+        File descriptor holding the key's lock file exclusively, or None without
+        a disk tier or after LOCK_WAIT_SECONDS (the caller then creates anyway).
+        """
+        if self.cache_dir is None or fcntl is None:
+            return None
+        path = os.path.join(self.cache_dir, "locks", f"{key[:LOCK_STRIPES_HEX]}.lock")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        try:
+            # Polled rather than blocking a thread, so a cancelled request never
+            # leaves a thread behind that takes the lock later
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning(f"Render cache: gave up waiting for the lock on {key[:12]}")
+                        os.close(fd)
+                        return None
+                    await asyncio.sleep(LOCK_POLL_SECONDS)
+        except BaseException:
+            os.close(fd)
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, pdf_bytes: bytes):
+        # Caller holds the lock
+        if len(pdf_bytes) > self.max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = pdf_bytes
+        self._memory_bytes += len(pdf_bytes)
+        while self._memory and (
+            self._memory_bytes > self.max_bytes or len(self._memory) > self.max_entries
+        ):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _write_disk(self, key: str, pdf_bytes: bytes):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Render cache: could not write {path}: {str(e)}")
+            return
+
+        # Evict against the directory's real contents, not just what this process wrote
+        self._load_disk_index()
+        with self._lock:
+            evicted = self._index_disk(key, len(pdf_bytes))
+        self._remove_disk(evicted)
+
+    def _index_disk(self, key: str, size: int) -> List[str]:
+        # Caller holds the lock. Returns the keys evicted to stay within max_disk_bytes.
+        evicted = []
+        self._disk_bytes -= self._disk.pop(key, 0)
+        self._disk[key] = size
+        self._disk_bytes += size
+        while len(self._disk) > 1 and self._disk_bytes > self.max_disk_bytes:
+            old_key, old_size = self._disk.popitem(last=False)
+            self._disk_bytes -= old_size
+            evicted.append(old_key)
+        return evicted
+
+    def _remove_disk(self, evicted: List[str]):
+        for old_key in evicted:
+            try:
+                os.remove(self._disk_path(old_key))
+            except OSError:
+                pass
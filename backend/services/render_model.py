@@ -0,0 +1,196 @@
+"""
+Intermediate render model.
+A compact, typed document (header, sections, entries, text blocks) built once
+per resume and consumed by every PDF backend. It can be built from the
+structured resume JSON or from parsed formatting-marker elements.
+
+All text in the model is ReportLab paragraph markup: plain strings from the
+resume JSON are XML-escaped, and marker text keeps its inline <b> tags.
+Backends that cannot render markup use plain_text().
+"""
+
+import html
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Tuple, Union
+from xml.sax.saxutils import escape
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def plain_text(markup: str) -> str:
+    """Strip paragraph markup back to plain text."""
+    if "<" not in markup and "&" not in markup:
+        return markup
+    return html.unescape(_TAG_RE.sub("", markup))
+
+
+@dataclass(frozen=True, slots=True)
+class Header:
+    name: str
+    contact: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Entry:
+    """Two-line experience/education item: title | location, subtitle | date."""
+    kind: str  # "experience" or "education"
+    title: str  # company / institution
+    location: str
+    subtitle: str  # role / degree
+    date: str
+    bullets: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Text:
+    text: str
+    style: str = "paragraph"  # paragraph | line | bold | italic | bullet
+
+
+@dataclass(frozen=True, slots=True)
+class Spacing:
+    pass
+
+
+Block = Union[Entry, Text, Spacing]
+
+
+@dataclass(frozen=True, slots=True)
+class Section:
+    title: str  # empty for content that precedes the first section heading
+    blocks: Tuple[Block, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class ResumeDocument:
+    header: Header
+    sections: Tuple[Section, ...] = field(default_factory=tuple)
+
+
+def _field(item: Dict[str, Any], key: str) -> str:
+    value = item.get(key)
+    return escape(str(value)) if value else ""
+
+
+def document_from_data(data: Dict[str, Any]) -> ResumeDocument:
+    """Build the render model from the structured resume JSON."""
+    header_data = data.get("header") or {}
+    name = _field(header_data, "name") or "Name"
+    parts = [header_data.get("email"), header_data.get("phone"), header_data.get("linkedin")]
+    contact = " | ".join(escape(str(p)) for p in parts if p)
+    header = Header(name=name, contact=(contact,) if contact else ())
+
+    sections: List[Section] = []
+
+    education = data.get("education") or []
+    if education:
+        sections.append(Section("Education", tuple(
+            Entry(
+                kind="education",
+                title=_field(item, "school"),
+                location=_field(item, "location"),
+                subtitle=_field(item, "degree"),
+                date=_field(item, "date"),
+            )
+            for item in education
+        )))
+
+    experience = data.get("experience") or []
+    if experience:
+        sections.append(Section("Experience", tuple(
+            Entry(
+                kind="experience",
+                title=_field(item, "company"),
+                location=_field(item, "location"),
+                subtitle=_field(item, "role"),
+                date=_field(item, "date"),
+                bullets=tuple(escape(str(b)) for b in (item.get("bullets") or []) if b),
+            )
+            for item in experience
+        )))
+
+    skills = data.get("skills")
+    if isinstance(skills, list):
+        skills = ", ".join(str(s) for s in skills)
+    if skills:
+        sections.append(Section("Skills", (Text(escape(str(skills))),)))
+
+    return ResumeDocument(header=header, sections=tuple(sections))
+
+
+class _SectionBuilder:
+    def __init__(self, title: str):
+        self.title = title
+        self.blocks: List[Any] = []
+
+    def freeze(self) -> Section:
+        blocks = tuple(
+            Entry(**{**b, "bullets": tuple(b["bullets"])}) if isinstance(b, dict) else b
+            for b in self.blocks
+        )
+        return Section(self.title, blocks)
+
+
+def document_from_elements(elements: Iterable[Dict[str, Any]]) -> ResumeDocument:
+    """Build the render model from parsed formatting-marker elements."""
+    name = ""
+    contact: List[str] = []
+    sections = [_SectionBuilder("")]
+    current_entry = None  # bullets directly after an entry belong to it
+
+    for element in elements:
+        elem_type = element["type"]
+        content = element.get("content", "")
+        blocks = sections[-1].blocks
+
+        if elem_type == "bullet":
+            if current_entry is not None:
+                current_entry["bullets"].append(content)
+            else:
+                blocks.append(Text(content, "bullet"))
+            continue
+
+        current_entry = None
+        if elem_type == "title":
+            if not name:
+                name = content
+            else:
+                blocks.append(Text(content, "bold"))
+        elif elem_type == "contact":
+            contact.append(content)
+        elif elem_type == "section":
+            sections.append(_SectionBuilder(content))
+        elif elem_type == "experience_item":
+            current_entry = {
+                "kind": "experience",
+                "title": element["company"],
+                "location": element["location"],
+                "subtitle": element["role"],
+                "date": element["date"],
+                "bullets": [],
+            }
+            blocks.append(current_entry)
+        elif elem_type == "education_item":
+            current_entry = {
+                "kind": "education",
+                "title": element["institution"],
+                "location": element["location"],
+                "subtitle": element["degree"],
+                "date": element["date"],
+                "bullets": [],
+            }
+            blocks.append(current_entry)
+        elif elem_type == "subsection":
+            blocks.append(Text(content, "bold"))
+        elif elem_type == "date":
+            blocks.append(Text(content, "italic"))
+        elif elem_type == "paragraph":
+            blocks.append(Text(content, "paragraph"))
+        elif elem_type == "text":
+            blocks.append(Text(content, "line"))
+        elif elem_type == "spacing":
+            blocks.append(Spacing())
+
+    frozen = tuple(s.freeze() for s in sections if s.title or s.blocks)
+    return ResumeDocument(header=Header(name=name, contact=tuple(contact)), sections=frozen)
@@ -0,0 +1,117 @@
+"""
+Process-pool PDF render service.
+PDF rendering is pure-Python CPU work, so it runs in dedicated worker processes
+instead of the shared thread pool, where it would compete with OCR and request
+handling for the GIL. Each worker preloads the renderer modules, font metrics
+and compiled template styles once, then turns serialized resume data into PDF
+bytes.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the pool and renders in-process on a thread
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 2)))
+# spawn works everywhere and never inherits the parent's threads or OCR models
+RENDER_POOL_START_METHOD = os.getenv("RENDER_POOL_START_METHOD", "spawn")
+
+WARMUP_DATA = {
+    "header": {"name": "Warm Up", "email": "warm@example.com", "phone": "0", "linkedin": "-"},
+    "education": [{"school": "School", "degree": "Degree", "location": "City", "date": "2020"}],
+    "experience": [{"company": "Company", "role": "Role", "location": "City", "date": "2020",
+                    "bullets": ["Warm-up bullet"]}],
+    "skills": "Warm-up",
+}
+
+
+def _warm_worker():
+    """Process initializer: load renderers, fonts and template styles once."""
+    from services.fonts import preload_fonts
+    from services.render_backends import render_improved_pdf
+    from services.templates import TEMPLATES
+
+    preload_fonts()
+    for template_id, template in TEMPLATES.items():
+        template.get_styles()
+        # Throwaway renders load each backend's font metrics into the worker
+        for backend in template.backends:
+            render_improved_pdf(WARMUP_DATA, template_id, backend)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def render_serialized(payload: str, template_id: str, backend: Optional[str], max_pages: Optional[int]) -> bytes:
+    """Worker entry point: render JSON-serialized resume data to PDF bytes."""
+    from services.render_backends import render_improved_pdf
+
+    return render_improved_pdf(json.loads(payload), template_id, backend, max_pages)
+
+
+class RenderPool:
+    """Dedicated process pool for PDF rendering."""
+
+    def __init__(self, workers: int = RENDER_WORKERS, start_method: str = RENDER_POOL_START_METHOD):
+        self.workers = workers
+        self.start_method = start_method
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_warm_worker,
+        )
+
+    async def start(self):
+        """Create the pool and bring every worker up before traffic arrives."""
+        if not self.enabled:
+            logger.info("Render pool disabled (RENDER_WORKERS=0); rendering in-process")
+            await asyncio.to_thread(_warm_worker)
+            return
+        self._pool = self._create_pool()
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(
+            *(loop.run_in_executor(self._pool, _ping) for _ in range(self.workers))
+        )
+        logger.info(f"Render pool ready: {len(set(pids))} warm workers ({self.start_method})")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def render(self, data: dict, template_id: str = "professional", backend: Optional[str] = None,
+                     max_pages: Optional[int] = None) -> bytes:
+        """Render resume data to PDF bytes in a worker process."""
+        loop = asyncio.get_running_loop()
+        if not self.enabled:
+            from services.render_backends import render_improved_pdf
+            return await asyncio.to_thread(render_improved_pdf, data, template_id, backend, max_pages)
+
+        if self._pool is None:
+            self._pool = self._create_pool()
+
+        payload = json.dumps(data, separators=(",", ":"))
+        args = (payload, template_id, backend, max_pages)
+        try:
+            return await loop.run_in_executor(self._pool, render_serialized, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool and retry once
+            logger.error("Render pool broken, restarting workers")
+            self.shutdown()
+            self._pool = self._create_pool()
+            return await loop.run_in_executor(self._pool, render_serialized, *args)
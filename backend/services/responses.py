@@ -0,0 +1,111 @@
+"""
+API response encoding.
+- FastJSONResponse serializes with orjson when it is installed (several
+  times faster than the json module on resume-sized payloads) and falls
+  back to compact json.dumps otherwise.
+- select_fields() trims a response to the fields a client asked for
+  (?fields=id,summary or, on jobs, result.summary).
+- JSONCompressionMiddleware gzip- or Brotli-encodes JSON bodies of at least
+  MIN_COMPRESS_BYTES for clients that accept it. Other responses (files,
+  SSE, already encoded bodies) pass through untouched.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+from services.http_cache import MIN_COMPRESS_BYTES, accepted_encoding, compress
+
+try:
+    import orjson
+except ImportError:  # optional; the json module is used instead
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[list]:
+    """Field names from a comma-separated ?fields= value; None selects everything."""
+    if not fields:
+        return None
+    return [name.strip() for name in fields.split(",") if name.strip()]
+
+
+def select_fields(payload: Dict, fields: Optional[Iterable[str]]) -> Dict:
+    """
+    Keep only the listed fields of payload. "parent.child" keeps one field of
+    a nested object; fields the payload does not have are left out.
+    """
+    if fields is None or not isinstance(payload, dict):
+        return payload
+    selected: Dict = {}
+    for name in fields:
+        key, _, child = name.partition(".")
+        if key not in payload:
+            continue
+        value = payload[key]
+        if child and isinstance(value, dict):
+            nested = selected.get(key)
+            if not isinstance(nested, dict):
+                nested = selected[key] = {}
+            nested.update(select_fields(value, [child]))
+        else:
+            selected[key] = value
+    return selected
+
+
+class JSONCompressionMiddleware:
+    """Compress JSON responses for clients that send a matching Accept-Encoding."""
+
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = accepted_encoding(Headers(scope=scope))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        body = []
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if headers.get("content-type", "").startswith("application/json") and "content-encoding" not in headers:
+                    start = message  # held until the body is complete
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                body.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                payload = b"".join(body)
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if len(payload) >= self.minimum_size:
+                    payload = compress(payload, coding)
+                    headers["Content-Encoding"] = coding
+                    headers["Content-Length"] = str(len(payload))
+                await send(start)
+                await send({"type": "http.response.body", "body": payload})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
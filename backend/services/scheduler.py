@@ -0,0 +1,309 @@
+"""
+Stage scheduler.
+Sizes and meters the resources that uploads, batches and downloads compete
+for, one stage per kind of work:
+- ocr: text extraction. CPU bound; a thread pool sized to the cores, since
+  PaddleOCR, Tesseract and poppler do their work in native code outside the GIL.
+  Split into two lanes: "fast" for digital PDFs (a text layer, few pages),
+  which finish in milliseconds, and "slow" for scans that need OCR. The slow
+  lane may not hold every slot, and when both lanes are waiting free slots
+  go to them in proportion to their weights, so a burst of scans cannot hold
+  up cheap jobs.
+- llm: Gemini calls. I/O bound; many slots, on their own threads because the
+  SDK blocks.
+- render: PDF rendering. CPU bound in the render pool's processes; one slot
+  per render process, so waiting shows up here rather than inside the pool.
+
+Every stage counts waiting and running work and tracks wait and service
+times. admit() turns away new requests while a stage's queue is full, with a
+Retry-After estimate, instead of letting latency grow without bound.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from services.render_pool import RENDER_WORKERS
+
+logger = logging.getLogger(__name__)
+
+CPU_COUNT = os.cpu_count() or 1
+
+# At least two, so one is always left for the fast lane
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(2, CPU_COUNT))))
+LLM_SLOTS = int(os.getenv("LLM_SLOTS", "16"))
+RENDER_SLOTS = int(os.getenv("RENDER_SLOTS", str(max(1, RENDER_WORKERS))))
+
+# Work allowed to wait for a slot before new requests are turned away
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", str(4 * OCR_WORKERS)))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", str(4 * LLM_SLOTS)))
+RENDER_MAX_QUEUE = int(os.getenv("RENDER_MAX_QUEUE", str(16 * RENDER_SLOTS)))
+
+# OCR lanes. The fast lane may use every OCR slot, the slow lane at most
+# OCR_SLOW_LANE_SLOTS; each lane may queue up to OCR_MAX_QUEUE jobs.
+FAST_LANE = "fast"
+SLOW_LANE = "slow"
+OCR_SLOW_LANE_SLOTS = int(os.getenv("OCR_SLOW_LANE_SLOTS", str(max(1, OCR_WORKERS - 1))))
+OCR_FAST_LANE_WEIGHT = float(os.getenv("OCR_FAST_LANE_WEIGHT", "4"))
+OCR_SLOW_LANE_WEIGHT = float(os.getenv("OCR_SLOW_LANE_WEIGHT", "1"))
+
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.2
+DEFAULT_RETRY_AFTER = 5
+MAX_RETRY_AFTER = 300
+
+
+class StageSaturated(Exception):
+    """Raised by admit() when a stage cannot take more work right now."""
+
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(f"Stage '{stage}' is saturated, retry in {retry_after}s")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class Lane:
+    """One class of work within a stage, with its own slot limit, weight and queue bound."""
+
+    def __init__(self, name: str, slots: int, weight: float, max_queue: int):
+        self.name = name
+        self.slots = max(1, slots)
+        self.weight = max(weight, 0.001)
+        self.max_queue = max_queue
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_avg = 0.0
+        self.service_avg: Optional[float] = None
+        # Virtual time for weighted fair sharing: advances by 1/weight per slot granted
+        self.vtime = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self.waiters)
+
+    @property
+    def saturated(self) -> bool:
+        return self.waiting >= self.max_queue
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "weight": self.weight,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_ms_avg": round(self.wait_avg * 1000, 1),
+            "service_ms_avg": round((self.service_avg or 0.0) * 1000, 1),
+        }
+
+
+class Stage:
+    """
+    A bounded pool of slots for one kind of work, with queue metrics.
+    Work waits in per-lane FIFO queues. A freed slot goes to the lane with the
+    lowest virtual time among those with work waiting and room under their
+    own limit, so competing lanes share the slots by weight.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        slots: int,
+        max_queue: int,
+        threads: bool = False,
+        lanes: Optional[List[Lane]] = None,
+        default_lane: Optional[str] = None,
+    ):
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        # Blocking functions run here; the slot accounting keeps the queue in view
+        self.executor = ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix=name) if threads else None
+        lanes = lanes or [Lane("default", self.slots, 1, max_queue)]
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        self.default_lane = default_lane or lanes[0].name
+        self._free = self.slots
+        self._vclock = 0.0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_avg = 0.0
+        self.wait_max = 0.0
+        self.service_avg: Optional[float] = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(lane.waiting for lane in self.lanes.values())
+
+    @property
+    def running(self) -> int:
+        return sum(lane.running for lane in self.lanes.values())
+
+    def lane(self, name: Optional[str] = None) -> Lane:
+        """The named lane; stages without it use their default lane."""
+        return self.lanes.get(name) or self.lanes[self.default_lane]
+
+    def retry_after(self, lane: Optional[str] = None) -> int:
+        """Seconds until the work queued now in the lane should have drained."""
+        queue = self.lane(lane)
+        service_avg = queue.service_avg if queue.service_avg is not None else self.service_avg
+        if service_avg is None:
+            return DEFAULT_RETRY_AFTER
+        seconds = (queue.waiting + queue.running) * service_avg / min(queue.slots, self.slots)
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(seconds)))
+
+    async def _acquire(self, lane: Lane):
+        if not lane.waiters:
+            if self._free > 0 and lane.running < lane.slots:
+                self._grant(lane)
+                return
+            # A lane that was idle does not get credit for the time it did not use
+            lane.vtime = max(lane.vtime, self._vclock)
+        future = asyncio.get_running_loop().create_future()
+        lane.waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                try:
+                    lane.waiters.remove(future)
+                except ValueError:
+                    pass
+            else:
+                # Granted a slot just as we were cancelled
+                self._release(lane)
+            raise
+
+    def _grant(self, lane: Lane):
+        self._free -= 1
+        lane.running += 1
+        self._vclock = lane.vtime
+        lane.vtime += 1 / lane.weight
+
+    def _release(self, lane: Lane):
+        self._free += 1
+        lane.running -= 1
+        while self._free > 0:
+            ready = [l for l in self.lanes.values() if l.waiters and l.running < l.slots]
+            if not ready:
+                return
+            next_lane = min(ready, key=lambda l: l.vtime)
+            future = next_lane.waiters.popleft()
+            if future.done():
+                continue  # cancelled while queued
+            self._grant(next_lane)
+            future.set_result(None)
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, lane: Optional[str] = None) -> Any:
+        """Await fn(*args) once a slot is free in the lane."""
+        queue = self.lane(lane)
+        queued = time.perf_counter()
+        await self._acquire(queue)
+        started = time.perf_counter()
+        self._record_wait(queue, started - queued)
+        try:
+            result = await fn(*args)
+            self.completed += 1
+            queue.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._release(queue)
+            self._record_service(queue, time.perf_counter() - started)
+
+    async def run(self, fn: Callable[..., Any], *args, lane: Optional[str] = None) -> Any:
+        """Run blocking fn(*args) on the stage's threads once a slot is free in the lane."""
+        loop = asyncio.get_running_loop()
+
+        async def in_executor():
+            return await loop.run_in_executor(self.executor, fn, *args)
+
+        return await self.call(in_executor, lane=lane)
+
+    def _record_wait(self, lane: Lane, seconds: float):
+        self.wait_avg += EWMA_ALPHA * (seconds - self.wait_avg)
+        self.wait_max = max(self.wait_max, seconds)
+        lane.wait_avg += EWMA_ALPHA * (seconds - lane.wait_avg)
+
+    def _record_service(self, lane: Lane, seconds: float):
+        if self.service_avg is None:
+            self.service_avg = seconds
+        else:
+            self.service_avg += EWMA_ALPHA * (seconds - self.service_avg)
+        if lane.service_avg is None:
+            lane.service_avg = seconds
+        else:
+            lane.service_avg += EWMA_ALPHA * (seconds - lane.service_avg)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "slots": self.slots,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_avg": round(self.wait_avg * 1000, 1),
+            "wait_ms_max": round(self.wait_max * 1000, 1),
+            "service_ms_avg": round((self.service_avg or 0.0) * 1000, 1),
+        }
+        if len(self.lanes) > 1:
+            stats["lanes"] = {name: lane.stats() for name, lane in self.lanes.items()}
+        return stats
+
+
+class Scheduler:
+    """The pipeline's stages, by name."""
+
+    def __init__(self):
+        self.stages = {
+            "ocr": Stage(
+                "ocr", OCR_WORKERS, OCR_MAX_QUEUE, threads=True,
+                lanes=[
+                    Lane(FAST_LANE, OCR_WORKERS, OCR_FAST_LANE_WEIGHT, OCR_MAX_QUEUE),
+                    Lane(SLOW_LANE, OCR_SLOW_LANE_SLOTS, OCR_SLOW_LANE_WEIGHT, OCR_MAX_QUEUE),
+                ],
+                # Unclassified work is assumed to need OCR
+                default_lane=SLOW_LANE,
+            ),
+            "llm": Stage("llm", LLM_SLOTS, LLM_MAX_QUEUE, threads=True),
+            "render": Stage("render", RENDER_SLOTS, RENDER_MAX_QUEUE),
+        }
+        logger.info(
+            "Stage scheduler: " + ", ".join(f"{s.name}={s.slots} slots/{s.max_queue} queue" for s in self.stages.values())
+        )
+
+    def __getitem__(self, name: str) -> Stage:
+        return self.stages[name]
+
+    def admit(self, *names: str, lane: Optional[str] = None):
+        """Raise StageSaturated if the lane's queue is full in any of the named stages."""
+        for name in names:
+            stage = self.stages[name]
+            queue = stage.lane(lane)
+            if queue.saturated:
+                stage.rejected += 1
+                queue.rejected += 1
+                retry_after = stage.retry_after(lane)
+                logger.warning(
+                    f"✗ Rejecting work: {name}/{queue.name} queue full ({queue.waiting} waiting), retry in {retry_after}s"
+                )
+                raise StageSaturated(name, retry_after)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+
+scheduler = Scheduler()
@@ -0,0 +1,236 @@
+"""
+Artifact storage.
+Every file the app keeps lives under one base directory (STORAGE_DIR, by
+default the backend directory, wherever the server is started from):
+- uploads/  {id}_original.pdf, {id}_ocr_result.txt
+- outputs/  {id}_debug.json, {id}_data.json, the persisted PDFs
+            ({id}_{template}[_p{max_pages}]_improved.pdf), the render and
+            preview caches and the job store
+- blobs/    content-addressed copies of originals and rendered PDFs
+
+Artifacts keep their per-id paths, so readers just open them. Originals and
+PDFs are also content-addressed: the per-id file is a hard link to
+blobs/<sha256[:2]>/<sha256>, so the same resume uploaded or rendered many
+times is stored once. A blob left with no other links is garbage.
+
+collect() applies the per-kind retention policy (RETENTION_DAYS) to the
+per-id files, then removes unreferenced blobs; with dry_run it only reports
+what it would reclaim. run_gc() does this every STORAGE_GC_INTERVAL seconds.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORAGE_DIR = os.getenv("STORAGE_DIR", BACKEND_DIR)
+
+# Days each kind of artifact is kept after it was last written (0 = forever).
+# Originals and OCR text are only needed while a job runs; debug.json holds the
+# resume data every download and re-render needs; PDFs can be re-rendered.
+RETENTION_DAYS = {
+    "original": float(os.getenv("RETENTION_ORIGINAL_DAYS", "1")),
+    "ocr_result": float(os.getenv("RETENTION_OCR_RESULT_DAYS", "1")),
+    "data": float(os.getenv("RETENTION_DATA_DAYS", "7")),
+    "improvements": float(os.getenv("RETENTION_IMPROVEMENTS_DAYS", "7")),
+    "debug": float(os.getenv("RETENTION_DEBUG_DAYS", "30")),
+    "improved": float(os.getenv("RETENTION_IMPROVED_DAYS", "7")),
+}
+
+STORAGE_GC_INTERVAL = int(os.getenv("STORAGE_GC_INTERVAL", "3600"))
+# Only log what the background GC would delete
+STORAGE_GC_DRY_RUN = os.getenv("STORAGE_GC_DRY_RUN", "false").lower() in ("1", "true", "yes")
+
+# Artifact kind -> (directory, file name suffix after "{id}_"; retention matches on the suffix)
+ARTIFACTS = {
+    "original": ("uploads", "original.pdf"),
+    "ocr_result": ("uploads", "ocr_result.txt"),
+    "data": ("outputs", "data.json"),
+    "improvements": ("outputs", "improvements.txt"),
+    "debug": ("outputs", "debug.json"),
+    "improved": ("outputs", "improved.pdf"),
+}
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Storage:
+    """Per-id artifact paths, content-addressed blobs and retention GC under one base directory."""
+
+    def __init__(self, base_dir: str = STORAGE_DIR):
+        self.base_dir = os.path.abspath(base_dir)
+        self.upload_dir = os.path.join(self.base_dir, "uploads")
+        self.output_dir = os.path.join(self.base_dir, "outputs")
+        self.blob_dir = os.path.join(self.base_dir, "blobs")
+        for directory in (self.upload_dir, self.output_dir, self.blob_dir):
+            os.makedirs(directory, exist_ok=True)
+        self.deduplicated = 0
+        self.bytes_deduplicated = 0
+        self.last_gc: Optional[Dict] = None
+
+    def path(self, kind: str, file_id: str) -> str:
+        directory, suffix = ARTIFACTS[kind]
+        return os.path.join(self.base_dir, directory, f"{file_id}_{suffix}")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def put_bytes(self, data: bytes, path: str):
+        """Write data to path, sharing the stored blob if the content is already there."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self._link_blob(digest, path, len(data)):
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._add_blob(path, digest)
+
+    def adopt(self, path: str, digest: Optional[str] = None):
+        """Content-address a file already written to path (e.g. a streamed upload)."""
+        digest = digest or file_digest(path)
+        if not self._link_blob(digest, path, os.path.getsize(path)):
+            self._add_blob(path, digest)
+
+    def _link_blob(self, digest: str, path: str, size: int) -> bool:
+        # Replace path with a link to an existing blob; False if there is none
+        blob = self._blob_path(digest)
+        tmp_path = f"{path}.{os.getpid()}.link"
+        try:
+            os.link(blob, tmp_path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            # Links unsupported here, or a stale temp file: store a separate copy
+            logger.debug(f"Could not link blob {digest[:12]}: {str(e)}")
+            return False
+        os.replace(tmp_path, path)
+        # Links share one inode; refresh its age so retention counts from this write
+        os.utime(path)
+        self.deduplicated += 1
+        self.bytes_deduplicated += size
+        return True
+
+    def _add_blob(self, path: str, digest: str):
+        blob = self._blob_path(digest)
+        try:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(path, blob)
+        except FileExistsError:
+            pass  # stored by a concurrent writer; this copy stays separate
+        except OSError as e:
+            logger.debug(f"Could not add blob {digest[:12]}: {str(e)}")
+
+    def collect(self, dry_run: bool = False) -> Dict:
+        """
+        Delete per-id artifacts past their retention, then blobs nothing links to.
+        Returns a report of files and bytes reclaimed (or reclaimable, with dry_run).
+        """
+        started = time.perf_counter()
+        now = time.time()
+        report = {"dry_run": dry_run, "files": 0, "bytes": 0, "by_kind": {}}
+        # Inode -> expired links to it, to tell which blobs a dry run would free
+        expired_links: Dict[int, int] = {}
+
+        for kind, (directory, suffix) in ARTIFACTS.items():
+            days = RETENTION_DAYS[kind]
+            if days <= 0:
+                continue
+            cutoff = now - days * 86400
+            reclaimed = {"files": 0, "bytes": 0}
+            for entry in self._scan(os.path.join(self.base_dir, directory)):
+                if not entry.name.endswith(f"_{suffix}"):
+                    continue
+                stat = self._stat(entry)
+                if stat is None or stat.st_mtime >= cutoff:
+                    continue
+                reclaimed["files"] += 1
+                if stat.st_nlink > 1:
+                    # Shared with its blob: the space comes back when the blob goes
+                    expired_links[stat.st_ino] = expired_links.get(stat.st_ino, 0) + 1
+                else:
+                    reclaimed["bytes"] += stat.st_size
+                if not dry_run:
+                    self._remove(entry.path)
+            if reclaimed["files"]:
+                report["by_kind"][kind] = reclaimed
+                report["files"] += reclaimed["files"]
+                report["bytes"] += reclaimed["bytes"]
+
+        blobs = {"files": 0, "bytes": 0}
+        for shard in self._scan(self.blob_dir):
+            if not shard.is_dir():
+                continue
+            for entry in self._scan(shard.path):
+                stat = self._stat(entry)
+                if stat is None:
+                    continue
+                links = stat.st_nlink
+                if dry_run:
+                    # The expired links above still exist; count them as gone
+                    links -= expired_links.get(stat.st_ino, 0)
+                if links <= 1:
+                    blobs["files"] += 1
+                    blobs["bytes"] += stat.st_size
+                    if not dry_run:
+                        self._remove(entry.path)
+        if blobs["files"]:
+            report["by_kind"]["blob"] = blobs
+            report["files"] += blobs["files"]
+            report["bytes"] += blobs["bytes"]
+
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        self.last_gc = report
+        verb = "Would reclaim" if dry_run else "Reclaimed"
+        logger.info(f"✓ Storage GC: {verb} {report['bytes']} bytes in {report['files']} files")
+        return report
+
+    def _scan(self, directory: str):
+        try:
+            with os.scandir(directory) as entries:
+                return [entry for entry in entries if not entry.name.startswith(".")]
+        except FileNotFoundError:
+            return []
+
+    def _stat(self, entry: os.DirEntry) -> Optional[os.stat_result]:
+        try:
+            return entry.stat()
+        except FileNotFoundError:
+            return None
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # removed by another worker's GC
+
+    async def run_gc(self, interval: int = STORAGE_GC_INTERVAL, dry_run: bool = STORAGE_GC_DRY_RUN):
+        """Collect garbage every interval seconds; runs until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.collect, dry_run)
+            except Exception as e:
+                logger.warning(f"✗ Storage GC failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {
+            "base_dir": self.base_dir,
+            "deduplicated": self.deduplicated,
+            "bytes_deduplicated": self.bytes_deduplicated,
+            "last_gc": self.last_gc,
+        }
+
+
+storage = Storage()
@@ -3,11 +3,29 @@ CV Template definitions and formatting logic.
 Each template defines the structure and styling for generated CVs.
 """
 
-from typing import Dict, List
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
 from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
+from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 from reportlab.lib import colors
 
+
+def derive_item_styles(styles: Mapping[str, ParagraphStyle]) -> Dict[str, ParagraphStyle]:
+    """Build the two-column experience/education item styles from the body style."""
+    body = styles['body']
+    return {
+        'exp_company': ParagraphStyle('ExpCompany', parent=body, fontName='Times-Bold', fontSize=11),
+        'exp_location': ParagraphStyle('ExpLocation', parent=body, alignment=TA_RIGHT, fontSize=11),
+        'exp_role': ParagraphStyle('ExpRole', parent=body, fontName='Times-BoldItalic', fontSize=10.5),
+        'exp_date': ParagraphStyle('ExpDate', parent=body, alignment=TA_RIGHT, fontSize=10.5),
+        'edu_institution': ParagraphStyle('EduInst', parent=body, fontName='Times-Bold', fontSize=11),
+        'edu_location': ParagraphStyle('EduLocation', parent=body, alignment=TA_RIGHT, fontSize=11),
+        'edu_degree': ParagraphStyle('EduDegree', parent=body, fontName='Times-Bold', fontSize=10.5),
+        'edu_date': ParagraphStyle('EduDate', parent=body, alignment=TA_RIGHT, fontSize=10.5),
+    }
+
+
 class CVTemplate:
     """Base class for CV templates."""
     
@@ -16,11 +34,34 @@ class CVTemplate:
         self.name: str = ""
         self.description: str = ""
         self.preview_image: str = ""
+        # PDF backends that can render this template (see services.render_backends)
+        self.backends: Tuple[str, ...] = ("fpdf", "reportlab")
+        # Ranges the fit-to-page layout may scale font sizes and vertical spacing within
+        self.fit_font_scale: Tuple[float, float] = (1.0, 1.0)
+        self.fit_spacing_scale: Tuple[float, float] = (1.0, 1.0)
+        self._compiled_styles = None
+        self._styles_lock = threading.Lock()
     
-    def get_styles(self) -> Dict[str, ParagraphStyle]:
-        """Return the paragraph styles for this template."""
+    def build_styles(self) -> Dict[str, ParagraphStyle]:
+        """Build a fresh set of paragraph styles for this template."""
         raise NotImplementedError
     
+    def get_styles(self) -> Mapping[str, ParagraphStyle]:
+        """
+        Return the compiled paragraph styles for this template.
+        
+        Styles (including the derived item styles) are built once per process
+        and shared by every render. The mapping is read-only and the styles
+        must not be mutated; derive a new ParagraphStyle with parent=... instead.
+        """
+        if self._compiled_styles is None:
+            with self._styles_lock:
+                if self._compiled_styles is None:
+                    styles = self.build_styles()
+                    styles.update(derive_item_styles(styles))
+                    self._compiled_styles = MappingProxyType(styles)
+        return self._compiled_styles
+    
     def get_system_prompt(self) -> str:
         """Return the AI system prompt for this template."""
         raise NotImplementedError
@@ -39,8 +80,11 @@ class ProfessionalTemplate(CVTemplate):
         self.name = "Harvard CV Format"
         self.description = "Traditional Harvard-style CV with centered header, perfect for academic and professional roles"
         self.preview_image = "/static/previews/harvard_preview.png"
+        # Body text may drop from 10pt to 9pt; gaps may shrink to half
+        self.fit_font_scale = (0.9, 1.0)
+        self.fit_spacing_scale = (0.5, 1.0)
     
-    def get_styles(self) -> Dict[str, ParagraphStyle]:
+    def build_styles(self) -> Dict[str, ParagraphStyle]:
         """Professional template styles - Harvard CV Format.
         
         SPECIFICATION:
@@ -0,0 +1,223 @@
+"""
+Streaming multipart uploads.
+Starlette's form parser spools every file part to a temporary file before the
+endpoint sees it, so limits checked afterwards only apply once the whole body
+has been received (and a chunked body without Content-Length is never checked
+up front). receive_multipart() instead feeds request.stream() through
+python-multipart's push parser and writes each file part straight to the path
+its caller chose, checking the file type on the first 1 KB and the size on
+every chunk. A rejected upload stops being read at the chunk that breaks a
+limit, and an accepted one is written once. The parser callbacks only queue
+file operations; each received chunk's are run in a worker thread, so a slow
+disk never blocks the event loop.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+# Readers accept a file's signature anywhere in its first 1 KB (PDF does)
+MAGIC_WINDOW = 1024
+# Plain form fields (template_id, ...) are tiny
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Raised while a request body streams in, at the first chunk that breaks a limit."""
+
+    def __init__(self, status_code: int, detail: str, filename: Optional[str] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.filename = filename
+
+
+@dataclass
+class ReceivedFile:
+    """Where one file part goes and what it must look like; size and digest are filled in."""
+    filename: str
+    path: str
+    max_bytes: int
+    magic: bytes = b"%PDF-"
+    kind: str = "PDF"
+    size: int = 0
+    digest: str = ""
+    _head: Optional[bytearray] = field(default_factory=bytearray, repr=False)
+    _sha256: Any = field(default_factory=hashlib.sha256, repr=False)
+
+
+def too_large_message(max_bytes: int) -> str:
+    return f"File is too large (limit {max_bytes / (1024 * 1024):.1f} MB)"
+
+
+class _FormReceiver:
+    def __init__(self, accept_file: Callable[[str, str], ReceivedFile], max_files: int):
+        self.accept_file = accept_file
+        self.max_files = max_files
+        self.fields: Dict[str, str] = {}
+        self.files: List[ReceivedFile] = []
+        self._field_bytes = 0
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._name = ""
+        self._value = bytearray()
+        self._file: Optional[ReceivedFile] = None
+        self._out = None
+        # File operations queued by the callbacks for flush(), in order
+        self._ops: List[Tuple[Callable, Tuple]] = []
+
+    def on_part_begin(self):
+        self._disposition = b""
+        self._value = bytearray()
+        self._file = None
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" not in options:
+            return
+        if len(self.files) >= self.max_files:
+            raise UploadRejected(400, f"Too many files (at most {self.max_files})")
+        filename = os.path.basename(options[b"filename"].decode("utf-8", "replace"))
+        # Raises UploadRejected for files the caller does not take
+        self._file = self.accept_file(self._name, filename)
+        self.files.append(self._file)
+        self._ops.append((self._open, (self._file.path,)))
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        received = self._file
+        if received is None:
+            self._field_bytes += len(chunk)
+            if self._field_bytes > MAX_FIELD_BYTES:
+                raise UploadRejected(400, "Form fields are too large")
+            self._value.extend(chunk)
+            return
+        received.size += len(chunk)
+        received._sha256.update(chunk)
+        if received._head is not None:
+            # Hold the first bytes back until the signature can be checked
+            received._head.extend(chunk)
+            if len(received._head) < MAGIC_WINDOW:
+                return
+            self._check_magic(received)
+            chunk, received._head = bytes(received._head), None
+        if received.size > received.max_bytes:
+            raise UploadRejected(413, too_large_message(received.max_bytes), received.filename)
+        self._ops.append((self._write, (chunk,)))
+
+    def on_part_end(self):
+        received = self._file
+        if received is None:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+            return
+        if received.size == 0:
+            raise UploadRejected(400, "File is empty", received.filename)
+        if received._head is not None:
+            self._check_magic(received)
+            self._ops.append((self._write, (bytes(received._head),)))
+            received._head = None
+        self._ops.append((self._close, ()))
+        received.digest = received._sha256.hexdigest()
+
+    def _check_magic(self, received: ReceivedFile):
+        if received.magic not in received._head[:MAGIC_WINDOW]:
+            raise UploadRejected(400, f"File is not a {received.kind}", received.filename)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._ops)
+
+    def flush(self):
+        """Run the queued file operations (blocking; called in a worker thread)."""
+        ops, self._ops = self._ops, []
+        for op, args in ops:
+            op(*args)
+
+    def _open(self, path: str):
+        self._out = open(path, "wb")
+
+    def _write(self, chunk: bytes):
+        self._out.write(chunk)
+
+    def _close(self):
+        self._out.close()
+        self._out = None
+
+    def discard(self):
+        self._ops = []
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        for received in self.files:
+            if os.path.exists(received.path):
+                os.remove(received.path)
+
+
+async def receive_multipart(
+    request: Request,
+    accept_file: Callable[[str, str], ReceivedFile],
+    max_files: int = 1,
+) -> Tuple[Dict[str, str], List[ReceivedFile]]:
+    """
+    Parse a multipart/form-data body as it arrives. accept_file(field, filename)
+    is called when a file part starts and returns where to write it and its
+    limits, or raises UploadRejected. Returns the plain fields and the files
+    written; on rejection every file written so far is removed.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadRejected(400, "Expected a multipart/form-data upload")
+
+    receiver = _FormReceiver(accept_file, max_files)
+    parser = MultipartParser(boundary, {
+        "on_part_begin": receiver.on_part_begin,
+        "on_part_data": receiver.on_part_data,
+        "on_part_end": receiver.on_part_end,
+        "on_header_field": receiver.on_header_field,
+        "on_header_value": receiver.on_header_value,
+        "on_header_end": receiver.on_header_end,
+        "on_headers_finished": receiver.on_headers_finished,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receiver.pending:
+                await asyncio.to_thread(receiver.flush)
+        parser.finalize()
+        if receiver.pending:
+            await asyncio.to_thread(receiver.flush)
+    except MultipartParseError as e:
+        await asyncio.to_thread(receiver.discard)
+        raise UploadRejected(400, f"Malformed upload: {str(e)}")
+    except UploadRejected as e:
+        await asyncio.to_thread(receiver.discard)
+        logger.warning(f"✗ Upload rejected mid-stream: {e.detail}")
+        raise
+    except BaseException:
+        # Cancelled or failed: clean up without awaiting again
+        receiver.discard()
+        raise
+    return receiver.fields, receiver.files
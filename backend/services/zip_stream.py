@@ -0,0 +1,29 @@
+"""
+Streaming ZIP output.
+ZipFile normally needs a seekable file; ZipStream is a write-only sink whose
+buffered bytes are drained after each member, so the batch download archive
+(BatchProcessor.iter_archive) is sent chunk by chunk while it is being written.
+"""
+
+import io
+from typing import List
+
+
+class ZipStream(io.RawIOBase):
+    """Write-only sink that lets ZipFile emit an archive chunk by chunk."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
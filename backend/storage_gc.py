@@ -0,0 +1,37 @@
+"""
+Storage garbage collection.
+
+Usage (from any directory):
+    python backend/storage_gc.py [--dry-run]
+
+Applies the retention policy (RETENTION_*_DAYS) to the uploads and outputs
+under STORAGE_DIR and removes content-addressed blobs nothing links to any
+more, the same pass the server runs every STORAGE_GC_INTERVAL seconds.
+With --dry-run nothing is deleted; the report shows what would be reclaimed.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.storage import RETENTION_DAYS, storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dry-run", action="store_true", help="report what would be reclaimed, delete nothing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    print(f"Storage: {storage.base_dir}")
+    print("Retention (days, 0 = forever): " + ", ".join(f"{kind}={days:g}" for kind, days in RETENTION_DAYS.items()))
+    report = storage.collect(dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -168,6 +168,12 @@ export default function UploadScreen() {
         selectedFile.uri,
         selectedFile.name,
         selectedTemplate,
+        (update) => {
+          // Real progress from the job replaces the estimated steps
+          clearInterval(progressInterval);
+          setProgress(update.progress);
+          setProcessingStage(update.message);
+        },
       );
       clearInterval(progressInterval);
       setProgress(100);
@@ -1,4 +1,6 @@
 import Constants from "expo-constants";
+// Unlike React Native's fetch, expo/fetch exposes the response body as a stream
+import { fetch as streamingFetch } from "expo/fetch";
 
 // Production backend URL
 const PRODUCTION_API_URL = "https://resumee-nhrs.onrender.com";
@@ -46,6 +48,35 @@ export interface UploadResumeResponse {
   download_url: string;
 }
 
+// 202 body of /api/upload-resume when the backend queues the job (UPLOAD_MODE=async)
+export interface UploadJobResponse {
+  id: string;
+  coalesced: boolean;
+  status_url: string;
+  progress_url: string;
+  events_url: string;
+}
+
+export interface JobProgress {
+  stage: string;
+  message: string;
+  progress: number;
+}
+
+interface JobState {
+  id: string;
+  stage: string;
+  message: string;
+  progress: number;
+  error: string | null;
+  result: UploadResumeResponse | null;
+}
+
+const UPLOAD_TIMEOUT_MS = 180000; // 3 minutes
+const JOB_POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
 export interface CVTemplate {
   id: string;
   name: string;
@@ -96,6 +127,7 @@ export const resumeApi = {
     fileUri: string,
     fileName: string,
     templateId: string = "professional",
+    onProgress?: (update: JobProgress) => void,
   ): Promise<UploadResumeResponse> {
     try {
       console.log("📤 Uploading resume:", fileName);
@@ -122,30 +154,42 @@ export const resumeApi = {
         `${API_BASE_URL}/api/upload-resume`,
       );
 
-      // Create abort controller for timeout
+      // Create abort controller for timeout (covers the upload and waiting for the job)
       const controller = new AbortController();
-      const timeoutId = setTimeout(() => controller.abort(), 180000); // 3 minutes timeout
-
-      const response = await fetch(`${API_BASE_URL}/api/upload-resume`, {
-        method: "POST",
-        body: formData,
-        signal: controller.signal,
-      });
+      const timeoutId = setTimeout(() => controller.abort(), UPLOAD_TIMEOUT_MS);
+
+      try {
+        const response = await fetch(`${API_BASE_URL}/api/upload-resume`, {
+          method: "POST",
+          body: formData,
+          signal: controller.signal,
+        });
+
+        if (!response.ok) {
+          const error = await response
+            .json()
+            .catch(() => ({ detail: "Unknown error" }));
+          throw new Error(
+            error.detail || `Failed to upload resume: ${response.status}`,
+          );
+        }
 
-      clearTimeout(timeoutId);
+        // 200: the backend waited for the result (UPLOAD_MODE=sync)
+        if (response.status !== 202) {
+          const data = await response.json();
+          console.log("✅ Resume processed successfully");
+          return data;
+        }
 
-      if (!response.ok) {
-        const error = await response
-          .json()
-          .catch(() => ({ detail: "Unknown error" }));
-        throw new Error(
-          error.detail || `Failed to upload resume: ${response.status}`,
-        );
+        // 202: the job was queued; follow its progress until it finishes
+        const job: UploadJobResponse = await response.json();
+        console.log("⏳ Resume queued as job:", job.id, job.coalesced ? "(coalesced)" : "");
+        const data = await this.waitForJob(job, controller.signal, onProgress);
+        console.log("✅ Resume processed successfully");
+        return data;
+      } finally {
+        clearTimeout(timeoutId);
       }
-
-      const data = await response.json();
-      console.log("✅ Resume processed successfully");
-      return data;
     } catch (error) {
       if (error instanceof Error) {
         if (error.name === "AbortError") {
@@ -159,6 +203,134 @@ export const resumeApi = {
     }
   },
 
+  async waitForJob(
+    job: UploadJobResponse,
+    signal?: AbortSignal,
+    onProgress?: (update: JobProgress) => void,
+  ): Promise<UploadResumeResponse> {
+    // Progress is pushed over Server-Sent Events; poll only without a stream
+    const streamed = await this.streamJob(job, signal, onProgress);
+    if (streamed) {
+      return streamed;
+    }
+    console.log("⚠️ Progress stream unavailable, polling job status");
+    return this.pollJob(job, signal, onProgress);
+  },
+
+  // Follows the job's events_url; resolves to null if the stream cannot be
+  // opened or ends before the job does, so the caller can poll instead
+  async streamJob(
+    job: UploadJobResponse,
+    signal?: AbortSignal,
+    onProgress?: (update: JobProgress) => void,
+  ): Promise<UploadResumeResponse | null> {
+    let response;
+    try {
+      response = await streamingFetch(`${API_BASE_URL}${job.events_url}`, {
+        headers: { Accept: "text/event-stream" },
+        signal,
+      });
+    } catch (error) {
+      if (error instanceof Error && error.name === "AbortError") {
+        throw error;
+      }
+      return null;
+    }
+    if (!response.ok || !response.body) {
+      return null;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    try {
+      while (true) {
+        let chunk;
+        try {
+          chunk = await reader.read();
+        } catch (error) {
+          if (error instanceof Error && error.name === "AbortError") {
+            throw error;
+          }
+          return null;
+        }
+        if (chunk.done) {
+          return null;
+        }
+        buffer += decoder.decode(chunk.value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+          const block = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          let event = "message";
+          const data: string[] = [];
+          for (const line of block.split("\n")) {
+            if (line.startsWith("event:")) {
+              event = line.slice(6).trim();
+            } else if (line.startsWith("data:")) {
+              data.push(line.slice(5).trimStart());
+            }
+          }
+          if (data.length === 0) {
+            continue; // keep-alive comment
+          }
+          const state: JobState = JSON.parse(data.join("\n"));
+          onProgress?.(state);
+          if (event === "complete") {
+            if (!state.result) {
+              throw new Error("Job completed without a result");
+            }
+            return state.result;
+          }
+          if (event === "error") {
+            throw new Error(state.error || state.message || "Processing failed");
+          }
+        }
+      }
+    } finally {
+      reader.cancel().catch(() => {});
+    }
+  },
+
+  async pollJob(
+    job: UploadJobResponse,
+    signal?: AbortSignal,
+    onProgress?: (update: JobProgress) => void,
+  ): Promise<UploadResumeResponse> {
+    const statusUrl = `${API_BASE_URL}${job.status_url}`;
+    while (true) {
+      // Poll without the result; it is fetched once, when the job completes
+      const response = await fetch(`${statusUrl}?fields=stage,message,progress,error`, {
+        signal,
+      });
+      if (!response.ok) {
+        throw new Error(`Failed to get job status: ${response.status}`);
+      }
+      const state: Partial<JobState> = await response.json();
+      if (state.stage) {
+        onProgress?.(state as JobProgress);
+      }
+
+      if (state.stage === "complete") {
+        const done = await fetch(`${statusUrl}?fields=result`, { signal });
+        if (!done.ok) {
+          throw new Error(`Failed to get job result: ${done.status}`);
+        }
+        const { result }: Partial<JobState> = await done.json();
+        if (!result) {
+          throw new Error("Job completed without a result");
+        }
+        return result;
+      }
+      if (state.stage === "error") {
+        throw new Error(state.error || state.message || "Processing failed");
+      }
+      await sleep(JOB_POLL_INTERVAL_MS);
+    }
+  },
+
   async downloadResume(fileId: string): Promise<Blob> {
     const response = await fetch(`${API_BASE_URL}/api/download/${fileId}`);
 
@@ -177,21 +349,6 @@ export const resumeApi = {
     return `${API_BASE_URL}/api/template-preview/${templateId}`;
   },
 
-  async getProgress(
-    fileId: string,
-  ): Promise<{ stage: string; message: string; progress: number }> {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/progress/${fileId}`);
-      if (!response.ok) {
-        throw new Error("Failed to get progress");
-      }
-      return await response.json();
-    } catch (error) {
-      console.error("Failed to get progress:", error);
-      return { stage: "unknown", message: "Processing...", progress: 0 };
-    }
-  },
-
   async generatePdf(
     fileId: string,
     userId: string,